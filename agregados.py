@@ -0,0 +1,278 @@
+# Módulo de agregados por hora y por día de las lecturas (n, mínimo, máximo, suma, suma de cuadrados)
+# Los mantienen triggers sobre cada partición de lectura; las consultas de rango usan el agregado
+# más grueso posible
+from __future__ import annotations
+import argparse
+import sqlite3
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from archivo import SIN_ARCHIVAR, rangos_archivados
+from conexion import escribir, obtener_conexion
+from lectura import a_epoch_ms
+from particiones import origen
+
+HORA_MS = 3_600_000
+DIA_MS = 86_400_000
+
+SQL_TABLAS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        sensor_id INTEGER NOT NULL,
+        inicio_ms INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        minimo REAL NOT NULL,
+        maximo REAL NOT NULL,
+        suma REAL NOT NULL,
+        suma_cuad REAL NOT NULL,
+        PRIMARY KEY (sensor_id, inicio_ms)
+    ) WITHOUT ROWID;
+    """
+    for tabla in ("agregado_hora", "agregado_dia")
+]
+
+
+def _sql_sumar(fila: str) -> str:
+    # Suma una lectura (NEW) a su hora y a su día
+    return "\n".join(f"""
+        INSERT INTO {tabla} (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        VALUES ({fila}.sensor_id, {fila}.fecha_hora - {fila}.fecha_hora % {paso}, 1,
+                {fila}.valor, {fila}.valor, {fila}.valor, {fila}.valor * {fila}.valor)
+        ON CONFLICT (sensor_id, inicio_ms) DO UPDATE SET
+            n = n + 1,
+            minimo = MIN(minimo, excluded.minimo),
+            maximo = MAX(maximo, excluded.maximo),
+            suma = suma + excluded.suma,
+            suma_cuad = suma_cuad + excluded.suma_cuad;"""
+        for tabla, paso in (("agregado_hora", HORA_MS), ("agregado_dia", DIA_MS)))
+
+
+def _sql_recalcular(fila: str, tabla: str) -> str:
+    # mínimo/máximo no se pueden "restar": se recalcula la hora desde la tabla de la lectura (rango
+    # indexado; una hora nunca cruza de partición) y el día desde sus 24 horas
+    hora = f"({fila}.fecha_hora - {fila}.fecha_hora % {HORA_MS})"
+    dia = f"({fila}.fecha_hora - {fila}.fecha_hora % {DIA_MS})"
+    return f"""
+        DELETE FROM agregado_hora WHERE sensor_id = {fila}.sensor_id AND inicio_ms = {hora};
+        INSERT INTO agregado_hora (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        SELECT sensor_id, {hora}, COUNT(*), MIN(valor), MAX(valor), SUM(valor), SUM(valor * valor)
+          FROM {tabla}
+         WHERE sensor_id = {fila}.sensor_id AND fecha_hora >= {hora} AND fecha_hora < {hora} + {HORA_MS}
+         GROUP BY sensor_id;
+        DELETE FROM agregado_dia WHERE sensor_id = {fila}.sensor_id AND inicio_ms = {dia};
+        INSERT INTO agregado_dia (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        SELECT sensor_id, {dia}, SUM(n), MIN(minimo), MAX(maximo), SUM(suma), SUM(suma_cuad)
+          FROM agregado_hora
+         WHERE sensor_id = {fila}.sensor_id AND inicio_ms >= {dia} AND inicio_ms < {dia} + {DIA_MS}
+         GROUP BY sensor_id;"""
+
+
+def sql_triggers(tabla: str = "lectura") -> List[str]:
+    """Triggers de agregados sobre tabla: lectura o una partición lectura_AAAAMM (nombres con su sufijo)."""
+    sufijo = tabla[len("lectura"):]
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_agregado_insert{sufijo} AFTER INSERT ON {tabla} BEGIN
+        {_sql_sumar("NEW")}
+    END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_agregado_update{sufijo}
+        AFTER UPDATE OF sensor_id, fecha_hora, valor ON {tabla} BEGIN
+        {_sql_recalcular("OLD", tabla)}
+        {_sql_recalcular("NEW", tabla)}
+    END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_agregado_delete{sufijo} AFTER DELETE ON {tabla} WHEN {SIN_ARCHIVAR} BEGIN
+        {_sql_recalcular("OLD", tabla)}
+    END;""",
+    ]
+
+
+SQL_TRIGGERS = sql_triggers()
+
+
+def crear_agregados(con: sqlite3.Connection) -> None:
+    """Migración 2 (esquema.py): tablas y triggers de agregados, rellenados con el histórico."""
+    for sql in SQL_TABLAS + SQL_TRIGGERS:
+        con.execute(sql)
+    _reconstruir(con)
+
+
+def _reconstruir(con: sqlite3.Connection) -> None:
+    con.execute("DELETE FROM agregado_hora")
+    con.execute("DELETE FROM agregado_dia")
+    con.execute(f"""
+        INSERT INTO agregado_hora (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        SELECT sensor_id, fecha_hora - fecha_hora % {HORA_MS} AS h,
+               COUNT(*), MIN(valor), MAX(valor), SUM(valor), SUM(valor * valor)
+          FROM lectura
+         WHERE typeof(fecha_hora) = 'integer'
+         GROUP BY sensor_id, h
+    """)
+    # Meses ya movidos al archivo columnar (archivo.py); un mes archivado es entero, sin horas a medias
+    con.executemany("""
+        INSERT INTO agregado_hora (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT (sensor_id, inicio_ms) DO UPDATE SET
+            n = n + excluded.n,
+            minimo = MIN(minimo, excluded.minimo),
+            maximo = MAX(maximo, excluded.maximo),
+            suma = suma + excluded.suma,
+            suma_cuad = suma_cuad + excluded.suma_cuad
+    """, _horas_archivadas(con))
+    con.execute(f"""
+        INSERT INTO agregado_dia (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+        SELECT sensor_id, inicio_ms - inicio_ms % {DIA_MS} AS d,
+               SUM(n), MIN(minimo), MAX(maximo), SUM(suma), SUM(suma_cuad)
+          FROM agregado_hora
+         GROUP BY sensor_id, d
+    """)
+
+
+def _horas_archivadas(con: sqlite3.Connection):
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE name = 'archivo_lectura'").fetchone():
+        return  # BD que aún no ha llegado a la migración del archivo
+    for sensor_id, desde, hasta in con.execute("SELECT sensor_id, desde_ms, hasta_ms FROM archivo_lectura").fetchall():
+        for columnas in rangos_archivados(sensor_id, desde, hasta, con):
+            tiempos, valores = columnas.tiempos, columnas.valores
+            i = 0
+            while i < len(tiempos):
+                hora = tiempos[i] - tiempos[i] % HORA_MS
+                j = bisect_left(tiempos, hora + HORA_MS, i)
+                yield (sensor_id, hora) + _parcial_columnas(valores[i:j])
+                i = j
+
+
+def recalcular_horas(con: sqlite3.Connection, sensor_id: int, horas: Iterable[int]) -> None:
+    """Recalcula desde lectura y el archivo las horas dadas del sensor (inicio en ms) y sus días.
+
+    Para cambios que no pasan por los triggers, como reescribir lecturas ya archivadas.
+    """
+    dias = set()
+    for hora in set(horas):
+        n, mn, mx, s, s2 = _parcial(con, "lectura", "fecha_hora", sensor_id, hora, hora + HORA_MS)
+        con.execute("DELETE FROM agregado_hora WHERE sensor_id = ? AND inicio_ms = ?", (sensor_id, hora))
+        if n:
+            con.execute("""INSERT INTO agregado_hora (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+                           VALUES (?,?,?,?,?,?,?)""", (sensor_id, hora, n, mn, mx, s, s2))
+        dias.add(hora - hora % DIA_MS)
+    for dia in dias:
+        con.execute("DELETE FROM agregado_dia WHERE sensor_id = ? AND inicio_ms = ?", (sensor_id, dia))
+        con.execute("""INSERT INTO agregado_dia (sensor_id, inicio_ms, n, minimo, maximo, suma, suma_cuad)
+                       SELECT sensor_id, ?, SUM(n), MIN(minimo), MAX(maximo), SUM(suma), SUM(suma_cuad)
+                         FROM agregado_hora
+                        WHERE sensor_id = ? AND inicio_ms >= ? AND inicio_ms < ?
+                        GROUP BY sensor_id""", (dia, sensor_id, dia, dia + DIA_MS))
+
+
+def reconstruir_agregados() -> None:
+    """Recalcula todos los agregados a partir de lectura y del archivo (p. ej. tras una carga histórica)."""
+    escribir(_reconstruir)
+
+
+# ==============================
+# CONSULTA DE AGREGADOS
+# ==============================
+Parcial = Tuple[int, Optional[float], Optional[float], float, float]  # n, mín, máx, suma, suma_cuad
+
+
+def _parcial(con: sqlite3.Connection, tabla: str, columna: str, sensor_id: int, desde: int, hasta: int) -> Parcial:
+    if desde >= hasta:
+        return (0, None, None, 0.0, 0.0)
+    if tabla == "lectura":
+        sql = f"""SELECT COUNT(*), MIN(valor), MAX(valor), TOTAL(valor), TOTAL(valor * valor)
+                    FROM {origen(con, desde, hasta)} WHERE sensor_id = ? AND {columna} >= ? AND {columna} < ?"""
+    else:
+        sql = f"""SELECT TOTAL(n), MIN(minimo), MAX(maximo), TOTAL(suma), TOTAL(suma_cuad)
+                    FROM {tabla} WHERE sensor_id = ? AND {columna} >= ? AND {columna} < ?"""
+    n, mn, mx, s, s2 = con.execute(sql, (sensor_id, desde, hasta)).fetchone()
+    if tabla == "lectura":
+        # Los bordes sub-horarios de meses archivados ya no están en lectura
+        return _combinar([(int(n), mn, mx, s, s2)] + [_parcial_columnas(c.valores)
+                                                      for c in rangos_archivados(sensor_id, desde, hasta)])
+    return (int(n), mn, mx, s, s2)
+
+
+def _parcial_columnas(valores) -> Parcial:
+    if not len(valores):
+        return (0, None, None, 0.0, 0.0)
+    return (len(valores), min(valores), max(valores), sum(valores), sum(v * v for v in valores))
+
+
+def _combinar(partes) -> Parcial:
+    n, s, s2 = 0, 0.0, 0.0
+    mn: Optional[float] = None
+    mx: Optional[float] = None
+    for pn, pmin, pmax, ps, ps2 in partes:
+        if not pn:
+            continue
+        n, s, s2 = n + pn, s + ps, s2 + ps2
+        mn = pmin if mn is None else min(mn, pmin)
+        mx = pmax if mx is None else max(mx, pmax)
+    return (n, mn, mx, s, s2)
+
+
+def _techo(t: int, paso: int) -> int:
+    return -(-t // paso) * paso
+
+
+def consultar_agregado(sensor_id: int, desde: datetime, hasta: datetime) -> Dict[str, Optional[float]]:
+    """n, mínimo, máximo, media y varianza (poblacional) del sensor en [desde, hasta).
+
+    El rango se parte en: bordes sub-horarios sobre lectura, horas sueltas sobre agregado_hora
+    y días completos sobre agregado_dia, así el coste depende del número de días y no de filas.
+    """
+    ini, fin = a_epoch_ms(desde), a_epoch_ms(hasta)
+    h1 = min(_techo(ini, HORA_MS), fin)
+    h2 = max(fin - fin % HORA_MS, h1)
+    d1 = min(_techo(h1, DIA_MS), h2)
+    d2 = max(h2 - h2 % DIA_MS, d1)
+    con = obtener_conexion()
+    n, mn, mx, s, s2 = _combinar([
+        _parcial(con, "lectura", "fecha_hora", sensor_id, ini, h1),
+        _parcial(con, "agregado_hora", "inicio_ms", sensor_id, h1, d1),
+        _parcial(con, "agregado_dia", "inicio_ms", sensor_id, d1, d2),
+        _parcial(con, "agregado_hora", "inicio_ms", sensor_id, d2, h2),
+        _parcial(con, "lectura", "fecha_hora", sensor_id, h2, fin),
+    ])
+    if not n:
+        return {"n": 0, "minimo": None, "maximo": None, "media": None, "varianza": None}
+    media = s / n
+    return {"n": n, "minimo": mn, "maximo": mx, "media": media, "varianza": max(0.0, s2 / n - media * media)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregados horarios/diarios de lecturas")
+    parser.add_argument("accion", choices=["reconstruir"])
+    args = parser.parse_args()
+    reconstruir_agregados()
+    print("Agregados reconstruidos.")
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from datetime import timedelta
+    import meteorologiadb
+    from conexion import configurar, cerrar_conexiones
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "a.db"))
+        meteorologiadb.crear_bd()
+        meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        meteorologiadb.insertar("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('temperatura', 'C', 0.1, 1)")
+        t0 = datetime(2025, 1, 1)
+        meteorologiadb.insertar_lecturas((1, t0 + timedelta(minutes=10 * i), float(i), "OK", "automatica")
+                                         for i in range(6 * 24 * 3))
+        completo = consultar_agregado(1, t0, t0 + timedelta(days=3))
+        assert completo["n"] == 432 and completo["minimo"] == 0.0 and completo["maximo"] == 431.0
+        parcial = consultar_agregado(1, t0 + timedelta(minutes=25), t0 + timedelta(days=2, minutes=5))
+        assert parcial["n"] == len(range(3, 6 * 24 * 2 + 1))
+        meteorologiadb.eliminar("DELETE FROM lectura WHERE valor = 431.0")
+        antes = consultar_agregado(1, t0, t0 + timedelta(days=3))
+        assert antes["maximo"] == 430.0
+        reconstruir_agregados()
+        assert consultar_agregado(1, t0, t0 + timedelta(days=3)) == antes
+        cerrar_conexiones()
+    print("[agregados] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,480 @@
+# Módulo de archivo frío de lecturas en formato columnar
+# Cada mes cerrado de cada sensor sale de su partición de lectura a un fichero .col con columnas contiguas
+# (tiempos int64, valores float64, calidad y fuente codificadas con diccionario en uint8) que se lee con mmap
+from __future__ import annotations
+import heapq
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from conexion import escribir, obtener_conexion, ruta_bd
+from lectura import a_epoch_ms
+from particiones import Fila, limites_mes, origen, particiones, soltar
+
+MAGIA = b"LCOL"
+VERSION_FORMATO = 1
+# magia, versión, orden de bytes (1 = little endian), relleno, sensor_id, desde_ms, hasta_ms, n,
+# longitud del diccionario de calidad y del de fuente (JSON UTF-8)
+CABECERA = struct.Struct("<4sHBxqqqQII")
+MAX_ABIERTOS = 64  # ficheros mapeados a la vez; cada mmap retiene un descriptor de fichero
+
+SQL_CATALOGO = [
+    """
+    CREATE TABLE IF NOT EXISTS archivo_lectura (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id INTEGER NOT NULL,
+        desde_ms INTEGER NOT NULL,
+        hasta_ms INTEGER NOT NULL,    -- exclusivo
+        n INTEGER NOT NULL,
+        archivo TEXT NOT NULL,        -- relativo a directorio_archivo()
+        UNIQUE (sensor_id, desde_ms)
+    );
+    """,
+    # Fin del último mes archivado: la ingesta de lecturas posteriores no mira el archivo
+    "CREATE INDEX IF NOT EXISTS idx_archivo_hasta ON archivo_lectura(hasta_ms);",
+    # Sensor cuyo mes se está moviendo al archivo; sólo tiene filas dentro de esa transacción
+    """
+    CREATE TABLE IF NOT EXISTS archivo_en_curso (
+        sensor_id INTEGER PRIMARY KEY
+    ) WITHOUT ROWID;
+    """,
+]
+
+# Condición WHEN de los triggers AFTER DELETE de lectura: los agregados, la última lectura, el
+# conteo y la versión de la tabla conservan las lecturas que se mueven al archivo
+SIN_ARCHIVAR = "NOT EXISTS (SELECT 1 FROM archivo_en_curso WHERE sensor_id = OLD.sensor_id)"
+
+
+def crear_catalogo(con: sqlite3.Connection) -> None:
+    """Migración 4 (esquema.py): catálogo de ficheros archivados (archivo_en_curso e índice: 8 y 9)."""
+    for sql in SQL_CATALOGO:
+        con.execute(sql)
+
+
+def directorio_archivo() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(ruta_bd())), "archivo_lecturas")
+
+
+# ==============================
+# FORMATO COLUMNAR
+# ==============================
+def _alinear(n: int) -> int:
+    return -(-n // 8) * 8
+
+
+def _codificar(textos: List[Optional[str]]) -> Tuple[List[Optional[str]], array]:
+    diccionario: Dict[Optional[str], int] = {}
+    codigos = array("B")
+    for t in textos:
+        codigo = diccionario.setdefault(t, len(diccionario))
+        if codigo > 255:
+            raise ValueError("más de 256 valores distintos de calidad/fuente en un mismo fichero")
+        codigos.append(codigo)
+    return list(diccionario), codigos
+
+
+def escribir_columnar(ruta: str, sensor_id: int, desde_ms: int, hasta_ms: int,
+                      tiempos: array, valores: array, calidad: List[Optional[str]],
+                      fuente: List[Optional[str]]) -> None:
+    """Escribe (y sincroniza a disco) un fichero columnar; tiempos debe venir ordenado."""
+    dic_calidad, cod_calidad = _codificar(calidad)
+    dic_fuente, cod_fuente = _codificar(fuente)
+    json_calidad = json.dumps(dic_calidad).encode("utf-8")
+    json_fuente = json.dumps(dic_fuente).encode("utf-8")
+    cabecera = CABECERA.pack(MAGIA, VERSION_FORMATO, sys.byteorder == "little", sensor_id, desde_ms,
+                             hasta_ms, len(tiempos), len(json_calidad), len(json_fuente))
+    prefijo = cabecera + json_calidad + json_fuente
+    with open(ruta, "wb") as f:
+        # Las columnas de 8 bytes empiezan alineadas para poder hacer cast() sobre el mmap
+        f.write(prefijo + b"\0" * (_alinear(len(prefijo)) - len(prefijo)))
+        tiempos.tofile(f)
+        valores.tofile(f)
+        cod_calidad.tofile(f)
+        cod_fuente.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class Columnas(NamedTuple):
+    """Vistas sin copia sobre un rango de un fichero archivado."""
+    sensor_id: int
+    tiempos: memoryview     # int64, epoch en ms
+    valores: memoryview     # float64
+    calidad: memoryview     # uint8, índice en dic_calidad
+    fuente: memoryview      # uint8, índice en dic_fuente
+    dic_calidad: List[Optional[str]]
+    dic_fuente: List[Optional[str]]
+
+    def filas(self) -> List[Fila]:
+        dc, df = self.dic_calidad, self.dic_fuente
+        return [(self.sensor_id, t, v, dc[c], df[f])
+                for t, v, c, f in zip(self.tiempos, self.valores, self.calidad, self.fuente)]
+
+
+class ArchivoColumnar:
+    def __init__(self, ruta: str) -> None:
+        with open(ruta, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vista = memoryview(self._mmap)
+        magia, version, little, self.sensor_id, self.desde_ms, self.hasta_ms, n, lc, lf = \
+            CABECERA.unpack_from(vista)
+        if magia != MAGIA or version != VERSION_FORMATO:
+            raise ValueError(f"{ruta}: no es un archivo columnar de lecturas")
+        if bool(little) != (sys.byteorder == "little"):
+            raise ValueError(f"{ruta}: escrito con otro orden de bytes")
+        inicio = CABECERA.size
+        self.dic_calidad = json.loads(bytes(vista[inicio:inicio + lc]))
+        self.dic_fuente = json.loads(bytes(vista[inicio + lc:inicio + lc + lf]))
+        inicio = _alinear(inicio + lc + lf)
+        self.tiempos = vista[inicio:inicio + 8 * n].cast("q")
+        self.valores = vista[inicio + 8 * n:inicio + 16 * n].cast("d")
+        self.calidad = vista[inicio + 16 * n:inicio + 17 * n]
+        self.fuente = vista[inicio + 17 * n:inicio + 18 * n]
+
+    def __len__(self) -> int:
+        return len(self.tiempos)
+
+    def rango(self, desde_ms: int, hasta_ms: int) -> Columnas:
+        """Columnas de las lecturas con desde_ms <= fecha_hora < hasta_ms (búsqueda binaria)."""
+        i = bisect_left(self.tiempos, desde_ms)
+        j = bisect_left(self.tiempos, hasta_ms, i)
+        return Columnas(self.sensor_id, self.tiempos[i:j], self.valores[i:j], self.calidad[i:j],
+                        self.fuente[i:j], self.dic_calidad, self.dic_fuente)
+
+    def cerrar(self) -> None:
+        # Si alguien conserva Columnas de este fichero, el mmap (y su descriptor) se libera
+        # cuando las suelte; hasta entonces siguen siendo válidas
+        for vista in (self.tiempos, self.valores, self.calidad, self.fuente):
+            vista.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+# Los ficheros no cambian una vez escritos (un re-archivado crea otro), así el mmap se reutiliza
+# entre consultas; sólo siguen abiertos los MAX_ABIERTOS usados más recientemente
+_abiertos: "OrderedDict[str, ArchivoColumnar]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def abrir_rango(ruta: str, desde_ms: int, hasta_ms: int) -> Columnas:
+    """Columnas del fichero en [desde_ms, hasta_ms), mapeándolo si no lo está ya."""
+    with _lock:
+        archivo = _abiertos.get(ruta)
+        if archivo is None:
+            if len(_abiertos) >= MAX_ABIERTOS:
+                _abiertos.popitem(last=False)[1].cerrar()
+            archivo = _abiertos[ruta] = ArchivoColumnar(ruta)
+        else:
+            _abiertos.move_to_end(ruta)
+        # Dentro del candado: otro hilo podría cerrar el fichero entre abrirlo y cortar el rango
+        return archivo.rango(desde_ms, hasta_ms)
+
+
+def cerrar(ruta: str) -> None:
+    """Desmapea el fichero si está abierto (p. ej. porque un re-archivado lo ha sustituido)."""
+    with _lock:
+        archivo = _abiertos.pop(ruta, None)
+        if archivo is not None:
+            archivo.cerrar()
+
+
+# ==============================
+# ARCHIVADO
+# ==============================
+def _publicar(con: sqlite3.Connection, sensor_id: int, desde: int, hasta: int,
+              filas: List[Tuple[int, float, Optional[str], Optional[str]]]) -> str:
+    # Escribe el fichero del mes con filas (fecha_hora, valor, calidad, fuente) ordenadas y lo
+    # registra en el catálogo (sin fila previa del mes); devuelve su ruta
+    cur = con.execute("""INSERT INTO archivo_lectura (sensor_id, desde_ms, hasta_ms, n, archivo)
+                         VALUES (?,?,?,?,'')""", (sensor_id, desde, hasta, len(filas)))
+    nombre = f"s{sensor_id}_{limites_mes(desde)[0]}_{cur.lastrowid}.col"
+    ruta = os.path.join(directorio_archivo(), nombre)
+    os.makedirs(directorio_archivo(), exist_ok=True)
+    escribir_columnar(ruta, sensor_id, desde, hasta,
+                      array("q", (f[0] for f in filas)), array("d", (f[1] for f in filas)),
+                      [f[2] for f in filas], [f[3] for f in filas])
+    try:
+        con.execute("UPDATE archivo_lectura SET archivo = ? WHERE id = ?", (nombre, cur.lastrowid))
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return ruta
+
+
+def _publicar_mes(con: sqlite3.Connection, sensor_id: int, desde: int, hasta: int,
+                  filas: List[Tuple[int, float, Optional[str], Optional[str]]]) -> Tuple[str, Optional[str]]:
+    # Publica las filas del sensor y mes; devuelve la ruta nueva y el fichero al que sustituye
+    previo = con.execute("SELECT id, archivo FROM archivo_lectura WHERE sensor_id = ? AND desde_ms = ?",
+                         (sensor_id, desde)).fetchone()
+    if previo is not None:
+        # Lecturas tardías de un mes ya archivado: se funden con el fichero anterior (gana la de la BD)
+        nuevas = {f[0] for f in filas}
+        viejas = [f[1:] for f in abrir_rango(os.path.join(directorio_archivo(), previo[1]), desde, hasta).filas()
+                  if f[1] not in nuevas]
+        filas = list(heapq.merge(viejas, filas))
+        con.execute("DELETE FROM archivo_lectura WHERE id = ?", (previo[0],))
+    return _publicar(con, sensor_id, desde, hasta, filas), previo[1] if previo else None
+
+
+def _archivar_mes(con: sqlite3.Connection, particion: str, sensor_id: int, desde: int,
+                  hasta: int) -> Tuple[int, List[str]]:
+    # Un sensor de la partición: su mes pasa al archivo y sus filas se borran de la partición
+    filas = con.execute(f"""SELECT fecha_hora, valor, calidad_dato, fuente FROM {particion}
+                             WHERE sensor_id = ? ORDER BY fecha_hora""", (sensor_id,)).fetchall()
+    if not filas:
+        return 0, []
+    ruta, reemplazado = _publicar_mes(con, sensor_id, desde, hasta, filas)
+    try:
+        # Los agregados y la última lectura ya incluyen estas filas: con el sensor en
+        # archivo_en_curso los triggers AFTER DELETE no las descuentan (sin tocar el esquema)
+        con.execute("INSERT INTO archivo_en_curso (sensor_id) VALUES (?)", (sensor_id,))
+        con.execute(f"DELETE FROM {particion} WHERE sensor_id = ?", (sensor_id,))
+        con.execute("DELETE FROM archivo_en_curso WHERE sensor_id = ?", (sensor_id,))
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return len(filas), [reemplazado] if reemplazado else []
+
+
+def _archivar_particion(con: sqlite3.Connection, particion: str, desde: int,
+                        hasta: int) -> Tuple[int, int, List[str]]:
+    # Todos los sensores del mes y después DROP TABLE de la partición: sin DELETE ni triggers, así
+    # las tablas derivadas conservan sus filas. Devuelve filas movidas, ficheros escritos y sustituidos
+    escritos: List[str] = []
+    reemplazados: List[str] = []
+    movidas = 0
+    try:
+        sensor = con.execute(f"SELECT MIN(sensor_id) FROM {particion}").fetchone()[0]
+        while sensor is not None:
+            filas = con.execute(f"""SELECT fecha_hora, valor, calidad_dato, fuente FROM {particion}
+                                     WHERE sensor_id = ? ORDER BY fecha_hora""", (sensor,)).fetchall()
+            ruta, reemplazado = _publicar_mes(con, sensor, desde, hasta, filas)
+            escritos.append(ruta)
+            if reemplazado:
+                reemplazados.append(reemplazado)
+            movidas += len(filas)
+            sensor = con.execute(f"SELECT MIN(sensor_id) FROM {particion} WHERE sensor_id > ?",
+                                 (sensor,)).fetchone()[0]
+        soltar(con, particion)
+    except BaseException:
+        for ruta in escritos:
+            os.remove(ruta)
+        raise
+    return movidas, len(escritos), reemplazados
+
+
+def descartar(nombres: Iterable[str]) -> None:
+    """Borra ficheros que ya no figuran en el catálogo (sustituidos por otro del mismo mes)."""
+    for nombre in nombres:
+        ruta = os.path.join(directorio_archivo(), nombre)
+        cerrar(ruta)
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass  # sigue mapeado (p. ej. en Windows); ya no figura en el catálogo
+
+
+def archivar(antes_de: datetime, sensor_id: Optional[int] = None) -> Dict[str, int]:
+    """Mueve al archivo columnar los meses completos anteriores a antes_de, un mes por transacción.
+
+    Sin sensor_id cada mes sale entero de su partición, que se descarta con DROP TABLE; con
+    sensor_id sólo se borran de la partición las filas de ese sensor. El mes que contiene
+    antes_de sigue en la BD. Devuelve ficheros escritos y filas movidas.
+    """
+    _, limite, _ = limites_mes(a_epoch_ms(antes_de))
+    ficheros = filas = 0
+    for nombre, desde, hasta in particiones(obtener_conexion()):
+        if hasta > limite:
+            break
+        if sensor_id is None:
+            movidas, escritos, reemplazados = escribir(lambda c: _archivar_particion(c, nombre, desde, hasta))
+        else:
+            movidas, reemplazados = escribir(lambda c: _archivar_mes(c, nombre, sensor_id, desde, hasta))
+            escritos = int(movidas > 0)
+        descartar(reemplazados)
+        ficheros += escritos
+        filas += movidas
+    return {"ficheros": ficheros, "filas": filas}
+
+
+# ==============================
+# LECTURAS REENVIADAS DE MESES ARCHIVADOS
+# ==============================
+# Ya no están en la tabla lectura, así que INSERT ... ON CONFLICT no las ve: meteorologiadb las
+# busca aquí antes de insertar y aplica su política de conflicto sobre el fichero
+def lecturas_archivadas(con: sqlite3.Connection, filas: Sequence[Fila]) -> Dict[int, Fila]:
+    """Lectura archivada con el mismo (sensor_id, fecha_hora) que cada fila que la tenga, por su posición.
+
+    Las filas posteriores al último mes archivado (la ingesta normal) se descartan con una única
+    búsqueda en idx_archivo_hasta; el resto se busca en el fichero de su sensor y mes.
+    """
+    limite = con.execute("SELECT MAX(hasta_ms) FROM archivo_lectura").fetchone()[0]
+    if limite is None:
+        return {}
+    meses: Dict[Tuple[int, int], List[int]] = {}
+    desde, hasta = 0, -1
+    for i, fila in enumerate(filas):
+        if fila[1] >= limite:
+            continue
+        if not desde <= fila[1] < hasta:
+            _, desde, hasta = limites_mes(fila[1])
+        meses.setdefault((fila[0], desde), []).append(i)
+    encontradas: Dict[int, Fila] = {}
+    for (sensor_id, desde), posiciones in meses.items():
+        mes = con.execute("SELECT archivo, hasta_ms FROM archivo_lectura WHERE sensor_id = ? AND desde_ms = ?",
+                          (sensor_id, desde)).fetchone()
+        if mes is None:
+            continue
+        c = abrir_rango(os.path.join(directorio_archivo(), mes[0]), desde, mes[1])
+        for i in posiciones:
+            t = filas[i][1]
+            j = bisect_left(c.tiempos, t)
+            if j < len(c.tiempos) and c.tiempos[j] == t:
+                encontradas[i] = (sensor_id, t, c.valores[j], c.dic_calidad[c.calidad[j]], c.dic_fuente[c.fuente[j]])
+    return encontradas
+
+
+def reescribir_archivadas(con: sqlite3.Connection, filas: Iterable[Fila]) -> List[str]:
+    """Sustituye lecturas archivadas por filas con el mismo (sensor_id, fecha_hora); un fichero nuevo por mes.
+
+    Devuelve los ficheros sustituidos, que se borran con descartar() una vez confirmada la transacción.
+    Los agregados y demás tablas de los triggers quedan a cargo del llamante.
+    """
+    por_mes: Dict[Tuple[int, int], Dict[int, Tuple]] = {}
+    for fila in filas:
+        por_mes.setdefault((fila[0], limites_mes(fila[1])[1]), {})[fila[1]] = fila[1:]
+    sustituidos = []
+    for (sensor_id, desde), nuevas in por_mes.items():
+        id_mes, nombre, hasta = con.execute("""SELECT id, archivo, hasta_ms FROM archivo_lectura
+                                                WHERE sensor_id = ? AND desde_ms = ?""", (sensor_id, desde)).fetchone()
+        viejas = abrir_rango(os.path.join(directorio_archivo(), nombre), desde, hasta).filas()
+        con.execute("DELETE FROM archivo_lectura WHERE id = ?", (id_mes,))
+        _publicar(con, sensor_id, desde, hasta, [nuevas.get(f[1], f[1:]) for f in viejas])
+        sustituidos.append(nombre)
+    return sustituidos
+
+
+# ==============================
+# LECTURA TRANSPARENTE (ARCHIVO + BD)
+# ==============================
+def rangos_archivados(sensor_id: int, desde_ms: int, hasta_ms: int,
+                      con: Optional[sqlite3.Connection] = None) -> List[Columnas]:
+    """Vistas sin copia de los ficheros archivados del sensor que se solapan con [desde_ms, hasta_ms)."""
+    ficheros = (con or obtener_conexion()).execute("""SELECT archivo FROM archivo_lectura
+                                              WHERE sensor_id = ? AND desde_ms < ? AND hasta_ms > ?
+                                              ORDER BY desde_ms""", (sensor_id, hasta_ms, desde_ms))
+    directorio = directorio_archivo()
+    return [abrir_rango(os.path.join(directorio, nombre), desde_ms, hasta_ms) for (nombre,) in ficheros]
+
+
+def consultar_rango(sensor_id: int, desde: datetime, hasta: datetime) -> List[Fila]:
+    """Lecturas (sensor_id, fecha_hora_ms, valor, calidad_dato, fuente) en [desde, hasta), ordenadas,
+    tanto archivadas como de las particiones de lectura."""
+    desde_ms, hasta_ms = a_epoch_ms(desde), a_epoch_ms(hasta)
+    con = obtener_conexion()
+    vivas = con.execute(f"""SELECT sensor_id, fecha_hora, valor, calidad_dato, fuente
+                              FROM {origen(con, desde_ms, hasta_ms)}
+                             WHERE sensor_id = ? AND fecha_hora >= ? AND fecha_hora < ?
+                             ORDER BY fecha_hora""", (sensor_id, desde_ms, hasta_ms)).fetchall()
+    archivadas = [c.filas() for c in rangos_archivados(sensor_id, desde_ms, hasta_ms)]
+    if not archivadas:
+        return vivas
+    return list(heapq.merge(*archivadas, vivas, key=lambda f: f[1]))
+
+
+# --- Pruebas ---
+"""def _tests():
+    import tempfile
+    from datetime import timedelta
+    import meteorologiadb
+    from agregados import consultar_agregado, reconstruir_agregados
+    from conexion import configurar, cerrar_conexiones
+    from ultima_lectura import ultimas_lecturas
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "a.db"))
+        meteorologiadb.crear_bd()
+        meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        meteorologiadb.insertar("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('temperatura', 'C', 0.1, 1)")
+        t0 = datetime(2025, 1, 1)
+        meteorologiadb.insertar_lecturas((1, t0 + timedelta(hours=i), float(i), "OK" if i % 7 else "FLAG", "automatica")
+                                         for i in range(24 * 90))
+        antes = consultar_rango(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80))
+        stats = consultar_agregado(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80))
+        assert archivar(datetime(2025, 3, 15)) == {"ficheros": 2, "filas": 24 * (31 + 28)}
+        assert [p[0] for p in particiones(obtener_conexion())] == ["lectura_202503"]  # los meses salen enteros
+        assert meteorologiadb.listar("SELECT COUNT(*) FROM lectura")[0][0] == 24 * 90 - 24 * 59
+        assert consultar_rango(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80)) == antes
+        assert consultar_agregado(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80)) == stats
+        assert ultimas_lecturas()[0]["valor"] == 24 * 90 - 1
+        reconstruir_agregados()
+        assert consultar_agregado(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80)) == stats
+        cols = rangos_archivados(1, a_epoch_ms(t0), a_epoch_ms(t0 + timedelta(days=1)))[0]
+        assert len(cols.tiempos) == 24 and cols.valores.format == "d" and cols.valores[23] == 23.0
+        # Lectura tardía en un mes ya archivado; por sensor se borra de la partición sin tocar el esquema
+        meteorologiadb.insertar_lecturas([(1, t0 + timedelta(minutes=1), -1.0, "OK", "manual")])
+        esquema = obtener_conexion().execute("PRAGMA schema_version").fetchone()[0]
+        assert archivar(datetime(2025, 3, 15), sensor_id=1) == {"ficheros": 1, "filas": 1}
+        assert obtener_conexion().execute("PRAGMA schema_version").fetchone()[0] == esquema
+        assert consultar_rango(1, t0, t0 + timedelta(hours=1))[-1][2:] == (-1.0, "OK", "manual")
+        # El listado paginado funde archivo y tabla en orden (sensor_id, fecha_hora)
+        meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('humedad', '%', 1, 1)")
+        meteorologiadb.insertar_lecturas([(2, t0 + timedelta(days=40), 50.0, "OK", "manual")])
+        paginas = list(meteorologiadb.paginas_lecturas(tamano_pagina=7))
+        filas = [f for p in paginas for f in p]
+        assert all(len(p) == 7 for p in paginas[:-1]) and len(filas) == 24 * 90 + 2
+        assert [f[:2] for f in filas] == sorted(f[:2] for f in filas)
+        assert filas[1][1:] == (a_epoch_ms(t0 + timedelta(minutes=1)), -1.0, "OK", "manual", "temperatura", "C")
+        assert filas[-1][:3] == (2, a_epoch_ms(t0 + timedelta(days=40)), 50.0)
+        rango = [f for p in meteorologiadb.paginas_lecturas(1, t0 + timedelta(days=58), t0 + timedelta(days=60), 5) for f in p]
+        assert [f[1] for f in rango] == [f[1] for f in consultar_rango(1, t0 + timedelta(days=58), t0 + timedelta(days=60))]
+        assert len(rango) == 48
+        meteorologiadb.eliminar("DELETE FROM lectura WHERE sensor_id = 2")
+        assert len(_abiertos) == 2 and all(os.path.exists(ruta) for ruta in _abiertos)  # el sustituido se cerró
+        # Con el límite alcanzado se cierra el menos reciente, aunque sus Columnas sigan en uso
+        global MAX_ABIERTOS
+        MAX_ABIERTOS = 1
+        for ruta in list(_abiertos):
+            cerrar(ruta)
+        assert consultar_rango(1, t0 + timedelta(minutes=30), t0 + timedelta(days=80)) == antes
+        assert len(_abiertos) == 1
+        MAX_ABIERTOS = 64
+        # Reenviar lecturas archivadas: ON CONFLICT no las ve, se comparan con el fichero
+        con = obtener_conexion()
+        conteo = lambda: con.execute("SELECT n FROM lectura_conteo WHERE sensor_id = 1").fetchone()[0]
+        n, total = consultar_agregado(1, t0, t0 + timedelta(days=59))["n"], conteo()
+        reenvio = [(1, t0 + timedelta(hours=i), float(i), "OK" if i % 7 else "FLAG", "automatica") for i in range(49)]
+        res = meteorologiadb.insertar_lecturas(reenvio, politica="ignorar")
+        assert (res["insertadas"], res["omitidas"]) == (0, 49)
+        assert meteorologiadb.insertar_lecturas(reenvio, politica="reemplazar")["omitidas"] == 49
+        assert consultar_agregado(1, t0, t0 + timedelta(days=59))["n"] == n and conteo() == total
+        try:
+            meteorologiadb.insertar_lecturas(reenvio[:1])
+            raise AssertionError("un duplicado archivado sin política debe fallar")
+        except sqlite3.IntegrityError:
+            pass
+        # mejor_calidad sustituye la lectura FLAG de las 7:00 en el fichero y rehace su hora
+        res = meteorologiadb.insertar_lecturas([(1, t0 + timedelta(hours=7), 70.0, "OK", "manual")],
+                                               politica="mejor_calidad")
+        assert (res["insertadas"], res["actualizadas"]) == (0, 1)
+        assert consultar_rango(1, t0 + timedelta(hours=7), t0 + timedelta(hours=8))[0][2:] == (70.0, "OK", "manual")
+        assert consultar_agregado(1, t0 + timedelta(hours=7), t0 + timedelta(hours=8))["maximo"] == 70.0
+        assert consultar_agregado(1, t0, t0 + timedelta(days=1))["maximo"] == 70.0
+        assert consultar_agregado(1, t0, t0 + timedelta(days=59))["n"] == n and conteo() == total
+        assert len(os.listdir(directorio_archivo())) == 2  # el fichero sustituido se borró
+        cerrar_conexiones()
+    print("[archivo] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,807 @@
+# Benchmarks de la capa de almacenamiento (solo librería estándar)
+# Uso: python benchmarks.py <escenario> [--n N]
+import argparse
+import math
+import os
+import sqlite3
+import tempfile
+import random
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import conexion
+import esquema
+import meteorologiadb
+import archivo
+import calidad
+import conteos
+import informe
+import particiones
+import series
+from agregados import consultar_agregado
+from lectura import Lectura, LecturaBatch
+from sensores import SensorTemperatura
+import sensores
+from ultima_lectura import ultimas_lecturas
+from estacion import EstacionMeteorologica
+import simulador
+from repositorio import Repositorio
+
+
+def _preparar_bd(directorio, sensores=1):
+    """Crea una BD temporal con una parcela, una estación y n sensores; devuelve el id del primero."""
+    conexion.configurar(os.path.join(directorio, "bench.db"))
+    meteorologiadb.crear_bd()
+    meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES (?,?,?)",
+                            ("Parcela Bench", 6.25, -75.57))
+    meteorologiadb.insertar("""INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id)
+                               VALUES (?,?,?,?)""", ("Estación Bench", 6.25, -75.57, 1))
+    for _ in range(sensores):
+        meteorologiadb.insertar("""INSERT INTO sensor (tipo, unidad, precision, estacion_id)
+                                   VALUES (?,?,?,?)""", ("temperatura", "°C", 0.1, 1))
+    return 1
+
+
+def _tuplas_lectura(sensor_id, n, inicio=datetime(2025, 1, 1)):
+    for i in range(n):
+        yield (sensor_id, inicio + timedelta(seconds=i), 20.0 + (i % 100) / 10, "OK", "automatica")
+
+
+def bench_ingesta(n):
+    """Compara una transacción por lectura contra insertar_lecturas() por lotes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sensor_id = _preparar_bd(tmp)
+        n_fila = max(1, n // 10)  # el camino fila a fila es órdenes de magnitud más lento
+        res = meteorologiadb.insertar_lecturas(_tuplas_lectura(sensor_id, n_fila), tamano_lote=1)
+        print(f"fila a fila (lote=1)   : {res['filas']:>8} filas  {res['filas_por_segundo']:>12.0f} filas/s")
+
+        # Vaciar lectura por meses (DROP TABLE) no dispara los triggers de borrado fila a fila
+        meteorologiadb.eliminar_meses_anteriores(datetime(2100, 1, 1))
+        for lote in (100, 1000, 10000):
+            res = meteorologiadb.insertar_lecturas(_tuplas_lectura(sensor_id, n), tamano_lote=lote)
+            print(f"insertar_lecturas(lote={lote:<5}): {res['filas']:>8} filas  "
+                  f"{res['filas_por_segundo']:>12.0f} filas/s")
+            meteorologiadb.eliminar_meses_anteriores(datetime(2100, 1, 1))
+        conexion.cerrar_conexiones()
+
+
+def bench_conexion(n):
+    """Consulta pequeña con connect+PRAGMA por llamada frente a la conexión compartida del hilo."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sensor_id = _preparar_bd(tmp)
+        consulta = "SELECT id, tipo, unidad FROM sensor WHERE id=?"
+        n = max(1, n // 10)
+
+        inicio = time.perf_counter()
+        for _ in range(n):
+            con = sqlite3.connect(conexion.ruta_bd())
+            con.execute("PRAGMA foreign_keys = ON;")
+            con.execute(consulta, (sensor_id,)).fetchall()
+            con.close()
+        seg = time.perf_counter() - inicio
+        print(f"connect por llamada : {n / seg:>10.0f} consultas/s  ({seg / n * 1e6:.1f} µs/consulta)")
+
+        inicio = time.perf_counter()
+        for _ in range(n):
+            meteorologiadb.listar(consulta, (sensor_id,))
+        seg = time.perf_counter() - inicio
+        print(f"conexión compartida : {n / seg:>10.0f} consultas/s  ({seg / n * 1e6:.1f} µs/consulta)")
+        conexion.cerrar_conexiones()
+
+
+ESPERA_LECTOR = 0.05  # s que un lector espera a un cerrojo del escritor (busy timeout)
+# Filas por transacción de ingesta: un lote así desborda la caché de páginas del escritor, que sin
+# WAL toma el cerrojo exclusivo hasta el commit y deja fuera a los lectores durante todo ese tiempo
+LOTE_CONCURRENCIA = 100_000
+
+
+def _medir_concurrencia(n, wal):
+    with tempfile.TemporaryDirectory() as tmp:
+        sensor_id = _preparar_bd(tmp)
+        if wal:
+            conexion.activar_wal()
+        # La partición del mes ya existe, como en la ingesta continua (se crea una vez al mes)
+        conexion.escribir(lambda c: esquema.crear_particion(
+            c, *particiones.limites_mes(meteorologiadb.fecha_a_bd(datetime(2025, 1, 1)))))
+        fin = threading.Event()
+        latencias, bloqueos = [], [0]
+
+        def lector():
+            # Simula un informe: transacción de lectura que se mantiene abierta unos milisegundos; si
+            # no obtiene el cerrojo en ESPERA_LECTOR segundos cuenta como bloqueada
+            con = sqlite3.connect(conexion.ruta_bd(), timeout=ESPERA_LECTOR, isolation_level=None)
+            while not fin.is_set():
+                t0 = time.perf_counter()
+                try:
+                    con.execute("BEGIN")
+                    con.execute("SELECT MAX(fecha_hora) FROM lectura").fetchone()
+                    time.sleep(0.005)
+                    con.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    bloqueos[0] += 1
+                    if con.in_transaction:
+                        con.execute("ROLLBACK")
+                latencias.append(time.perf_counter() - t0 - 0.005)
+            con.close()
+
+        hilos = [threading.Thread(target=lector) for _ in range(2)]
+        for h in hilos:
+            h.start()
+        res = meteorologiadb.insertar_lecturas(_tuplas_lectura(sensor_id, n), tamano_lote=LOTE_CONCURRENCIA)
+        fin.set()
+        for h in hilos:
+            h.join()
+        conexion.configurar(wal=False)
+        latencias.sort()
+        modo = "WAL + escritor único" if wal else "journal por defecto "
+        print(f"{modo}: escritura {res['filas_por_segundo']:>9.0f} filas/s | lecturas {len(latencias):>6} "
+              f"| p99 {latencias[int(len(latencias) * 0.99)] * 1000:>7.2f} ms "
+              f"| máx {latencias[-1] * 1000:>7.2f} ms | bloqueadas {bloqueos[0]}")
+
+
+def bench_concurrencia(n):
+    """Lectores concurrentes mientras se ingieren n lecturas, con y sin WAL."""
+    _medir_concurrencia(n, wal=False)
+    _medir_concurrencia(n, wal=True)
+
+
+def _medir_rangos(con, sensores, inicio, n_por_sensor, consultas=2000, como_texto=False):
+    """Consultas de rango de una hora sobre el índice (sensor_id, fecha_hora); devuelve µs por consulta."""
+    rnd = random.Random(42)
+    t0 = time.perf_counter()
+    for _ in range(consultas):
+        sensor_id = rnd.randint(1, sensores)
+        desde = inicio + timedelta(minutes=rnd.randint(0, n_por_sensor - 60))
+        hasta = desde + timedelta(hours=1)
+        if como_texto:
+            lim = (desde.strftime("%Y-%m-%d %H:%M:%S"), hasta.strftime("%Y-%m-%d %H:%M:%S"))
+        else:
+            lim = (meteorologiadb.fecha_a_bd(desde), meteorologiadb.fecha_a_bd(hasta))
+        con.execute("""SELECT COUNT(*), AVG(valor) FROM lectura
+                        WHERE sensor_id=? AND fecha_hora >= ? AND fecha_hora < ?""", (sensor_id, *lim)).fetchone()
+    return (time.perf_counter() - t0) / consultas * 1e6
+
+
+def _tamano_indices(con):
+    filas = con.execute("""SELECT name, SUM(pgsize) FROM dbstat
+                            WHERE name IN ('sqlite_autoindex_lectura_1', 'lectura')
+                            GROUP BY name ORDER BY name""").fetchall()
+    return ", ".join(f"{nombre}={tam / 1e6:.1f} MB" for nombre, tam in filas)
+
+
+def bench_fecha(n):
+    """fecha_hora como texto (formato anterior) frente a epoch en ms tras la migración en sitio.
+
+    Sobre una BD anterior al versionado (sólo esquema.SQL_TABLAS): la tabla lectura única que
+    la migración 1 convierte antes de repartirla en particiones.
+    """
+    sensores, inicio = 10, datetime(2025, 1, 1)
+    n_por_sensor = max(120, n // sensores)
+    with tempfile.TemporaryDirectory() as tmp:
+        conexion.configurar(os.path.join(tmp, "bench.db"))
+        con = conexion.obtener_conexion()
+        with con:
+            for sql in esquema.SQL_TABLAS:
+                con.execute(sql)
+            con.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('Parcela Bench', 6.25, -75.57)")
+            con.execute("""INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id)
+                           VALUES ('Estación Bench', 6.25, -75.57, 1)""")
+            con.executemany("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES (?,?,?,?)",
+                            [("temperatura", "°C", 0.1, 1)] * sensores)
+            con.executemany("""INSERT INTO lectura (sensor_id, fecha_hora, valor, calidad_dato, fuente)
+                               VALUES (?,?,?,?,?)""", (
+                (sid, (inicio + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"), 20.0, "OK", "automatica")
+                for sid in range(1, sensores + 1) for i in range(n_por_sensor)))
+        con.execute("VACUUM")
+        print(f"texto      : {_medir_rangos(con, sensores, inicio, n_por_sensor, como_texto=True):8.1f} µs/consulta"
+              f" | {_tamano_indices(con)}")
+
+        t0 = time.perf_counter()
+        with con:
+            convertidas, _ = esquema.convertir_fecha_hora_epoch(con)
+        print(f"migración  : {convertidas} filas en {time.perf_counter() - t0:.2f} s")
+        con.execute("VACUUM")
+        print(f"epoch (ms) : {_medir_rangos(con, sensores, inicio, n_por_sensor):8.1f} µs/consulta"
+              f" | {_tamano_indices(con)}")
+        conexion.cerrar_conexiones()
+
+
+def bench_agregados(n):
+    """Estadísticas de un sensor en un rango: recorrido de lectura frente a consultar_agregado()."""
+    sensores, inicio = 10, datetime(2025, 1, 1)
+    paso = timedelta(days=365) / max(1, n // sensores)
+    filas = [(sid, inicio + paso * i, 20.0 + (i % 100) / 10, "OK", "automatica")
+             for i in range(n // sensores) for sid in range(1, sensores + 1)]
+    rnd = random.Random(7)
+    ventanas = []
+    for _ in range(200):
+        desde = inicio + timedelta(minutes=rnd.randint(0, 60 * 24 * 300))
+        ventanas.append((rnd.randint(1, sensores), desde, desde + timedelta(days=rnd.randint(1, 60))))
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, sensores)
+        res = meteorologiadb.insertar_lecturas(filas, tamano_lote=10_000)
+        print(f"ingesta con triggers de agregados: {res['filas_por_segundo']:>9.0f} filas/s")
+        t0 = time.perf_counter()
+        for sid, desde, hasta in ventanas:
+            meteorologiadb.listar("""SELECT COUNT(*), MIN(valor), MAX(valor), AVG(valor) FROM lectura
+                                      WHERE sensor_id=? AND fecha_hora >= ? AND fecha_hora < ?""",
+                                  (sid, meteorologiadb.fecha_a_bd(desde), meteorologiadb.fecha_a_bd(hasta)))
+        crudo = (time.perf_counter() - t0) / len(ventanas) * 1e6
+        t0 = time.perf_counter()
+        for sid, desde, hasta in ventanas:
+            consultar_agregado(sid, desde, hasta)
+        agregado = (time.perf_counter() - t0) / len(ventanas) * 1e6
+        print(f"rango 1-60 días: lectura {crudo:10.1f} µs | agregados {agregado:8.1f} µs")
+        conexion.cerrar_conexiones()
+
+
+def bench_ultima(n):
+    """Valor actual de los sensores de una estación: GROUP BY sobre lectura frente a sensor_ultima_lectura.
+
+    El escenario de referencia es --n 10000000 (10 estaciones x 10 sensores).
+    """
+    estaciones, por_estacion, inicio = 10, 10, datetime(2025, 1, 1)
+    sensores = estaciones * por_estacion
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, 0)
+        for e in range(2, estaciones + 1):
+            meteorologiadb.insertar("""INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id)
+                                       VALUES (?,?,?,?)""", (f"Estación {e}", 6.25, -75.57, 1))
+        for e in range(1, estaciones + 1):
+            for _ in range(por_estacion):
+                meteorologiadb.insertar("""INSERT INTO sensor (tipo, unidad, precision, estacion_id)
+                                           VALUES (?,?,?,?)""", ("temperatura", "°C", 0.1, e))
+        base = meteorologiadb.fecha_a_bd(inicio)
+        res = meteorologiadb.insertar_lecturas(
+            ((sid, base + i * 60_000, 20.0, "OK", "automatica")
+             for i in range(n // sensores) for sid in range(1, sensores + 1)), tamano_lote=10_000)
+        print(f"ingesta: {res['filas']} filas a {res['filas_por_segundo']:.0f} filas/s")
+        consultas = 50
+        t0 = time.perf_counter()
+        for i in range(consultas):
+            meteorologiadb.listar("""SELECT l.sensor_id, l.fecha_hora, l.valor
+                                       FROM lectura l
+                                       JOIN (SELECT sensor_id, MAX(fecha_hora) AS f FROM lectura GROUP BY sensor_id) m
+                                         ON m.sensor_id = l.sensor_id AND m.f = l.fecha_hora
+                                       JOIN sensor s ON s.id = l.sensor_id
+                                      WHERE s.estacion_id = ?""", (i % estaciones + 1,))
+        agrupado = (time.perf_counter() - t0) / consultas * 1e3
+        t0 = time.perf_counter()
+        for i in range(consultas):
+            ultimas_lecturas(estacion_id=i % estaciones + 1)
+        tabla = (time.perf_counter() - t0) / consultas * 1e3
+        print(f"última lectura por estación: GROUP BY {agrupado:10.3f} ms | sensor_ultima_lectura {tabla:8.3f} ms")
+        conexion.cerrar_conexiones()
+
+
+def bench_reingesta(n):
+    """Reenvío de n lecturas solapadas al 50 % con los datos ya guardados, por política de conflicto."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sensor_id = _preparar_bd(tmp)
+        meteorologiadb.insertar_lecturas(_tuplas_lectura(sensor_id, n), tamano_lote=10_000)
+        for politica in ("ignorar", "mejor_calidad", "reemplazar"):
+            inicio = datetime(2025, 1, 1) + timedelta(seconds=n // 2)
+            res = meteorologiadb.insertar_lecturas(_tuplas_lectura(sensor_id, n, inicio), tamano_lote=10_000,
+                                                   politica=politica)
+            print(f"{politica:<13}: {res['filas_por_segundo']:>9.0f} filas/s | insertadas {res['insertadas']:>8} "
+                  f"actualizadas {res['actualizadas']:>8} omitidas {res['omitidas']:>8}")
+        conexion.cerrar_conexiones()
+
+
+def bench_arranque(n):
+    """Coste de crear_bd() al arrancar con el esquema al día frente a reejecutar todo el DDL."""
+    veces = max(1, min(n, 2000))
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+        _preparar_bd(tmp)
+
+        def medir(funcion):
+            # Cada arranque abre una conexión nueva, como un proceso recién lanzado
+            total = 0.0
+            for _ in range(veces):
+                conexion.configurar(ruta)
+                t0 = time.perf_counter()
+                funcion()
+                total += time.perf_counter() - t0
+            return total / veces * 1e6
+
+        def ddl_completo():
+            con = conexion.obtener_conexion()
+            with con:
+                # Lo que se puede repetir sin versionado: tablas base y, por partición, sus triggers y la vista
+                for sql in esquema.SQL_TABLAS:
+                    con.execute(sql)
+                for nombre, _, _ in particiones.particiones(con):
+                    for sql in esquema.triggers_particion(nombre):
+                        con.execute(sql)
+                particiones.rehacer_vista(con)
+
+        print(f"DDL en cada arranque   : {medir(ddl_completo):10.1f} µs")
+        print(f"crear_bd() versionado  : {medir(meteorologiadb.crear_bd):10.1f} µs")
+        conexion.cerrar_conexiones()
+
+
+def bench_archivo(n):
+    """Bytes por lectura y recorrido de un año de un sensor: particiones de lectura frente al archivo columnar."""
+    sensores, inicio = 10, datetime(2024, 1, 1)
+    paso_ms = 365 * 86_400_000 // max(1, n // sensores)
+    base = meteorologiadb.fecha_a_bd(inicio)
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, sensores)
+        meteorologiadb.insertar_lecturas(((sid, base + i * paso_ms, 20.0 + (i % 100) / 10, "OK", "automatica")
+                                          for i in range(n // sensores) for sid in range(1, sensores + 1)),
+                                         tamano_lote=10_000)
+        con = conexion.obtener_conexion()
+        con.execute("VACUUM")
+        tam_bd = con.execute("SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                             "(SELECT nombre FROM particion_lectura)").fetchone()[0]
+        desde, hasta = inicio, datetime(2025, 1, 1)
+        t0 = time.perf_counter()
+        for sid in range(1, sensores + 1):
+            meteorologiadb.listar("SELECT fecha_hora, valor FROM lectura WHERE sensor_id=? AND fecha_hora >= ? "
+                                  "AND fecha_hora < ?", (sid, base, meteorologiadb.fecha_a_bd(hasta)))
+        seg_bd = (time.perf_counter() - t0) / sensores
+
+        t0 = time.perf_counter()
+        res = archivo.archivar(hasta)
+        seg_archivar = time.perf_counter() - t0
+        tam_col = sum(os.path.getsize(os.path.join(archivo.directorio_archivo(), f))
+                      for f in os.listdir(archivo.directorio_archivo()))
+        t0 = time.perf_counter()
+        for sid in range(1, sensores + 1):
+            for cols in archivo.rangos_archivados(sid, base, meteorologiadb.fecha_a_bd(hasta)):
+                sum(cols.valores)
+        seg_col = (time.perf_counter() - t0) / sensores
+        print(f"particiones   : {tam_bd / n:6.1f} bytes/lectura | año de un sensor {seg_bd * 1e3:8.2f} ms")
+        print(f"archivo .col  : {tam_col / max(1, res['filas']):6.1f} bytes/lectura | año de un sensor "
+              f"{seg_col * 1e3:8.2f} ms (suma de valores sobre mmap)")
+        print(f"archivado     : {res['filas']} filas en {res['ficheros']} ficheros, {seg_archivar:.2f} s")
+        conexion.cerrar_conexiones()
+
+
+@dataclass
+class _LecturaSinSlots:
+    # Forma anterior de lectura.Lectura (dataclass con __dict__), sólo para comparar
+    valor: float
+    fecha_hora: datetime
+    sensor_id: int
+
+
+def _memoria(construir):
+    tracemalloc.start()
+    objeto = construir()
+    usada = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objeto
+    return usada
+
+
+def bench_memoria(n):
+    """Memoria por millón de lecturas: lista de dataclass, lista de Lectura con __slots__ y LecturaBatch."""
+    inicio = datetime(2025, 1, 1)
+    casos = [
+        ("list[dataclass sin slots]", lambda: [_LecturaSinSlots(20.0 + i % 10, inicio + timedelta(seconds=i), i % 50)
+                                               for i in range(n)]),
+        ("list[Lectura] (slots)", lambda: [Lectura(20.0 + i % 10, inicio + timedelta(seconds=i), i % 50)
+                                           for i in range(n)]),
+        ("LecturaBatch", lambda: LecturaBatch.desde_lecturas(
+            Lectura(20.0 + i % 10, inicio + timedelta(seconds=i), i % 50) for i in range(n))),
+    ]
+    for nombre, construir in casos:
+        usada = _memoria(construir)
+        print(f"{nombre:<26}: {usada / n:6.1f} bytes/lectura ({usada / n:6.1f} MB por millón)")
+
+
+def bench_muestreo(n):
+    """Lecturas simuladas por segundo: obtener_lectura() en bucle frente a obtener_lecturas_lote()."""
+    sensor = SensorTemperatura(id=1, tipo="temperatura", estacion_id=1, estado=True, unidad="°C",
+                               rango_min=-5.0, rango_max=35.0)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        sensor.obtener_lectura()
+    print(f"obtener_lectura()      : {n / (time.perf_counter() - t0):>12.0f} lecturas/s")
+    t0 = time.perf_counter()
+    sensor.obtener_lecturas_lote(n, datetime(2025, 1, 1))
+    motor = "NumPy" if sensores.np is not None else "array"
+    print(f"obtener_lecturas_lote(): {n / (time.perf_counter() - t0):>12.0f} lecturas/s ({motor})")
+
+
+def bench_registro(n):
+    """Estación con n sensores: alta, búsqueda por id, activos y baja con lista frente a Registro."""
+    tipos = ("temperatura", "humedad", "precipitacion")
+    lista = [SensorTemperatura(id=i, tipo=tipos[i % 3], estacion_id=1, estado=i % 4 != 0, unidad="°C",
+                               rango_min=-5.0, rango_max=35.0) for i in range(n)]
+    consultas = random.Random(0).sample(range(n), min(n, 1000))
+    est = EstacionMeteorologica(id=1, nombre="B", coordenadas=(0.0, 0.0), altitud=0.0, activa=True)
+    t0 = time.perf_counter()
+    for s in lista:
+        est.agregar_sensor(s)
+    alta = time.perf_counter() - t0
+
+    def medir(fn):
+        t0 = time.perf_counter()
+        for i in consultas:
+            fn(i)
+        return (time.perf_counter() - t0) / len(consultas) * 1e6
+
+    print(f"{n} sensores, alta con Registro: {alta * 1e3:.1f} ms")
+    print(f"{'operación':<22}{'lista (µs)':>12}{'Registro (µs)':>15}")
+    filas = [
+        ("buscar por id", medir(lambda i: next(s for s in lista if s.id == i)), medir(est.obtener_sensor)),
+        ("sensores activos", medir(lambda i: [s for s in lista if s.esta_activo()]),
+         medir(lambda i: est.obtener_sensores_activos())),
+        ("sensores por tipo", medir(lambda i: [s for s in lista if s.tipo == "humedad"]),
+         medir(lambda i: est.obtener_sensores_por_tipo("humedad"))),
+        ("baja (remover)", medir(lambda i: [s for s in lista if s.id != i]), medir(est.remover_sensor)),
+    ]
+    for nombre, antes, despues in filas:
+        print(f"{nombre:<22}{antes:>12.1f}{despues:>15.2f}")
+
+
+def bench_soak(n):
+    """Prueba de resistencia de simulador.py: 2 parcelas × 3 estaciones × 6 sensores a 1 Hz hasta n lecturas."""
+    sensores_totales = 2 * 3 * 6
+    duracion = max(600, n // sensores_totales // 600 * 600)
+    res = simulador.simular(semilla=0, parcelas=2, estaciones=3, sensores_por_estacion=6, tasa_hz=1.0,
+                            duracion_s=duracion, bloque_s=600, informe=simulador.imprimir_progreso)
+    simulador.imprimir_resumen(res)
+
+
+def bench_calidad(n):
+    """insertar_lecturas() de n lecturas sin y con control de calidad, y coste de evaluar() solo."""
+    lote = LecturaBatch()
+    for sid in range(1, 11):
+        sensor = SensorTemperatura(id=sid, tipo="temperatura", estacion_id=1, estado=True, unidad="°C",
+                                   rango_min=-5.0, rango_max=35.0)
+        lote.extender(sensor.obtener_lecturas_lote(n // 10, datetime(2025, 1, 1)))
+    for control_calidad in (False, True):
+        # BD nueva en cada pasada: vaciar lectura dispararía los triggers de borrado fila a fila
+        with tempfile.TemporaryDirectory() as tmp:
+            _preparar_bd(tmp, sensores=10)
+            if control_calidad:
+                control = calidad.ControlCalidad()
+                t0 = time.perf_counter()
+                codigos = control.evaluar(lote.sensor_ids, lote.tiempos, lote.valores)
+                seg = time.perf_counter() - t0
+                motor = "NumPy" if calidad.np is not None else "array"
+                print(f"evaluar() ({motor:<5})             : {len(lote) / seg:>12.0f} lecturas/s  "
+                      f"{calidad.resumen(codigos)}")
+            res = meteorologiadb.insertar_lecturas(lote, tamano_lote=10000, control_calidad=control_calidad)
+            print(f"insertar_lecturas(control={control_calidad!s:<5}): {res['filas_por_segundo']:>12.0f} lecturas/s")
+            conexion.cerrar_conexiones()
+
+
+def _cargar_n_mas_1(con):
+    # Mismo grafo que Repositorio.cargar_parcelas(), pero con una consulta por parcela y por estación
+    repo = Repositorio(con)
+    consultas = 1
+    for fp in repo._consultar("SELECT * FROM parcela ORDER BY id"):
+        parcela = repo._parcela(fp)
+        consultas += 1
+        for fe in repo._consultar("SELECT * FROM estacion_meteorologica WHERE parcela_id = ?", (fp["id"],)):
+            estacion = repo._estacion(fe)
+            consultas += 1
+            for fs in repo._consultar("SELECT * FROM sensor WHERE estacion_id = ?", (fe["id"],)):
+                estacion.agregar_sensor(repo._sensor(fs))
+            parcela.agregar_estacion(estacion)
+    return consultas
+
+
+def bench_hidratacion(n):
+    """Carga de parcelas -> estaciones -> sensores: consultas por hijo frente a Repositorio.cargar_parcelas()."""
+    parcelas = max(1, n // 20)  # 5 estaciones × 4 sensores por parcela
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "hidratacion.db")
+        conexion.configurar(ruta)
+        meteorologiadb.crear_bd()
+        simulador.registrar_flota(simulador.construir_flota(parcelas, 5, 4))
+        con = conexion.obtener_conexion()
+        t0 = time.perf_counter()
+        consultas = _cargar_n_mas_1(con)
+        print(f"N+1 ({parcelas} parcelas, {parcelas * 20} sensores): {consultas:>6} consultas "
+              f"{(time.perf_counter() - t0) * 1e3:8.1f} ms")
+        repo = Repositorio()
+        for pasada in ("Repositorio (1ª carga)", "Repositorio (recarga)"):
+            sentencias = []
+            con.set_trace_callback(sentencias.append)
+            t0 = time.perf_counter()
+            repo.cargar_parcelas()
+            seg = time.perf_counter() - t0
+            con.set_trace_callback(None)
+            print(f"{pasada:<32}: {len(sentencias):>6} consultas {seg * 1e3:8.1f} ms")
+        conexion.cerrar_conexiones()
+
+
+def bench_informe(n):
+    """Informe repetido sobre n lecturas: regenerarlo entero frente a MotorInforme sin cambios y tras una lectura.
+
+    El escenario de referencia es --n 10000000 (10 estaciones x 10 sensores).
+    """
+    estaciones, por_estacion, inicio = 10, 10, datetime(2025, 1, 1)
+    sensores = estaciones * por_estacion
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, 0)
+        for e in range(2, estaciones + 1):
+            meteorologiadb.insertar("""INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id)
+                                       VALUES (?,?,?,?)""", (f"Estación {e}", 6.25, -75.57, 1))
+        for e in range(1, estaciones + 1):
+            for _ in range(por_estacion):
+                meteorologiadb.insertar("""INSERT INTO sensor (tipo, unidad, precision, estacion_id)
+                                           VALUES (?,?,?,?)""", ("temperatura", "°C", 0.1, e))
+        base = meteorologiadb.fecha_a_bd(inicio)
+        res = meteorologiadb.insertar_lecturas(
+            ((sid, base + i * 60_000, 20.0, "OK", "automatica")
+             for i in range(n // sensores) for sid in range(1, sensores + 1)), tamano_lote=10_000)
+        print(f"ingesta: {res['filas']} filas a {res['filas_por_segundo']:.0f} filas/s")
+        ruta = os.path.join(tmp, "informe.html")
+        repeticiones = 20
+
+        t0 = time.perf_counter()
+        for _ in range(repeticiones):
+            informe.MotorInforme().generar(ruta)
+        completo = (time.perf_counter() - t0) / repeticiones * 1e3
+
+        motor = informe.MotorInforme()
+        motor.generar(ruta)
+        t0 = time.perf_counter()
+        for _ in range(repeticiones):
+            assert not motor.generar(ruta)["escrito"]
+        sin_cambios = (time.perf_counter() - t0) / repeticiones * 1e3
+
+        siguiente = base + (n // sensores) * 60_000
+        t_lecturas = 0.0
+        for i in range(repeticiones):
+            meteorologiadb.insertar_lecturas([(1, siguiente + i * 60_000, 20.0, "OK", "automatica")])
+            t0 = time.perf_counter()
+            regeneradas = motor.generar(ruta)["regeneradas"]
+            t_lecturas += time.perf_counter() - t0
+        tras_lectura = t_lecturas / repeticiones * 1e3
+        print(f"informe completo {completo:10.3f} ms | sin cambios {sin_cambios:8.3f} ms | "
+              f"tras una lectura {tras_lectura:8.3f} ms ({', '.join(regeneradas)})")
+
+        conexion.cerrar_conexiones()
+
+
+def _listado_concatenado(con, ruta):
+    # Listado de sensores como lo construía antes AppCRUD._generar_informe: fetchall() y html +=
+    filas = con.execute("""SELECT s.id, s.tipo, s.unidad, s.precision, e.nombre AS estacion
+                             FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id
+                            ORDER BY s.id""").fetchall()
+    html = "<h3>Listado de sensores</h3>"
+    html += "<table><thead><tr><th>ID</th><th>Tipo</th><th>Unidad</th><th>Precisión</th><th>Estación</th></tr></thead><tbody>"
+    for fid, tipo, unidad, prec, est in filas:
+        html += f"<tr><td>{fid}</td><td>{tipo}</td><td>{unidad}</td><td>{prec}</td><td>{est}</td></tr>"
+    html += "</tbody></table>"
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def _listado_por_bloques(con, directorio):
+    salida = informe.Fragmento(os.path.join(directorio, "listado.parte"), directorio, "listado", "listado.html")
+    informe._listado_sensores(con, salida, informe.TODO)
+    salida.cerrar()
+
+
+def bench_listado(n):
+    """Informe con n sensores: listado con fetchall() y html += frente a escritura por bloques paginada."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, 0)
+        conexion.escribir(lambda con: con.executemany(
+            "INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES (?,?,?,1)",
+            (("temperatura", "°C", 0.1) if i % 2 else ("humedad", "%", 1.0) for i in range(n))))
+        con = conexion.obtener_conexion()
+        casos = [
+            ("fetchall + html +=", lambda: _listado_concatenado(con, os.path.join(tmp, "concatenado.html"))),
+            ("escribir_tabla paginada", lambda: _listado_por_bloques(con, tmp)),
+            ("informe completo", lambda: informe.MotorInforme().generar(os.path.join(tmp, "informe.html"), con)),
+        ]
+        for nombre, generar in casos:
+            t0 = time.perf_counter()
+            generar()
+            segundos = time.perf_counter() - t0
+            tracemalloc.start()  # aparte: tracemalloc encarece cada asignación y falsearía el tiempo
+            generar()
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{nombre:<26}: {segundos * 1e3:9.1f} ms | pico {pico / 1e6:8.2f} MB")
+        paginas = [f for f in os.listdir(tmp) if f.startswith("listado_sensores_p")]
+        print(f"{len(paginas) + 1} páginas de {informe.FILAS_POR_PAGINA} sensores")
+        conexion.cerrar_conexiones()
+
+
+def bench_graficos(n):
+    """Gráficos de un año de n lecturas de 10 sensores: leer todas las filas frente a series.serie_sensor().
+
+    También mide lttb() sobre un millón de puntos con y sin NumPy.
+    """
+    sensores_bd, inicio = 10, datetime(2025, 1, 1)
+    por_sensor = max(1, n // sensores_bd)
+    paso = 365 * 86_400_000 // por_sensor
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, sensores_bd)
+        base = meteorologiadb.fecha_a_bd(inicio)
+        res = meteorologiadb.insertar_lecturas(
+            ((sid, base + i * paso, 20.0 + 10 * math.sin(i / 500), "OK", "automatica")
+             for i in range(por_sensor) for sid in range(1, sensores_bd + 1)), tamano_lote=10_000)
+        print(f"ingesta: {res['filas']} filas a {res['filas_por_segundo']:.0f} filas/s")
+        con = conexion.obtener_conexion()
+        t0 = time.perf_counter()
+        for sid in range(1, sensores_bd + 1):
+            filas = con.execute("SELECT fecha_hora, valor FROM lectura WHERE sensor_id = ? ORDER BY fecha_hora",
+                                (sid,)).fetchall()
+            series.lttb([f[0] for f in filas], [f[1] for f in filas])
+        todas = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for sid in range(1, sensores_bd + 1):
+            _, fuente = series.serie_sensor(sid, con=con)
+        serie = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        informe.MotorInforme().generar(os.path.join(tmp, "informe.html"), con)
+        completo = time.perf_counter() - t0
+        print(f"10 gráficos: todas las filas + lttb {todas * 1e3:10.1f} ms | serie_sensor ({fuente}) "
+              f"{serie * 1e3:8.1f} ms | informe completo {completo * 1e3:8.1f} ms")
+        conexion.cerrar_conexiones()
+    x = list(range(1_000_000))
+    y = [math.sin(i / 1000) for i in x]
+    numpy = series.np
+    for nombre in ("NumPy", "Python"):
+        if nombre == "NumPy" and numpy is None:
+            continue
+        series.np = numpy if nombre == "NumPy" else None
+        t0 = time.perf_counter()
+        series.lttb(x, y, series.PUNTOS_GRAFICO)
+        print(f"lttb 1M -> {series.PUNTOS_GRAFICO} puntos ({nombre}): {(time.perf_counter() - t0) * 1e3:8.1f} ms")
+    series.np = numpy
+
+
+def bench_informes(n):
+    """Un informe por parcela (50 parcelas x 2 estaciones x 6 sensores, n lecturas): en serie frente a en paralelo."""
+    parcelas, procesos = 50, os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+        conexion.configurar(ruta)
+        meteorologiadb.crear_bd()
+        flota = simulador.construir_flota(parcelas, 2, 6)
+        simulador.registrar_flota(flota)
+        sensores_bd = parcelas * 2 * 6
+        base = meteorologiadb.fecha_a_bd(datetime(2025, 1, 1))
+        meteorologiadb.insertar_lecturas(
+            ((sid, base + i * 60_000, 20.0 + 10 * math.sin(i / 500), "OK", "automatica")
+             for i in range(max(1, n // sensores_bd)) for sid in range(1, sensores_bd + 1)), tamano_lote=10_000)
+        conexion.cerrar_conexiones()
+        for nombre, p in (("en serie", 1), (f"pool de {procesos}", procesos)):
+            t0 = time.perf_counter()
+            informe.generar_informes("parcela", directorio=os.path.join(tmp, f"informes_{p}"), procesos=p, ruta=ruta)
+            print(f"{parcelas} informes {nombre:<12}: {time.perf_counter() - t0:8.2f} s")
+
+
+def _quitar_trigger_conteo(con, desde_ms, hasta_ms):
+    # Crea las particiones de [desde_ms, hasta_ms] y les quita el trigger de INSERT del conteo
+    while desde_ms <= hasta_ms:
+        mes, inicio, siguiente = particiones.limites_mes(desde_ms)
+        nombre = esquema.crear_particion(con, mes, inicio, siguiente)
+        con.execute(f"DROP TRIGGER IF EXISTS trg_conteo_insert{nombre[len('lectura'):]}")
+        desde_ms = siguiente
+
+
+def bench_conteos(n):
+    """Recuentos del informe (100 sensores, n lecturas): las tres consultas por separado, con LEFT JOIN a
+    lectura o a agregado_dia, frente a una pasada con lectura_conteo; y lo que cuesta su trigger al ingerir.
+    """
+    estaciones, por_estacion = 10, 10
+    sensores_bd = estaciones * por_estacion
+    with tempfile.TemporaryDirectory() as tmp:
+        _preparar_bd(tmp, 0)
+        for e in range(2, estaciones + 1):
+            meteorologiadb.insertar("""INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id)
+                                       VALUES (?,?,?,?)""", (f"Estación {e}", 6.25, -75.57, 1))
+        conexion.escribir(lambda con: con.executemany(
+            "INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES (?,?,?,?)",
+            [(("temperatura", "humedad", "precipitacion")[i % 3], "u", 0.1, i % estaciones + 1)
+             for i in range(sensores_bd)]))
+        base = meteorologiadb.fecha_a_bd(datetime(2025, 1, 1))
+        lecturas = lambda desde, m: ((sid, base + i * 600_000, 20.0, "OK", "automatica")
+                                     for i in range(desde, desde + m) for sid in range(1, sensores_bd + 1))
+        res = meteorologiadb.insertar_lecturas(lecturas(0, max(1, n // sensores_bd)), tamano_lote=10_000)
+        print(f"ingesta: {res['filas']} filas a {res['filas_por_segundo']:.0f} filas/s")
+        con = conexion.obtener_conexion()
+        por_separado = [
+            "SELECT tipo, COUNT(*) FROM sensor GROUP BY tipo ORDER BY tipo",
+            """SELECT e.nombre, COUNT(s.id) FROM estacion_meteorologica e LEFT JOIN sensor s ON s.estacion_id = e.id
+                GROUP BY e.id ORDER BY e.nombre""",
+        ]
+        casos = [
+            ("3 consultas, JOIN lectura", lambda: [con.execute(q).fetchall() for q in por_separado + [
+                "SELECT s.tipo, COUNT(l.sensor_id) FROM sensor s LEFT JOIN lectura l ON l.sensor_id = s.id "
+                "GROUP BY s.tipo"]]),
+            ("3 consultas, agregado_dia", lambda: [con.execute(q).fetchall() for q in por_separado + [
+                "SELECT s.tipo, TOTAL(a.n) FROM sensor s LEFT JOIN agregado_dia a ON a.sensor_id = s.id GROUP BY s.tipo"]]),
+            ("1 pasada, lectura_conteo", lambda: conteos.estadisticas_informe(con)),
+        ]
+        for nombre, consultar in casos:
+            repeticiones = 3 if "lectura" in nombre.split(",")[1] else 50
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                consultar()
+            print(f"{nombre:<26}: {(time.perf_counter() - t0) / repeticiones * 1e3:10.3f} ms")
+        m = min(n, 200_000) // sensores_bd
+        desde = max(1, n // sensores_bd)
+        tiempos = {}
+        for nombre in ("con trg_conteo_insert", "sin trg_conteo_insert"):
+            if nombre.startswith("sin"):
+                conexion.escribir(lambda c: _quitar_trigger_conteo(c, base + desde * 600_000,
+                                                                   base + (desde + m) * 600_000))
+            tiempos[nombre] = meteorologiadb.insertar_lecturas(lecturas(desde, m), tamano_lote=10_000)["filas_por_segundo"]
+            desde += m
+        print(" | ".join(f"ingesta {k}: {v:.0f} filas/s" for k, v in tiempos.items()))
+        conexion.cerrar_conexiones()
+
+
+def bench_particiones(n):
+    """Retención de un mes de n lecturas en tres meses: DELETE por rango frente a eliminar_mes() (DROP TABLE),
+    y una consulta de rango de un día por la vista lectura frente a la partición que la contiene."""
+    sensores, inicio = 10, datetime(2025, 1, 1)
+    paso_ms = 90 * 86_400_000 // max(1, n // sensores)
+    base = meteorologiadb.fecha_a_bd(inicio)
+    _, _, fin_enero = particiones.limites_mes(base)
+    for modo in ("DELETE", "eliminar_mes"):
+        with tempfile.TemporaryDirectory() as tmp:
+            _preparar_bd(tmp, sensores)
+            meteorologiadb.insertar_lecturas(((sid, base + i * paso_ms, 20.0, "OK", "automatica")
+                                              for i in range(n // sensores) for sid in range(1, sensores + 1)),
+                                             tamano_lote=10_000)
+            filas = meteorologiadb.listar("SELECT COUNT(*) FROM lectura WHERE fecha_hora < ?", (fin_enero,))[0][0]
+            t0 = time.perf_counter()
+            if modo == "DELETE":
+                meteorologiadb.eliminar("DELETE FROM lectura WHERE fecha_hora < ?", (fin_enero,))
+            else:
+                meteorologiadb.eliminar_mes(inicio)
+            print(f"{modo:<12}: {filas:>8} lecturas de enero en {(time.perf_counter() - t0) * 1e3:10.2f} ms")
+            if modo == "DELETE":
+                continue
+            con = conexion.obtener_conexion()
+            dia = (base + 45 * 86_400_000, base + 46 * 86_400_000)
+            for nombre, origen in (("vista lectura", "lectura"), ("origen()", particiones.origen(con, *dia))):
+                t0 = time.perf_counter()
+                for sid in range(1, 501):
+                    con.execute(f"SELECT COUNT(*), AVG(valor) FROM {origen} "
+                                "WHERE sensor_id = ? AND fecha_hora >= ? AND fecha_hora < ?",
+                                (sid % sensores + 1, *dia)).fetchone()
+                print(f"día por {nombre:<13}: {(time.perf_counter() - t0) / 500 * 1e6:8.1f} µs/consulta")
+            conexion.cerrar_conexiones()
+
+
+ESCENARIOS = {
+    "archivo": bench_archivo,
+    "arranque": bench_arranque,
+    "agregados": bench_agregados,
+    "calidad": bench_calidad,
+    "concurrencia": bench_concurrencia,
+    "conexion": bench_conexion,
+    "conteos": bench_conteos,
+    "fecha": bench_fecha,
+    "graficos": bench_graficos,
+    "hidratacion": bench_hidratacion,
+    "informe": bench_informe,
+    "informes": bench_informes,
+    "ingesta": bench_ingesta,
+    "listado": bench_listado,
+    "memoria": bench_memoria,
+    "muestreo": bench_muestreo,
+    "particiones": bench_particiones,
+    "registro": bench_registro,
+    "soak": bench_soak,
+    "reingesta": bench_reingesta,
+    "ultima": bench_ultima,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de almacenamiento meteorológico")
+    parser.add_argument("escenario", choices=sorted(ESCENARIOS))
+    parser.add_argument("--n", type=int, default=100_000, help="número de lecturas")
+    args = parser.parse_args()
+    ESCENARIOS[args.escenario](args.n)
@@ -0,0 +1,227 @@
+# Módulo de control de calidad de lecturas al ingresarlas: rellena lectura.calidad_dato
+# Evalúa lotes enteros (NumPy si está instalado, bucle sobre array si no) contra los metadatos de
+# la tabla sensor, cacheados, y conserva por sensor la última lectura vista entre lotes
+from __future__ import annotations
+import math
+import sqlite3
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from conexion import obtener_conexion, ruta_bd
+
+try:
+    import numpy as np  # opcional: evaluación vectorizada
+except ImportError:
+    np = None
+
+# Índices en CODIGOS; si una lectura falla varias pruebas se guarda la de mayor índice de prioridad
+# (rango > tiempo > salto > plano). Todos empiezan por FLAG, así "mejor_calidad" los ordena como FLAG
+OK, RANGO, TIEMPO, SALTO, PLANO = range(5)
+CODIGOS = ("OK", "FLAG_RANGO", "FLAG_TIEMPO", "FLAG_SALTO", "FLAG_PLANO")
+
+# Límites físicos por tipo cuando el sensor no tiene rango_min/rango_max (como en sensores.py)
+LIMITES_TIPO: Dict[str, Tuple[float, float]] = {
+    "temperatura": (-90.0, 60.0),
+    "humedad": (0.0, 100.0),
+    "precipitacion": (0.0, math.inf),
+    "viento": (0.0, 400.0),
+}
+# Máxima variación admitida entre dos lecturas consecutivas (separadas como mucho VENTANA_SALTO_MS)
+SALTO_TIPO: Dict[str, float] = {"temperatura": 10.0, "humedad": 30.0, "precipitacion": 50.0, "viento": 100.0}
+# Lecturas idénticas seguidas a partir de las cuales se marca el sensor como atascado;
+# sin valor para los tipos en los que un valor constante es normal (0 mm de lluvia, calma)
+PLANO_TIPO: Dict[str, Optional[int]] = {"temperatura": 10, "humedad": 10, "precipitacion": None, "viento": None}
+VENTANA_SALTO_MS = 3_600_000
+
+# (mínimo, máximo, salto máximo, lecturas para plano)
+Metadatos = Tuple[float, float, float, int]
+_SIN_LIMITE = 1 << 62
+
+
+class ControlCalidad:
+    """Asigna un código de CODIGOS a cada lectura de un lote.
+
+    Comprueba rango (rango_min/rango_max del sensor o LIMITES_TIPO), salto respecto a la lectura
+    anterior del mismo sensor, valor plano (PLANO_TIPO lecturas iguales seguidas) y que fecha_hora
+    avance. La lectura anterior puede venir de un lote previo: el estado se guarda por sensor.
+    """
+
+    def __init__(self, ventana_salto_ms: int = VENTANA_SALTO_MS) -> None:
+        self.ventana_salto_ms = ventana_salto_ms
+        self._metadatos: Dict[int, Metadatos] = {}
+        self._estado: Dict[int, Tuple[int, float, int]] = {}  # sensor_id -> (epoch ms, valor, repeticiones)
+
+    def cargar_metadatos(self, con: Optional[sqlite3.Connection] = None) -> None:
+        """Lee de una vez los límites de todos los sensores (también tras dar de alta sensores nuevos)."""
+        con = con or obtener_conexion()
+        for sid, tipo, rmin, rmax in con.execute("SELECT id, tipo, rango_min, rango_max FROM sensor"):
+            lo, hi = LIMITES_TIPO.get(tipo, (-math.inf, math.inf))
+            plano = PLANO_TIPO.get(tipo)
+            self._metadatos[sid] = (lo if rmin is None else rmin, hi if rmax is None else rmax,
+                                    SALTO_TIPO.get(tipo, math.inf), _SIN_LIMITE if plano is None else plano)
+
+    def _metadatos_de(self, sensor_id: int) -> Metadatos:
+        meta = self._metadatos.get(sensor_id)
+        if meta is None:
+            # Sensor dado de alta tras la última carga: se relee la tabla. Si no existe, sólo
+            # se comprueban el tiempo y que el valor no sea NaN
+            self.cargar_metadatos()
+            meta = self._metadatos.setdefault(sensor_id, (-math.inf, math.inf, math.inf, _SIN_LIMITE))
+        return meta
+
+    def reiniciar(self) -> None:
+        # Olvida la última lectura de cada sensor (p. ej. antes de recargar un histórico)
+        self._estado.clear()
+
+    def evaluar(self, sensor_ids: Sequence[int], tiempos: Sequence[int], valores: Sequence[float]) -> array:
+        """Códigos (array 'B', índices de CODIGOS) para columnas paralelas como las de LecturaBatch."""
+        if not len(valores):
+            return array("B")
+        if np is not None:
+            return self._evaluar_numpy(sensor_ids, tiempos, valores)
+        return self._evaluar_python(sensor_ids, tiempos, valores)
+
+    def _evaluar_python(self, sensor_ids, tiempos, valores) -> array:
+        codigos = array("B", bytes(len(valores)))
+        estado, ventana = self._estado, self.ventana_salto_ms
+        sid_meta = None
+        for i, (sid, t, v) in enumerate(zip(sensor_ids, tiempos, valores)):
+            if sid != sid_meta:
+                lo, hi, salto, plano = self._metadatos_de(sid)
+                sid_meta = sid
+            codigo = OK
+            previo = estado.get(sid)
+            if previo is None:
+                repeticiones = 1
+            else:
+                t_prev, v_prev, rep_prev = previo
+                repeticiones = rep_prev + 1 if v == v_prev else 1
+                if repeticiones >= plano:
+                    codigo = PLANO
+                if t - t_prev <= ventana and abs(v - v_prev) > salto:
+                    codigo = SALTO
+                if t <= t_prev:
+                    codigo = TIEMPO
+            if not lo <= v <= hi:  # también NaN
+                codigo = RANGO
+            estado[sid] = (t, v, repeticiones)
+            codigos[i] = codigo
+        return codigos
+
+    def _evaluar_numpy(self, sensor_ids, tiempos, valores) -> array:
+        ids = np.asarray(sensor_ids, dtype=np.int64)
+        orden = np.argsort(ids, kind="stable")  # agrupa por sensor conservando el orden de llegada
+        s = ids[orden]
+        t = np.asarray(tiempos, dtype=np.int64)[orden]
+        v = np.asarray(valores, dtype=np.float64)[orden]
+        n = len(v)
+        unicos, inicios = np.unique(s, return_index=True)
+        meta = np.array([self._metadatos_de(int(sid)) for sid in unicos], dtype=np.float64)
+        grupo = np.repeat(np.arange(len(unicos)), np.diff(np.append(inicios, n)))
+        lo, hi, salto, plano = (meta[:, k][grupo] for k in range(4))
+
+        # Lectura anterior de cada fila: la fila previa del grupo o el estado del lote anterior
+        t_prev = np.empty_like(t)
+        t_prev[1:] = t[:-1]
+        v_prev = np.empty_like(v)
+        v_prev[1:] = v[:-1]
+        tiene_prev = np.ones(n, dtype=bool)
+        base = np.ones(n, dtype=np.int64)
+        for sid, i in zip(unicos.tolist(), inicios.tolist()):
+            previo = self._estado.get(sid)
+            if previo is None:
+                tiene_prev[i] = False
+                t_prev[i], v_prev[i] = t[i], v[i]
+            else:
+                t_prev[i], v_prev[i], rep_prev = previo
+                if v[i] == v_prev[i]:
+                    base[i] = rep_prev + 1
+        igual = tiene_prev & (v == v_prev)
+        # Repeticiones seguidas: distancia al último reinicio (valor distinto o inicio de grupo)
+        reinicio = ~igual
+        reinicio[inicios] = True
+        posicion = np.arange(n)
+        ultimo = np.maximum.accumulate(np.where(reinicio, posicion, 0))
+        repeticiones = posicion - ultimo + base[ultimo]
+
+        codigo = np.zeros(n, dtype=np.uint8)
+        codigo[tiene_prev & (repeticiones >= plano)] = PLANO
+        codigo[tiene_prev & (t - t_prev <= self.ventana_salto_ms) & (np.abs(v - v_prev) > salto)] = SALTO
+        codigo[tiene_prev & (t <= t_prev)] = TIEMPO
+        codigo[~((v >= lo) & (v <= hi))] = RANGO
+
+        for sid, j in zip(unicos.tolist(), (np.append(inicios[1:], n) - 1).tolist()):
+            self._estado[sid] = (int(t[j]), float(v[j]), int(repeticiones[j]))
+        resultado = np.empty(n, dtype=np.uint8)
+        resultado[orden] = codigo
+        return array("B", resultado.tobytes())
+
+    def etiquetar(self, filas: List[tuple]) -> List[tuple]:
+        """Filas (sensor_id, fecha_hora_ms, valor, calidad_dato, fuente) con calidad_dato evaluada.
+
+        Sólo se sustituye la calidad "OK" (o vacía): la que indique el operador se respeta.
+        """
+        if not filas:
+            return filas
+        ids, tiempos, valores, calidades, fuentes = zip(*filas)
+        codigos = self.evaluar(ids, tiempos, valores)
+        return [(sid, t, v, CODIGOS[c] if cal is None or cal == "OK" else cal, fuente)
+                for sid, t, v, cal, fuente, c in zip(ids, tiempos, valores, calidades, fuentes, codigos)]
+
+
+_controles: Dict[str, ControlCalidad] = {}
+
+
+def control_de_bd() -> ControlCalidad:
+    """ControlCalidad compartido de la BD actual (conexion.ruta_bd()): metadatos y estado entre llamadas."""
+    return _controles.setdefault(ruta_bd(), ControlCalidad())
+
+
+def resumen(codigos: array) -> Dict[str, int]:
+    # Recuento por código de un resultado de evaluar()
+    cuentas = [0] * len(CODIGOS)
+    for c in codigos:
+        cuentas[c] += 1
+    return {CODIGOS[i]: n for i, n in enumerate(cuentas) if n}
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from datetime import datetime, timedelta
+    import meteorologiadb
+    from conexion import configurar, cerrar_conexiones
+    from lectura import LecturaBatch, a_epoch_ms
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "c.db"))
+        meteorologiadb.crear_bd()
+        meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        meteorologiadb.insertar("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, rango_min, rango_max, estacion_id) "
+                                "VALUES ('temperatura', 'C', 0.1, -5, 45, 1)")
+        meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('precipitacion', 'mm', 0.1, 1)")
+        t0 = a_epoch_ms(datetime(2025, 1, 1))
+        minuto = 60_000
+        temp = [20.0, 21.0, 50.0, 21.5, 40.0] + [22.0] * 11
+        lote = LecturaBatch()
+        for i, v in enumerate(temp):
+            lote.sensor_ids.append(1); lote.tiempos.append(t0 + i * minuto); lote.valores.append(v)
+            lote.sensor_ids.append(2); lote.tiempos.append(t0 + i * minuto); lote.valores.append(0.0)
+        c = ControlCalidad()
+        codigos = c.evaluar(lote.sensor_ids, lote.tiempos, lote.valores)
+        temp_codigos = [CODIGOS[x] for x in codigos[0::2]]
+        assert temp_codigos[:6] == ["OK", "OK", "FLAG_RANGO", "FLAG_SALTO", "FLAG_SALTO", "FLAG_SALTO"]
+        assert temp_codigos[6:14] == ["OK"] * 8 and temp_codigos[14:] == ["FLAG_PLANO"] * 2
+        assert set(codigos[1::2]) == {OK}  # 0 mm constante no es plano
+        # El estado sigue entre lotes: una fecha repetida del lote anterior es FLAG_TIEMPO
+        assert list(c.evaluar([1, 1], [t0, t0 + 20 * minuto], [22.0, 22.5])) == [TIEMPO, OK]
+        assert resumen(codigos)["FLAG_PLANO"] == 2
+        res = meteorologiadb.insertar_lecturas(lote, control_calidad=True)
+        assert res["filas"] == 32
+        filas = dict(meteorologiadb.listar("SELECT calidad_dato, COUNT(*) FROM lectura GROUP BY calidad_dato"))
+        assert filas == {"OK": 26, "FLAG_RANGO": 1, "FLAG_SALTO": 3, "FLAG_PLANO": 2}
+        cerrar_conexiones()
+    print("[calidad] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,112 @@
+# Módulo de contadores de cambios por tabla (tabla cambio_tabla)
+# Triggers sobre las tablas vigiladas suben su versión en cada INSERT/UPDATE/DELETE; junto con
+# PRAGMA data_version permiten saber sin recorrer nada si los datos de un informe han cambiado
+from __future__ import annotations
+import sqlite3
+from typing import Dict, List, Tuple
+
+from archivo import SIN_ARCHIVAR
+from conexion import obtener_conexion
+
+TABLAS_VIGILADAS: Tuple[str, ...] = ("usuario", "parcela", "estacion_meteorologica", "sensor", "lectura")
+
+SQL_TABLA = """
+CREATE TABLE IF NOT EXISTS cambio_tabla (
+    tabla TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+# Un trigger por tabla y operación: una búsqueda por clave primaria en una tabla de 5 filas.
+# Salvo INSERT en lectura, la ruta caliente de la ingesta: ahí meteorologiadb.insertar_lecturas
+# sube la versión una vez por lote (anotar_cambio), no una vez por fila.
+# Mover lecturas al archivo (archivo.SIN_ARCHIVAR) no cuenta como cambio: los agregados y la
+# última lectura conservan esas filas.
+def _sql_trigger(tabla: str, operacion: str, vigilada: str = "") -> str:
+    vigilada = vigilada or tabla
+    cuando = f"WHEN {SIN_ARCHIVAR} " if (vigilada, operacion) == ("lectura", "DELETE") else ""
+    return f"""CREATE TRIGGER IF NOT EXISTS trg_cambio_{tabla}_{operacion.lower()} AFTER {operacion} ON {tabla}
+        {cuando}BEGIN
+        UPDATE cambio_tabla SET version = version + 1 WHERE tabla = '{vigilada}';
+    END;"""
+
+
+SQL_TRIGGERS = [
+    _sql_trigger(tabla, operacion)
+    for tabla in TABLAS_VIGILADAS
+    for operacion in ("INSERT", "UPDATE", "DELETE")
+    if (tabla, operacion) != ("lectura", "INSERT")
+]
+
+
+def sql_triggers_lectura(particion: str) -> List[str]:
+    """Triggers de UPDATE y DELETE de una partición lectura_AAAAMM, que suben la versión de lectura."""
+    return [_sql_trigger(particion, operacion, "lectura") for operacion in ("UPDATE", "DELETE")]
+
+
+SQL_VERSIONES = "SELECT tabla, version FROM cambio_tabla"
+
+
+def crear_cambios(con: sqlite3.Connection) -> None:
+    """Migración 6 (esquema.py): tabla de versiones, una fila por tabla vigilada, y sus triggers."""
+    con.execute(SQL_TABLA)
+    con.executemany("INSERT OR IGNORE INTO cambio_tabla (tabla) VALUES (?)", [(t,) for t in TABLAS_VIGILADAS])
+    for sql in SQL_TRIGGERS:
+        con.execute(sql)
+
+
+def marca(con: sqlite3.Connection) -> Tuple[int, int, int]:
+    """Marca barata del estado de la BD vista desde con: cambia si alguien ha confirmado algo.
+
+    PRAGMA data_version cambia con los commits de otras conexiones y total_changes con los de la
+    propia; id(con) evita comparar marcas de conexiones distintas.
+    """
+    return id(con), con.execute("PRAGMA data_version").fetchone()[0], con.total_changes
+
+
+def anotar_cambio(con: sqlite3.Connection, tabla: str) -> None:
+    """Sube la versión de tabla por un cambio que no pasa por sus triggers (p. ej. lecturas archivadas)."""
+    con.execute("UPDATE cambio_tabla SET version = version + 1 WHERE tabla = ?", (tabla,))
+
+
+def versiones(con: sqlite3.Connection = None) -> Dict[str, int]:
+    """Versión actual de cada tabla vigilada."""
+    con = con or obtener_conexion()
+    return dict(con.execute(SQL_VERSIONES))
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from conexion import configurar, cerrar_conexiones, escribir
+    from esquema import crear_bd
+    import meteorologiadb
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "c.db")
+        configurar(ruta)
+        crear_bd()
+        con = obtener_conexion()
+        antes, m = versiones(con), marca(con)
+        assert set(antes) == set(TABLAS_VIGILADAS) and marca(con) == m
+        escribir(lambda c: c.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)"))
+        assert marca(con) != m
+        despues = versiones(con)
+        assert despues["parcela"] == antes["parcela"] + 1 and despues["sensor"] == antes["sensor"]
+        # Un commit desde otra conexión cambia data_version de la nuestra
+        m = marca(con)
+        otra = sqlite3.connect(ruta)
+        otra.execute("UPDATE parcela SET nombre = 'Q'"); otra.commit(); otra.close()
+        assert marca(con) != m and versiones(con)["parcela"] == antes["parcela"] + 2
+        escribir(lambda c: (c.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) "
+                                      "VALUES ('E', 0, 0, 1)"),
+                            c.execute("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('t', 'C', 0.1, 1)")))
+        v = versiones(con)["lectura"]
+        meteorologiadb.insertar_lecturas([(1, 0, 1.0, "OK", "automatica"), (1, 1, 1.0, "OK", "automatica")])
+        assert versiones(con)["lectura"] == v + 1  # una vez por lote
+        escribir(lambda c: c.execute("DELETE FROM lectura WHERE fecha_hora = 0"))
+        assert versiones(con)["lectura"] == v + 2
+        cerrar_conexiones()
+    print("[cambios] OK")
+
+if __name__ == "__main__":
+    _tests()"""
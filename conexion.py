@@ -0,0 +1,224 @@
+# Módulo de gestión de conexiones SQLite compartido por meteorologiadb.py e indexdb.py
+# Mantiene una conexión por hilo, aplica los PRAGMA una sola vez y las cierra al salir
+# En modo WAL las escrituras se serializan en un único hilo escritor y los lectores no se bloquean
+from __future__ import annotations
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+# Base de datos dentro de la carpeta del proyecto
+DB_NAME = os.path.join(os.path.dirname(__file__), "meteorologiadb.db")
+
+PRAGMAS: Sequence[str] = ("PRAGMA foreign_keys = ON;",)
+
+# WAL: lectores concurrentes con un escritor; synchronous=NORMAL es seguro en WAL (sólo arriesga
+# la última transacción ante un corte de energía, nunca corrompe la BD)
+PRAGMAS_WAL: Sequence[str] = (
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -32000;",      # ~32 MB de caché de páginas por conexión
+    "PRAGMA mmap_size = 268435456;",    # 256 MB mapeados en memoria para lecturas
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA busy_timeout = 5000;",      # otros procesos (GUI/CLI) esperan en vez de fallar
+)
+
+
+class EscritorSerializado:
+    """Hilo único que ejecuta en orden todas las escrituras encoladas, cada una en su transacción."""
+
+    def __init__(self, gestor: "GestorConexiones") -> None:
+        self._gestor = gestor
+        self._cola: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-sqlite", daemon=True)
+        self._hilo.start()
+
+    def enviar(self, funcion: Callable[[sqlite3.Connection], Any]) -> Future:
+        futuro: Future = Future()
+        if threading.current_thread() is self._hilo:
+            # Escritura anidada desde el propio escritor: encolarla provocaría un interbloqueo
+            futuro.set_result(funcion(self._gestor.conexion()))
+            return futuro
+        self._cola.put((funcion, futuro))
+        return futuro
+
+    def detener(self) -> None:
+        self._cola.put(None)
+        self._hilo.join()
+
+    def _bucle(self) -> None:
+        while True:
+            tarea = self._cola.get()
+            if tarea is None:
+                break
+            funcion, futuro = tarea
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                with self._gestor.transaccion() as con:
+                    resultado = funcion(con)
+            except BaseException as e:
+                futuro.set_exception(e)
+            else:
+                futuro.set_result(resultado)
+
+
+class GestorConexiones:
+    def __init__(self, db_name: str = DB_NAME, pragmas: Sequence[str] = PRAGMAS, wal: bool = False) -> None:
+        self.db_name = db_name
+        self.wal = wal
+        self.pragmas = tuple(PRAGMAS_WAL if wal else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._abiertas: List[sqlite3.Connection] = []
+        self._escritor: Optional[EscritorSerializado] = None
+
+    def conexion(self) -> sqlite3.Connection:
+        """Devuelve la conexión del hilo actual, abriéndola (y aplicando los PRAGMA) la primera vez."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # check_same_thread=False sólo para poder cerrarla desde cerrar(); cada hilo usa la suya
+            con = sqlite3.connect(self.db_name, check_same_thread=False)
+            for pragma in self.pragmas:
+                con.execute(pragma)
+            self._local.con = con
+            with self._lock:
+                self._abiertas.append(con)
+        return con
+
+    @contextmanager
+    def transaccion(self) -> Iterator[sqlite3.Connection]:
+        """Confirma al salir del bloque o deshace si se produce una excepción."""
+        con = self.conexion()
+        with con:
+            yield con
+
+    def escribir(self, funcion: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Ejecuta funcion(con) en una transacción de escritura y devuelve su resultado.
+
+        En modo WAL se encola en el hilo escritor; si no, se ejecuta en la conexión del hilo.
+        """
+        if not self.wal:
+            with self.transaccion() as con:
+                return funcion(con)
+        with self._lock:
+            if self._escritor is None:
+                self._escritor = EscritorSerializado(self)
+            escritor = self._escritor
+        return escritor.enviar(funcion).result()
+
+    def cerrar(self) -> None:
+        """Detiene el hilo escritor y cierra las conexiones de todos los hilos."""
+        with self._lock:
+            escritor, self._escritor = self._escritor, None
+        if escritor is not None:
+            escritor.detener()
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+            self._local = threading.local()
+        for con in abiertas:
+            try:
+                con.close()
+            except sqlite3.Error:
+                pass
+
+
+_gestor = GestorConexiones()
+
+
+def obtener_conexion() -> sqlite3.Connection:
+    return _gestor.conexion()
+
+
+def transaccion():
+    return _gestor.transaccion()
+
+
+def escribir(funcion: Callable[[sqlite3.Connection], Any]) -> Any:
+    return _gestor.escribir(funcion)
+
+
+def cerrar_conexiones() -> None:
+    _gestor.cerrar()
+
+
+atexit.register(cerrar_conexiones)
+
+
+def configurar(db_name: Optional[str] = None, wal: bool = False) -> None:
+    """Cambia la base de datos y/o el modo por defecto cerrando las conexiones previas."""
+    global _gestor
+    _gestor.cerrar()
+    _gestor = GestorConexiones(db_name or _gestor.db_name, wal=wal)
+
+
+@contextmanager
+def usar_bd(db_name: str) -> Iterator[None]:
+    """Apunta el módulo a db_name dentro del bloque con un gestor propio.
+
+    Al salir cierra sólo las conexiones de ese gestor y recupera el anterior tal cual: las
+    conexiones ya abiertas a la BD de siempre (p. ej. AppCRUD.conn) siguen siendo válidas.
+    """
+    global _gestor
+    anterior = _gestor
+    if os.path.abspath(db_name) == os.path.abspath(anterior.db_name):
+        yield
+        return
+    _gestor = GestorConexiones(db_name)
+    try:
+        yield
+    finally:
+        temporal, _gestor = _gestor, anterior
+        temporal.cerrar()
+
+
+def activar_wal() -> None:
+    """Modo WAL sobre la base de datos actual: lectores concurrentes y un único hilo escritor."""
+    configurar(_gestor.db_name, wal=True)
+
+
+def ruta_bd() -> str:
+    return _gestor.db_name
+
+
+# --- Pruebas ---
+"""def _tests():
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "t.db"))
+        con = obtener_conexion()
+        assert con is obtener_conexion()
+        assert con.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        otro = []
+        hilo = threading.Thread(target=lambda: otro.append(obtener_conexion()))
+        hilo.start(); hilo.join()
+        assert otro[0] is not con
+        with transaccion() as c:
+            c.execute("CREATE TABLE t (x INTEGER)")
+            c.execute("INSERT INTO t VALUES (1)")
+        assert obtener_conexion().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+
+        # WAL: un escritor con bloqueo exclusivo no impide leer a otro hilo
+        activar_wal()
+        escribir(lambda c: c.execute("INSERT INTO t VALUES (2)"))
+        en_escritura, fin = threading.Event(), threading.Event()
+        def escritor_lento(c):
+            c.execute("INSERT INTO t VALUES (3)")
+            en_escritura.set()
+            fin.wait(5)
+        hilo = threading.Thread(target=lambda: escribir(escritor_lento))
+        hilo.start(); en_escritura.wait(5)
+        lector = sqlite3.connect(ruta_bd(), timeout=0)
+        assert lector.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+        fin.set(); hilo.join(); lector.close()
+        assert obtener_conexion().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3
+        cerrar_conexiones()
+    print("[conexion] OK")
+
+if __name__ == "__main__":
+    _tests()"""
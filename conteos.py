@@ -0,0 +1,131 @@
+# Módulo del número de lecturas de cada sensor (tabla lectura_conteo) y de las estadísticas del informe
+# La mantienen triggers sobre lectura; con ella los recuentos del informe salen de una sola
+# consulta sobre estaciones y sensores, sin recorrer lectura ni agregado_dia
+from __future__ import annotations
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from archivo import SIN_ARCHIVAR
+
+SQL_TABLA = """
+CREATE TABLE IF NOT EXISTS lectura_conteo (
+    sensor_id INTEGER PRIMARY KEY,
+    n INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Como en agregado_dia, las lecturas archivadas siguen contando (archivo.SIN_ARCHIVAR)
+def sql_triggers(tabla: str = "lectura") -> List[str]:
+    """Triggers del conteo sobre tabla: lectura o una partición lectura_AAAAMM."""
+    sufijo = tabla[len("lectura"):]
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_conteo_insert{sufijo} AFTER INSERT ON {tabla} BEGIN
+        INSERT INTO lectura_conteo (sensor_id, n) VALUES (NEW.sensor_id, 1)
+        ON CONFLICT (sensor_id) DO UPDATE SET n = n + 1;
+    END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_conteo_update{sufijo} AFTER UPDATE OF sensor_id ON {tabla}
+        WHEN OLD.sensor_id <> NEW.sensor_id BEGIN
+        UPDATE lectura_conteo SET n = n - 1 WHERE sensor_id = OLD.sensor_id;
+        INSERT INTO lectura_conteo (sensor_id, n) VALUES (NEW.sensor_id, 1)
+        ON CONFLICT (sensor_id) DO UPDATE SET n = n + 1;
+    END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_conteo_delete{sufijo} AFTER DELETE ON {tabla} WHEN {SIN_ARCHIVAR} BEGIN
+        UPDATE lectura_conteo SET n = n - 1 WHERE sensor_id = OLD.sensor_id;
+    END;""",
+    ]
+
+
+SQL_TRIGGERS = sql_triggers()
+
+
+def crear_conteos(con: sqlite3.Connection) -> None:
+    """Migración 7 (esquema.py): tabla y triggers, rellenada desde agregado_dia (incluye lo archivado)."""
+    for sql in [SQL_TABLA] + SQL_TRIGGERS:
+        con.execute(sql)
+    rellenar_conteos(con)
+
+
+def rellenar_conteos(con: sqlite3.Connection) -> None:
+    """Vuelve a calcular lectura_conteo desde agregado_dia."""
+    con.execute("DELETE FROM lectura_conteo")
+    con.execute("INSERT INTO lectura_conteo (sensor_id, n) SELECT sensor_id, SUM(n) FROM agregado_dia GROUP BY sensor_id")
+
+
+@dataclass
+class EstadisticasInforme:
+    sensores_por_tipo: List[Tuple[str, int]]
+    sensores_por_estacion: List[Tuple[str, int]]
+    lecturas_por_tipo: List[Tuple[str, int]]
+
+
+SQL_ESTADISTICAS = """
+SELECT e.id, e.nombre, s.tipo, COUNT(s.id), TOTAL(c.n)
+  FROM estacion_meteorologica e
+  LEFT JOIN sensor s ON s.estacion_id = e.id
+  LEFT JOIN lectura_conteo c ON c.sensor_id = s.id
+ WHERE {filtro}
+ GROUP BY e.id, s.tipo
+"""
+
+
+def estadisticas_informe(con: sqlite3.Connection, filtro: str = "1", valores: Sequence = ()) -> EstadisticasInforme:
+    """Sensores por tipo, sensores por estación y lecturas por tipo en una sola pasada.
+
+    La consulta agrupa por (estación, tipo), una fila por combinación, y los tres recuentos se
+    suman aquí. filtro es una condición sobre el alias e (estacion_meteorologica).
+    """
+    estaciones: Dict[int, List] = {}
+    sensores_tipo: Dict[str, int] = {}
+    lecturas_tipo: Dict[str, float] = {}
+    for eid, nombre, tipo, sensores, lecturas in con.execute(SQL_ESTADISTICAS.format(filtro=filtro), valores):
+        estacion = estaciones.setdefault(eid, [nombre, 0])
+        estacion[1] += sensores
+        if tipo is not None:
+            sensores_tipo[tipo] = sensores_tipo.get(tipo, 0) + sensores
+            lecturas_tipo[tipo] = lecturas_tipo.get(tipo, 0.0) + lecturas
+    return EstadisticasInforme(
+        sensores_por_tipo=sorted(sensores_tipo.items()),
+        sensores_por_estacion=sorted(((nombre, n) for nombre, n in estaciones.values()), key=lambda t: t[0]),
+        lecturas_por_tipo=[(tipo, int(n)) for tipo, n in sorted(lecturas_tipo.items())],
+    )
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from conexion import configurar, cerrar_conexiones, escribir, obtener_conexion
+    from esquema import crear_bd
+    import meteorologiadb
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "n.db"))
+        crear_bd()
+        def alta(c):
+            c.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+            for nombre in ("B", "A", "C"):
+                c.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES (?, 0, 0, 1)",
+                          (nombre,))
+            c.executemany("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES (?, 'x', 0.1, ?)",
+                          [("temperatura", 1), ("humedad", 1), ("temperatura", 2)])
+        escribir(alta)
+        meteorologiadb.insertar_lecturas([(s, i, 1.0, "OK", "automatica")
+                                          for s, n in ((1, 5), (2, 3), (3, 1)) for i in range(n)])
+        con = obtener_conexion()
+        assert dict(con.execute("SELECT sensor_id, n FROM lectura_conteo")) == {1: 5, 2: 3, 3: 1}
+        escribir(lambda c: c.execute("UPDATE lectura SET sensor_id = 3 WHERE sensor_id = 2 AND fecha_hora = 1"))
+        escribir(lambda c: c.execute("DELETE FROM lectura WHERE sensor_id = 1 AND fecha_hora < 2"))
+        assert dict(con.execute("SELECT sensor_id, n FROM lectura_conteo")) == {1: 3, 2: 2, 3: 2}
+        est = estadisticas_informe(con)
+        assert est.sensores_por_tipo == [("humedad", 1), ("temperatura", 2)]
+        assert est.sensores_por_estacion == [("A", 1), ("B", 2), ("C", 0)]
+        assert est.lecturas_por_tipo == [("humedad", 2), ("temperatura", 5)]
+        est = estadisticas_informe(con, "e.id = ?", (2,))
+        assert est.sensores_por_estacion == [("A", 1)] and est.lecturas_por_tipo == [("temperatura", 2)]
+        # La migración rellena la tabla desde agregado_dia
+        escribir(lambda c: rellenar_conteos(c))
+        assert dict(con.execute("SELECT sensor_id, n FROM lectura_conteo")) == {1: 3, 2: 2, 3: 2}
+        cerrar_conexiones()
+    print("[conteos] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,97 @@
+# Módulo con los datos de demostración: los usa el menú (main.py) y el simulador de carga
+# (simulador.py), que no necesita Tkinter ni Pygame
+import os
+import sqlite3
+from datetime import date
+
+from conexion import ruta_bd
+from esquema import crear_bd
+from repositorio import Repositorio
+from usuario import Usuario
+from parcela import Parcela
+from estacion import EstacionMeteorologica
+from sensores import (
+    SensorTemperatura,
+    SensorHumedad,
+    SensorPrecipitacion,
+)
+
+
+def demo_datos():
+    """Crea datos de ejemplo para la demostración (igual que antes)."""
+    est = EstacionMeteorologica(
+        id=1,
+        nombre="Estación Norte",
+        coordenadas=(6.25, -75.56),
+        altitud=1500.0,
+        activa=True,
+    )
+    s_temp = SensorTemperatura(
+        id=101,
+        tipo="temperatura",
+        estacion_id=1,
+        estado=True,
+        unidad="°C",
+        rango_min=-5.0,
+        rango_max=45.0,
+    )
+    s_hum = SensorHumedad(
+        id=102,
+        tipo="humedad",
+        estacion_id=1,
+        estado=True,
+        tipo_humedad="relativa",
+        fecha_calibracion=date(2025, 1, 1),
+    )
+    s_prec = SensorPrecipitacion(
+        id=103,
+        tipo="precipitacion",
+        estacion_id=1,
+        estado=True,
+        tipo_medidor="pluviómetro",
+        area_captacion=0.02,
+    )
+    est.agregar_sensor(s_temp)
+    est.agregar_sensor(s_hum)
+    est.agregar_sensor(s_prec)
+
+    parcela = Parcela(
+        id=10,
+        nombre="Parcela A",
+        latitud=6.25,
+        longitud=-75.56,
+        altitud=1500.0,
+        area_ha=3.5,
+        descripcion="Lote experimental",
+        propietario_id=999,
+    )
+    parcela.agregar_estacion(est)
+
+    user = Usuario(
+        id=500,
+        nombre="Luis",
+        rol="tecnico",
+        email="leruizres@unadvirtual.edu.co",
+        telefono="+57-3000000000",
+        zonas_interes=[1, 2],
+        permisos=["lectura_parcela"],
+    )
+    user.asignar_parcela(parcela.id)
+    return user, parcela, est
+
+
+def datos_iniciales():
+    """(usuario, parcela, estación) de la BD si ya existe y tiene una parcela con estaciones y
+    usuario; si no, demo_datos()."""
+    if not os.path.exists(ruta_bd()):
+        return demo_datos()
+    try:
+        crear_bd()
+        repo = Repositorio()
+        parcela = repo.primera_parcela_en_uso()
+        if parcela is not None:
+            repo.precargar_historial(parcela.estaciones)
+            return repo.usuarios_de(parcela.id)[0], parcela, next(iter(parcela.estaciones))
+    except (sqlite3.Error, OSError) as e:
+        print(f"No se pudieron cargar los datos de la BD ({e}); se usan los de demostración.")
+    return demo_datos()
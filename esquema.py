@@ -0,0 +1,323 @@
+# Módulo del esquema de la base de datos: única definición de tablas compartida por meteorologiadb.py e indexdb.py
+# La versión del esquema vive en PRAGMA user_version; al arrancar sólo se lee y, si está atrasada,
+# se aplican en orden las migraciones pendientes en una única transacción
+from __future__ import annotations
+import sqlite3
+from typing import Callable, List, Tuple
+
+import agregados
+import cambios
+import conteos
+import particiones
+import ultima_lectura
+from agregados import crear_agregados
+from archivo import crear_catalogo
+from cambios import crear_cambios
+from conteos import crear_conteos
+from conexion import escribir, obtener_conexion
+from estadisticas import crear_estadisticas
+from ultima_lectura import crear_ultima_lectura
+
+SQL_TABLAS = [
+    # USUARIO
+    """
+    CREATE TABLE IF NOT EXISTS usuario (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        rol TEXT NOT NULL,
+        email TEXT UNIQUE,
+        telefono TEXT,
+        zonas_interes TEXT,
+        permisos TEXT
+    );
+    """,
+    # PARCELA
+    """
+    CREATE TABLE IF NOT EXISTS parcela (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        latitud REAL NOT NULL,
+        longitud REAL NOT NULL,
+        altitud REAL,
+        area_ha REAL,
+        descripcion TEXT,
+        propietario_id INTEGER,
+        FOREIGN KEY (propietario_id) REFERENCES usuario(id)
+            ON UPDATE NO ACTION ON DELETE SET NULL
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_parcela_propietario ON parcela(propietario_id);",
+    # USUARIO_PARCELA (N..M)
+    """
+    CREATE TABLE IF NOT EXISTS usuario_parcela (
+        usuario_id INTEGER NOT NULL,
+        parcela_id INTEGER NOT NULL,
+        PRIMARY KEY (usuario_id, parcela_id),
+        FOREIGN KEY (usuario_id) REFERENCES usuario(id)
+            ON UPDATE NO ACTION ON DELETE CASCADE,
+        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
+            ON UPDATE NO ACTION ON DELETE CASCADE
+    );
+    """,
+    # ESTACION_METEOROLOGICA
+    """
+    CREATE TABLE IF NOT EXISTS estacion_meteorologica (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        latitud REAL NOT NULL,
+        longitud REAL NOT NULL,
+        altitud REAL,
+        activa INTEGER NOT NULL DEFAULT 1,
+        capacidad_registro INTEGER NOT NULL DEFAULT 100,
+        parcela_id INTEGER NOT NULL,
+        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
+            ON UPDATE NO ACTION ON DELETE CASCADE,
+        UNIQUE (nombre, parcela_id)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_estacion_parcela ON estacion_meteorologica(parcela_id);",
+    # SENSOR
+    """
+    CREATE TABLE IF NOT EXISTS sensor (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,         -- temperatura | humedad | precipitacion | viento
+        unidad TEXT NOT NULL,       -- °C | % | mm | km/h
+        precision REAL NOT NULL,
+        rango_min REAL,
+        rango_max REAL,
+        estado INTEGER NOT NULL DEFAULT 1,  -- 0/1
+        estacion_id INTEGER NOT NULL,
+        tipo_humedad TEXT,
+        fecha_calibracion NUMERIC,
+        tipo_medidor TEXT,
+        area_captacion REAL,
+        FOREIGN KEY (estacion_id) REFERENCES estacion_meteorologica(id)
+            ON UPDATE NO ACTION ON DELETE CASCADE
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sensor_estacion ON sensor(estacion_id);",
+    "CREATE INDEX IF NOT EXISTS idx_sensor_tipo ON sensor(tipo);",
+    # LECTURA
+    """
+    CREATE TABLE IF NOT EXISTS lectura (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id INTEGER NOT NULL,
+        fecha_hora INTEGER NOT NULL,  -- epoch en milisegundos (ver lectura.a_epoch_ms)
+        valor REAL NOT NULL,
+        calidad_dato TEXT DEFAULT 'OK',
+        fuente TEXT DEFAULT 'automatica',
+        FOREIGN KEY (sensor_id) REFERENCES sensor(id)
+            ON UPDATE NO ACTION ON DELETE CASCADE,
+        UNIQUE (sensor_id, fecha_hora)
+    );
+    """,
+]
+
+
+def convertir_fecha_hora_epoch(con: sqlite3.Connection) -> Tuple[int, int]:
+    """Convierte en sitio las fechas de texto de lectura a epoch en milisegundos.
+
+    Las bases antiguas conservan la columna declarada NUMERIC, que guarda los enteros como
+    INTEGER sin problema. Devuelve cuántas filas se convirtieron y cuántas quedaron sin
+    convertir (texto no válido o que colisiona con otra lectura del mismo sensor e instante).
+    """
+    cur = con.execute("""
+        UPDATE OR IGNORE lectura
+           SET fecha_hora = CAST(ROUND((julianday(fecha_hora) - 2440587.5) * 86400000) AS INTEGER)
+         WHERE typeof(fecha_hora) = 'text' AND julianday(fecha_hora) IS NOT NULL
+    """)
+    pendientes = con.execute("SELECT COUNT(*) FROM lectura WHERE typeof(fecha_hora) = 'text'").fetchone()[0]
+    if pendientes:
+        print(f"Aviso: {pendientes} lecturas conservan fecha_hora como texto (formato inválido o duplicadas).")
+    return cur.rowcount, pendientes
+
+
+def _crear_tablas(con: sqlite3.Connection) -> None:
+    # IF NOT EXISTS: las BD anteriores al versionado (user_version 0) ya tienen las tablas
+    for sql in SQL_TABLAS:
+        con.execute(sql)
+    convertir_fecha_hora_epoch(con)
+
+
+TRIGGERS_BORRADO_LECTURA = ("trg_agregado_delete", "trg_ultima_delete", "trg_conteo_delete",
+                            "trg_cambio_lectura_delete")
+
+
+def _vigilar_archivado(con: sqlite3.Connection) -> None:
+    # Los triggers AFTER DELETE de lectura se recrean con la condición archivo.SIN_ARCHIVAR; antes
+    # archivar() los borraba y volvía a crear en cada mes (un cambio de esquema por mes archivado)
+    crear_catalogo(con)
+    for nombre in TRIGGERS_BORRADO_LECTURA:
+        con.execute(f"DROP TRIGGER IF EXISTS {nombre}")
+    for sql in agregados.SQL_TRIGGERS + ultima_lectura.SQL_TRIGGERS + conteos.SQL_TRIGGERS + cambios.SQL_TRIGGERS:
+        con.execute(sql)  # IF NOT EXISTS: sólo se crean los que se acaban de borrar
+
+
+def _quitar_indice_duplicado(con: sqlite3.Connection) -> None:
+    # idx_lectura_sensor_fecha repetía las columnas del índice de UNIQUE (sensor_id, fecha_hora):
+    # el planificador ya usa sqlite_autoindex_lectura_1 y cada inserción mantenía dos B-trees iguales
+    con.execute("DROP INDEX IF EXISTS idx_lectura_sensor_fecha")
+
+
+def triggers_particion(nombre: str) -> List[str]:
+    """Triggers de una partición lectura_AAAAMM: los de lectura en cada módulo, con el sufijo del mes."""
+    return (agregados.sql_triggers(nombre) + ultima_lectura.sql_triggers(nombre) + conteos.sql_triggers(nombre)
+            + cambios.sql_triggers_lectura(nombre))
+
+
+def _crear_tabla_particion(con: sqlite3.Connection, mes: str, desde: int, hasta: int) -> Tuple[str, bool]:
+    nombre = particiones.nombre_particion(mes)
+    if con.execute("SELECT 1 FROM particion_lectura WHERE nombre = ?", (nombre,)).fetchone():
+        return nombre, False
+    con.execute(particiones.SQL_PARTICION.format(nombre=nombre))
+    con.execute("INSERT INTO particion_lectura (nombre, desde_ms, hasta_ms) VALUES (?,?,?)", (nombre, desde, hasta))
+    return nombre, True
+
+
+def crear_particion(con: sqlite3.Connection, mes: str, desde: int, hasta: int) -> str:
+    """Crea, si no existe, la partición del mes (limites_mes) con sus triggers y la añade a la vista lectura.
+
+    Es un cambio de esquema: ocurre una vez al mes en la ingesta normal. Devuelve su nombre.
+    """
+    nombre, nueva = _crear_tabla_particion(con, mes, desde, hasta)
+    if nueva:
+        for sql in triggers_particion(nombre):
+            con.execute(sql)
+        particiones.rehacer_vista(con)
+    return nombre
+
+
+def _particionar_lectura(con: sqlite3.Connection) -> None:
+    # Reparte la tabla lectura en particiones mensuales en una sola pasada. Los triggers se crean
+    # después de copiar: las tablas derivadas ya cuentan esas filas. Las filas con fecha de texto
+    # que no se pudo convertir quedan en lectura_sin_migrar, fuera de la vista
+    particiones.crear_catalogo(con)
+    cur = con.execute("SELECT sensor_id, fecha_hora, valor, calidad_dato, fuente FROM lectura "
+                      "WHERE typeof(fecha_hora) = 'integer'")
+    nombres = []
+    while True:
+        filas = cur.fetchmany(10_000)
+        if not filas:
+            break
+        for (mes, desde, hasta), grupo in particiones.agrupar(filas).items():
+            nombre, nueva = _crear_tabla_particion(con, mes, desde, hasta)
+            if nueva:
+                nombres.append(nombre)
+            con.executemany(f"INSERT INTO {nombre} (sensor_id, fecha_hora, valor, calidad_dato, fuente) "
+                            "VALUES (?,?,?,?,?)", grupo)
+    pendientes = con.execute("SELECT COUNT(*) FROM lectura WHERE typeof(fecha_hora) <> 'integer'").fetchone()[0]
+    if pendientes:
+        con.execute("CREATE TABLE lectura_sin_migrar AS SELECT * FROM lectura WHERE typeof(fecha_hora) <> 'integer'")
+        print(f"Aviso: {pendientes} lecturas sin fecha válida quedan en lectura_sin_migrar.")
+    # Las inserciones ya no suman sqlite_sequence.seq a la versión (cambios.SQL_VERSIONES): se
+    # acumula aquí para que la versión de lectura no retroceda
+    con.execute("""UPDATE cambio_tabla SET version = version + 1 +
+                          COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'lectura'), 0)
+                    WHERE tabla = 'lectura'""")
+    con.execute("DROP TABLE lectura")  # con sus triggers e índices
+    if "lectura_id" in [c[1] for c in con.execute("PRAGMA table_info(sensor_ultima_lectura)")]:
+        con.execute("ALTER TABLE sensor_ultima_lectura DROP COLUMN lectura_id")
+    for nombre in nombres:
+        for sql in triggers_particion(nombre):
+            con.execute(sql)
+    particiones.rehacer_vista(con)
+    if pendientes:
+        # La última lectura de un sensor podía ser una de las que quedan fuera
+        con.execute("""
+            REPLACE INTO sensor_ultima_lectura (sensor_id, fecha_hora, valor, calidad_dato)
+            SELECT u.sensor_id, l.fecha_hora, l.valor, l.calidad_dato
+              FROM sensor_ultima_lectura u
+              JOIN lectura l ON l.sensor_id = u.sensor_id
+                            AND l.fecha_hora = (SELECT MAX(fecha_hora) FROM lectura WHERE sensor_id = u.sensor_id)
+             WHERE typeof(u.fecha_hora) <> 'integer'
+        """)
+        con.execute("DELETE FROM sensor_ultima_lectura WHERE typeof(fecha_hora) <> 'integer'")
+
+
+# (versión alcanzada, migración); sólo se añaden al final, nunca se reordenan
+MIGRACIONES: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _crear_tablas),           # tablas base y lectura.fecha_hora como epoch en ms
+    (2, crear_agregados),         # agregado_hora / agregado_dia
+    (3, crear_ultima_lectura),    # sensor_ultima_lectura
+    (4, crear_catalogo),          # archivo_lectura (archivo columnar de meses antiguos)
+    (5, crear_estadisticas),      # estadistica_sensor (instantáneas de estadísticas en línea)
+    (6, crear_cambios),           # cambio_tabla (versiones por tabla para informes incrementales)
+    (7, crear_conteos),           # lectura_conteo (lecturas por sensor para el informe)
+    (8, _vigilar_archivado),      # archivo_en_curso y triggers AFTER DELETE de lectura que lo respetan
+    (9, crear_catalogo),          # idx_archivo_hasta (lecturas reenviadas de meses archivados)
+    (10, _quitar_indice_duplicado),  # sin idx_lectura_sensor_fecha (duplicaba el índice de UNIQUE)
+    (11, _particionar_lectura),   # lectura en particiones mensuales lectura_AAAAMM y vista lectura
+]
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def version(con: sqlite3.Connection) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _migrar(con: sqlite3.Connection) -> int:
+    # BEGIN IMMEDIATE antes de releer la versión: si otro proceso migra a la vez, espera y no repite
+    if not con.in_transaction:
+        con.execute("BEGIN IMMEDIATE")
+    actual = version(con)
+    for destino, migracion in MIGRACIONES:
+        if destino > actual:
+            migracion(con)
+            con.execute(f"PRAGMA user_version = {destino}")
+    return max(actual, VERSION_ACTUAL)
+
+
+def crear_bd() -> int:
+    """Deja la BD en VERSION_ACTUAL y devuelve su versión.
+
+    Con el esquema al día sólo cuesta leer PRAGMA user_version; si no, aplica las migraciones
+    pendientes (todas o ninguna) a través del escritor de conexion.py.
+    """
+    actual = version(obtener_conexion())
+    if actual >= VERSION_ACTUAL:
+        return actual
+    return escribir(_migrar)
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from conexion import configurar, cerrar_conexiones
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "e.db")
+        # BD anterior al versionado: tabla lectura con fechas de texto y user_version 0
+        antigua = sqlite3.connect(ruta)
+        for sql in SQL_TABLAS[:-1]:
+            antigua.execute(sql)
+        antigua.execute("CREATE TABLE lectura (id INTEGER PRIMARY KEY AUTOINCREMENT, sensor_id INTEGER NOT NULL, "
+                        "fecha_hora NUMERIC NOT NULL, valor REAL NOT NULL, calidad_dato TEXT DEFAULT 'OK', "
+                        "fuente TEXT DEFAULT 'automatica', UNIQUE (sensor_id, fecha_hora))")
+        antigua.execute("CREATE INDEX idx_lectura_sensor_fecha ON lectura(sensor_id, fecha_hora)")
+        antigua.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        antigua.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        antigua.execute("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('temperatura', 'C', 0.1, 1)")
+        antigua.execute("INSERT INTO lectura (sensor_id, fecha_hora, valor) VALUES (1, '2025-01-01 00:00:00', 5.0)")
+        antigua.execute("INSERT INTO lectura (sensor_id, fecha_hora, valor) VALUES (1, 'ayer', 4.0)")
+        antigua.commit(); antigua.close()
+        configurar(ruta)
+        assert crear_bd() == VERSION_ACTUAL
+        con = obtener_conexion()
+        assert con.execute("SELECT fecha_hora FROM lectura").fetchone()[0] == 1735689600000
+        assert con.execute("SELECT n FROM agregado_dia").fetchone()[0] == 1
+        assert con.execute("SELECT valor FROM sensor_ultima_lectura").fetchone()[0] == 5.0
+        # lectura pasa a ser la vista de las particiones; la fecha no convertible queda aparte
+        assert con.execute("SELECT type FROM sqlite_master WHERE name = 'lectura'").fetchone()[0] == "view"
+        assert [p[0] for p in particiones.particiones(con)] == ["lectura_202501"]
+        assert con.execute("SELECT fecha_hora FROM lectura_sin_migrar").fetchall() == [("ayer",)]
+        assert con.execute("SELECT name FROM sqlite_master WHERE name = 'idx_lectura_sensor_fecha'").fetchone() is None
+        # Con el esquema al día no se ejecuta DDL
+        sentencias = []
+        con.set_trace_callback(sentencias.append)
+        assert crear_bd() == VERSION_ACTUAL
+        con.set_trace_callback(None)
+        assert sentencias == ["PRAGMA user_version"]
+        cerrar_conexiones()
+    print("[esquema] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -1,38 +1,251 @@
 # Módulo que define la estación meteorológica
 # Gestiona un conjunto de sensores y coordina la obtención de lecturas
 from __future__ import annotations
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from dataclasses import dataclass, field
-from typing import List, Tuple
-from lectura import Lectura
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from estadisticas import EstadisticaSensor, guardar_instantanea
+from historial import BufferCircular
+from lectura import Lectura, LecturaBatch, a_epoch_ms
+from registro import Indexable, Registro
 from sensores import Sensor
 
 # Define tipo personalizado para coordenadas geográficas
 Coord = tuple[float, float] | str | Tuple[float, float]
 
 @dataclass
-class EstacionMeteorologica:
+class ResultadoAdquisicion:
+    # Lecturas obtenidas (en el orden de los sensores) y sensores fallidos: sensor_id -> motivo
+    lecturas: List[Lectura] = field(default_factory=list)
+    fallidos: Dict[int, str] = field(default_factory=dict)
+
+    def extender(self, otro: "ResultadoAdquisicion") -> None:
+        self.lecturas.extend(otro.lecturas)
+        self.fallidos.update(otro.fallidos)
+
+Trabajo = Optional[Tuple[Future, Callable[[], Lectura]]]
+
+def _lector(trabajos: "queue.SimpleQueue[Trabajo]") -> None:
+    # Hilo daemon de adquirir_concurrente: ejecuta lecturas hasta recibir None
+    while True:
+        trabajo = trabajos.get()
+        if trabajo is None:
+            return
+        futuro, leer = trabajo
+        if not futuro.set_running_or_notify_cancel():
+            continue
+        try:
+            futuro.set_result(leer())
+        except BaseException as e:
+            futuro.set_exception(e)
+
+def adquirir_concurrente(sensores: Sequence[Sensor], max_hilos: int = 8, timeout_sensor: float = 2.0,
+                         timeout_total: Optional[float] = None) -> ResultadoAdquisicion:
+    """Lee los sensores con como mucho max_hilos lecturas en curso a la vez.
+
+    timeout_sensor cuenta desde que empieza la lectura de cada sensor y timeout_total desde la
+    llamada. Un sensor que los supera o lanza una excepción queda en fallidos y no retrasa al
+    resto: su hilo no se puede interrumpir, así que se abandona, deja de contar en max_hilos y
+    otro hilo ocupa su sitio. Los hilos son daemon: a diferencia de los de ThreadPoolExecutor,
+    que el intérprete espera al salir, uno colgado no retrasa el cierre del proceso.
+    """
+    if max_hilos < 1:
+        raise ValueError("max_hilos debe ser mayor que 0")
+    limite_total = time.monotonic() + timeout_total if timeout_total is not None else float("inf")
+    resultado = ResultadoAdquisicion()
+    lecturas: Dict[int, Lectura] = {}
+    trabajos: "queue.SimpleQueue[Trabajo]" = queue.SimpleQueue()
+    hilos = 0
+    cola = iter(enumerate(sensores))
+    pendientes: Dict[Future, Tuple[int, float]] = {}  # futuro -> (índice del sensor, límite)
+
+    def arrancar_hilo() -> None:
+        nonlocal hilos
+        threading.Thread(target=_lector, args=(trabajos,), name="adquisicion", daemon=True).start()
+        hilos += 1
+
+    def lanzar() -> None:
+        while len(pendientes) < max_hilos:
+            siguiente = next(cola, None)
+            if siguiente is None:
+                return
+            i, sensor = siguiente
+            futuro: Future = Future()
+            trabajos.put((futuro, sensor.obtener_lectura))
+            pendientes[futuro] = (i, time.monotonic() + timeout_sensor)
+
+    for _ in range(min(max_hilos, len(sensores))):
+        arrancar_hilo()
+
+    try:
+        lanzar()
+        while pendientes:
+            espera = min([limite_total, *(limite for _, limite in pendientes.values())]) - time.monotonic()
+            listos, _ = wait(pendientes, timeout=max(0.0, espera), return_when=FIRST_COMPLETED)
+            for f in listos:
+                i, _ = pendientes.pop(f)
+                try:
+                    lecturas[i] = f.result()
+                except Exception as e:
+                    resultado.fallidos[sensores[i].id] = f"error: {e}"
+            ahora = time.monotonic()
+            for f, (i, limite) in list(pendientes.items()):
+                if ahora >= limite:
+                    del pendientes[f]
+                    resultado.fallidos[sensores[i].id] = "timeout"
+                    arrancar_hilo()  # sustituye al que queda colgado en esta lectura
+            if ahora >= limite_total:
+                for i, _ in [*pendientes.values(), *cola]:
+                    resultado.fallidos[sensores[i].id] = "timeout total"
+                break
+            lanzar()
+    finally:
+        # Sin esperar a nadie: los hilos libres terminan ya y los colgados al acabar su lectura
+        for f in pendientes:
+            f.cancel()
+        for _ in range(hilos):
+            trabajos.put(None)
+    resultado.lecturas = [lecturas[i] for i in sorted(lecturas)]
+    return resultado
+
+async def adquirir_async(sensores: Sequence[Sensor], timeout_sensor: float = 2.0,
+                         timeout_total: Optional[float] = None,
+                         max_concurrentes: Optional[int] = None) -> ResultadoAdquisicion:
+    """Variante asyncio de adquirir_concurrente sobre Sensor.obtener_lectura_async()."""
+    semaforo = asyncio.Semaphore(max_concurrentes) if max_concurrentes else None
+
+    async def leer(sensor: Sensor) -> Lectura:
+        if semaforo is None:
+            return await asyncio.wait_for(sensor.obtener_lectura_async(), timeout_sensor)
+        async with semaforo:
+            return await asyncio.wait_for(sensor.obtener_lectura_async(), timeout_sensor)
+
+    tareas = [asyncio.ensure_future(leer(s)) for s in sensores]
+    resultado = ResultadoAdquisicion()
+    if not tareas:
+        return resultado
+    _, pendientes = await asyncio.wait(tareas, timeout=timeout_total)
+    for t in pendientes:
+        t.cancel()
+    for sensor, t in zip(sensores, tareas):
+        if t in pendientes:
+            resultado.fallidos[sensor.id] = "timeout total"
+        elif isinstance(t.exception(), asyncio.TimeoutError):
+            resultado.fallidos[sensor.id] = "timeout"
+        elif t.exception() is not None:
+            resultado.fallidos[sensor.id] = f"error: {t.exception()}"
+        else:
+            resultado.lecturas.append(t.result())
+    return resultado
+
+@dataclass
+class EstacionMeteorologica(Indexable):
+    # Cambiar activa actualiza las estaciones activas de la parcela (registro.Indexable)
+    ATRIBUTO_ACTIVO = "activa"
     id: int
     nombre: str
     coordenadas: Coord
     altitud: float
     activa: bool
-    sensores: List[Sensor] = field(default_factory=list)
+    # Acepta una lista; __post_init__ la convierte en un Registro indexado por id y tipo
+    sensores: Registro[Sensor] = field(default_factory=list)
+    # Lecturas que se conservan en memoria por sensor (columna estacion_meteorologica.capacidad_registro)
+    capacidad_registro: int = 100
+    historial: Dict[int, BufferCircular] = field(default_factory=dict, repr=False, compare=False)
+    # Media, varianza, mínimo y máximo por sensor desde el último reiniciar_estadisticas()
+    estadisticas: Dict[int, EstadisticaSensor] = field(default_factory=dict, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.sensores = Registro(self.sensores, tipo=lambda s: s.tipo, es_activo=lambda s: s.esta_activo())
 
     def agregar_sensor(self, sensor: Sensor) -> None:
-        self.sensores.append(sensor)
+        # ValueError si ya hay un sensor con ese id
+        self.sensores.agregar(sensor)
 
     def remover_sensor(self, sensor_id: int) -> None:
-        self.sensores = [s for s in self.sensores if s.id != sensor_id]
+        self.sensores.remover(sensor_id)
+        self.historial.pop(sensor_id, None)
+        self.estadisticas.pop(sensor_id, None)
+
+    def obtener_sensor(self, sensor_id: int) -> Optional[Sensor]:
+        return self.sensores.obtener(sensor_id)
+
+    def obtener_sensores_por_tipo(self, tipo: str) -> List[Sensor]:
+        return self.sensores.por_tipo(tipo)
 
     def obtener_sensores_activos(self) -> List[Sensor]:
-        return [s for s in self.sensores if s.esta_activo()]
+        return self.sensores.activos()
+
+    def registrar_lecturas(self, lecturas: Iterable[Lectura] | LecturaBatch) -> None:
+        """Guarda las lecturas en el historial y las estadísticas de su sensor; ignora las de sensores ajenos.
+
+        Un LecturaBatch se recorre por columnas, sin crear un Lectura ni un datetime por fila.
+        """
+        if isinstance(lecturas, LecturaBatch):
+            filas = zip(lecturas.sensor_ids, lecturas.tiempos, lecturas.valores)
+        else:
+            filas = ((l.sensor_id, a_epoch_ms(l.fecha_hora), l.valor) for l in lecturas)
+        for sensor_id, epoch_ms, valor in filas:
+            buffer = self.historial.get(sensor_id)
+            if buffer is None:
+                if sensor_id not in self.sensores:
+                    continue
+                buffer = self.historial[sensor_id] = BufferCircular(sensor_id, self.capacidad_registro)
+            buffer.agregar_valor(epoch_ms, valor)
+            estadistica = self.estadisticas.get(sensor_id)
+            if estadistica is None:
+                estadistica = self.estadisticas[sensor_id] = EstadisticaSensor()
+            estadistica.agregar(valor)
 
-    def obtener_todas_lecturas(self) -> List[Lectura]:
+    def reiniciar_estadisticas(self) -> Dict[int, EstadisticaSensor]:
+        """Cierra la ventana actual: devuelve sus estadísticas y empieza otra vacía."""
+        cerradas, self.estadisticas = self.estadisticas, {}
+        return cerradas
+
+    def guardar_estadisticas(self, fecha: Optional[datetime] = None) -> int:
+        # Instantánea en la tabla estadistica_sensor (ver estadisticas.ultima_instantanea)
+        return guardar_instantanea(self.estadisticas, fecha)
+
+    def historial_ultimas(self, sensor_id: int, n: int) -> LecturaBatch:
+        # Las n lecturas más recientes del sensor que siguen en memoria
+        buffer = self.historial.get(sensor_id)
+        return buffer.ultimas(n) if buffer is not None else LecturaBatch()
+
+    def historial_desde(self, sensor_id: int, desde: datetime) -> LecturaBatch:
+        buffer = self.historial.get(sensor_id)
+        return buffer.desde(desde) if buffer is not None else LecturaBatch()
+
+    def obtener_todas_lecturas(self, como_lote: bool = False) -> List[Lectura] | LecturaBatch:
+        # como_lote=True devuelve un LecturaBatch (columnas array) en lugar de una lista de objetos
+        if como_lote:
+            lote = LecturaBatch()
+            for s in self.obtener_sensores_activos():
+                lote.agregar(s.obtener_lectura())
+            self.registrar_lecturas(lote)
+            return lote
         lecturas: List[Lectura] = []
         for s in self.obtener_sensores_activos():
             lecturas.append(s.obtener_lectura())
+        self.registrar_lecturas(lecturas)
         return lecturas
 
+    def obtener_todas_lecturas_concurrente(self, max_hilos: int = 8, timeout_sensor: float = 2.0,
+                                           timeout_total: Optional[float] = None) -> ResultadoAdquisicion:
+        resultado = adquirir_concurrente(self.obtener_sensores_activos(), max_hilos, timeout_sensor, timeout_total)
+        self.registrar_lecturas(resultado.lecturas)
+        return resultado
+
+    async def obtener_todas_lecturas_async(self, timeout_sensor: float = 2.0,
+                                           timeout_total: Optional[float] = None) -> ResultadoAdquisicion:
+        resultado = await adquirir_async(self.obtener_sensores_activos(), timeout_sensor, timeout_total)
+        self.registrar_lecturas(resultado.lecturas)
+        return resultado
+
     def __str__(self) -> str:
         return f"Estacion(id={self.id}, nombre='{self.nombre}', activa={self.activa}, sensores={len(self.sensores)})"
 
@@ -45,8 +258,53 @@ class EstacionMeteorologica:
     assert len(e.sensores) == 1
     lects = e.obtener_todas_lecturas()
     assert len(lects) >= 1
+    lote = e.obtener_todas_lecturas(como_lote=True)
+    assert len(lote) == 1 and e.historial_ultimas(10, 1) == lote
+    assert len(e.historial[10]) == 2 and e.estadisticas[10].n == 2 and e.estadisticas[10].maximo >= lote.valores[0]
+    import asyncio, time
+    import threading
+    daemon = []
+    class SensorLento(SensorTemperatura):
+        def obtener_lectura(self):
+            daemon.append(threading.current_thread().daemon)  # no retiene la salida del intérprete
+            time.sleep(1.0)
+            return super().obtener_lectura()
+    e.agregar_sensor(SensorLento(id=11, tipo="temperatura", estacion_id=1, estado=True, unidad="°C", rango_min=0, rango_max=1))
+    t0 = time.monotonic()
+    r = e.obtener_todas_lecturas_concurrente(timeout_sensor=0.2)
+    assert time.monotonic() - t0 < 0.5
+    assert [l.sensor_id for l in r.lecturas] == [10] and r.fallidos == {11: "timeout"} and daemon == [True]
+    t0 = time.monotonic()
+    r = asyncio.run(e.obtener_todas_lecturas_async(timeout_sensor=0.2))
+    assert time.monotonic() - t0 < 0.5  # asyncio.run() no espera a la lectura abandonada
+    assert [l.sensor_id for l in r.lecturas] == [10] and r.fallidos == {11: "timeout"} and daemon == [True, True]
+    e.remover_sensor(11)
+    try:
+        e.agregar_sensor(SensorTemperatura(id=10, tipo="temperatura", estacion_id=1, estado=True, unidad="°C", rango_min=0, rango_max=1))
+        assert False, "id duplicado"
+    except ValueError:
+        pass
+    assert e.obtener_sensor(10) is s and e.obtener_sensores_por_tipo("temperatura") == [s]
+    s.estado = False
+    assert e.obtener_sensores_activos() == [] and e.obtener_todas_lecturas() == []
+    s.estado = True
+    assert e.obtener_sensores_activos() == [s]
+    from datetime import timedelta
+    e.capacidad_registro = 3
+    e.historial.clear()
+    e.reiniciar_estadisticas()
+    t0 = datetime(2025, 1, 1)
+    e.registrar_lecturas(Lectura(float(i), t0 + timedelta(minutes=i), 10) for i in range(5))
+    e.registrar_lecturas([Lectura(1.0, t0, 99)])
+    assert list(e.historial_ultimas(10, 2).valores) == [3.0, 4.0] and 99 not in e.historial
+    assert list(e.historial_desde(10, t0).valores) == [2.0, 3.0, 4.0]
+    e.obtener_todas_lecturas()
+    assert len(e.historial_ultimas(10, 10)) == 3 and e.historial_ultimas(10, 1)[0].fecha_hora > t0
+    assert e.estadisticas[10].n == 6 and e.estadisticas[10].minimo == 0.0
+    assert e.reiniciar_estadisticas()[10].n == 6 and e.estadisticas == {}
     e.remover_sensor(10)
-    assert len(e.sensores) == 0
+    assert len(e.sensores) == 0 and e.obtener_sensores_activos() == []
+    assert len(e.historial_ultimas(10, 5)) == 0
     print("[estacion] OK")
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+# Módulo de estadísticas en línea por sensor (algoritmo de Welford) sobre la adquisición
+# Cada lectura las actualiza en O(1); se combinan entre estaciones o hilos (Chan et al.) y se
+# guardan como instantáneas en la tabla estadistica_sensor
+from __future__ import annotations
+import math
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from conexion import escribir, obtener_conexion
+from lectura import a_epoch_ms, desde_epoch_ms
+
+SQL_TABLA = """
+CREATE TABLE IF NOT EXISTS estadistica_sensor (
+    sensor_id INTEGER NOT NULL,
+    fecha_hora INTEGER NOT NULL,   -- epoch ms de la instantánea
+    n INTEGER NOT NULL,
+    media REAL NOT NULL,
+    m2 REAL NOT NULL,              -- suma de cuadrados de las desviaciones a la media
+    minimo REAL,
+    maximo REAL,
+    PRIMARY KEY (sensor_id, fecha_hora)
+) WITHOUT ROWID;
+"""
+
+
+def crear_estadisticas(con: sqlite3.Connection) -> None:
+    """Migración 5 (esquema.py): tabla de instantáneas de EstadisticaSensor."""
+    con.execute(SQL_TABLA)
+
+
+@dataclass(slots=True)
+class EstadisticaSensor:
+    n: int = 0
+    media: float = 0.0
+    m2: float = 0.0
+    minimo: float = math.inf
+    maximo: float = -math.inf
+
+    def agregar(self, valor: float) -> None:
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+        if valor < self.minimo:
+            self.minimo = valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def agregar_lote(self, valores: Iterable[float]) -> None:
+        for v in valores:
+            self.agregar(v)
+
+    def combinar(self, otro: "EstadisticaSensor") -> None:
+        """Suma en sitio las lecturas resumidas en otro, sin volver a recorrerlas."""
+        if otro.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.media, self.m2, self.minimo, self.maximo = otro.n, otro.media, otro.m2, otro.minimo, otro.maximo
+            return
+        n = self.n + otro.n
+        delta = otro.media - self.media
+        self.media += delta * otro.n / n
+        self.m2 += otro.m2 + delta * delta * self.n * otro.n / n
+        self.n = n
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+
+    @classmethod
+    def combinadas(cls, estadisticas: Iterable["EstadisticaSensor"]) -> "EstadisticaSensor":
+        total = cls()
+        for e in estadisticas:
+            total.combinar(e)
+        return total
+
+    def reiniciar(self) -> None:
+        self.n, self.media, self.m2, self.minimo, self.maximo = 0, 0.0, 0.0, math.inf, -math.inf
+
+    def copia(self) -> "EstadisticaSensor":
+        return EstadisticaSensor(self.n, self.media, self.m2, self.minimo, self.maximo)
+
+    @property
+    def varianza(self) -> Optional[float]:
+        # Poblacional, como agregados.consultar_agregado()
+        return self.m2 / self.n if self.n else None
+
+    @property
+    def desviacion(self) -> Optional[float]:
+        return math.sqrt(self.varianza) if self.n else None
+
+    def resumen(self) -> Dict[str, Optional[float]]:
+        # Mismas claves que agregados.consultar_agregado()
+        if not self.n:
+            return {"n": 0, "minimo": None, "maximo": None, "media": None, "varianza": None}
+        return {"n": self.n, "minimo": self.minimo, "maximo": self.maximo, "media": self.media,
+                "varianza": self.varianza}
+
+
+def guardar_instantanea(estadisticas: Dict[int, EstadisticaSensor], fecha: Optional[datetime] = None) -> int:
+    """Guarda el estado de cada sensor (sensor_id -> EstadisticaSensor) y devuelve cuántos se guardaron."""
+    ms = a_epoch_ms(fecha or datetime.now())
+    filas = [(sid, ms, e.n, e.media, e.m2, e.minimo if e.n else None, e.maximo if e.n else None)
+             for sid, e in estadisticas.items()]
+
+    def guardar(con: sqlite3.Connection) -> int:
+        con.executemany("INSERT OR REPLACE INTO estadistica_sensor VALUES (?, ?, ?, ?, ?, ?, ?)", filas)
+        return len(filas)
+
+    return escribir(guardar)
+
+
+def ultima_instantanea(sensor_id: int) -> Optional[Tuple[datetime, EstadisticaSensor]]:
+    """(fecha, estadística) de la instantánea más reciente del sensor, o None si no hay."""
+    fila = obtener_conexion().execute(
+        "SELECT fecha_hora, n, media, m2, minimo, maximo FROM estadistica_sensor "
+        "WHERE sensor_id = ? ORDER BY fecha_hora DESC LIMIT 1", (sensor_id,)).fetchone()
+    if fila is None:
+        return None
+    ms, n, media, m2, mn, mx = fila
+    return desde_epoch_ms(ms), EstadisticaSensor(n, media, m2, math.inf if mn is None else mn,
+                                                 -math.inf if mx is None else mx)
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, random, statistics, tempfile
+    from conexion import configurar, cerrar_conexiones
+    from esquema import crear_bd
+    valores = [random.uniform(-5, 35) for _ in range(1000)]
+    a, b = EstadisticaSensor(), EstadisticaSensor()
+    a.agregar_lote(valores[:300])
+    b.agregar_lote(valores[300:])
+    total = EstadisticaSensor.combinadas([a, b, EstadisticaSensor()])
+    assert total.n == 1000 and math.isclose(total.media, statistics.fmean(valores))
+    assert math.isclose(total.varianza, statistics.pvariance(valores))
+    assert (total.minimo, total.maximo) == (min(valores), max(valores))
+    a.reiniciar()
+    assert a.resumen()["media"] is None
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "s.db"))
+        crear_bd()
+        assert ultima_instantanea(1) is None
+        assert guardar_instantanea({1: a, 2: total}, datetime(2025, 1, 1)) == 2
+        fecha, e = ultima_instantanea(2)
+        assert fecha == datetime(2025, 1, 1) and e == total
+        assert ultima_instantanea(1)[1] == EstadisticaSensor()
+        cerrar_conexiones()
+    print("[estadisticas] OK")
+
+if __name__ == "__main__":
+    _tests()"""
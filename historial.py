@@ -0,0 +1,122 @@
+# Módulo del historial en memoria de cada sensor: buffer circular de tamaño fijo
+# (capacidad_registro de la estación) sobre columnas array, para consultar lecturas recientes sin SQLite
+from __future__ import annotations
+from array import array
+from datetime import datetime
+from typing import Iterator, Tuple
+
+from lectura import Lectura, LecturaBatch, a_epoch_ms
+
+
+class BufferCircular:
+    """Últimas `capacidad` lecturas de un sensor: epoch ms y valor en arrays preasignados.
+
+    agregar() es O(1) y sobrescribe la más antigua cuando está lleno. Las lecturas deben llegar
+    en orden de fecha (como las produce la estación) para que desde() pueda buscar por bisección.
+    """
+    __slots__ = ("sensor_id", "capacidad", "_tiempos", "_valores", "_inicio", "_n")
+
+    def __init__(self, sensor_id: int, capacidad: int = 100) -> None:
+        if capacidad < 1:
+            raise ValueError("capacidad debe ser mayor que 0")
+        self.sensor_id = sensor_id
+        self.capacidad = capacidad
+        self._tiempos = array("q", bytes(8 * capacidad))
+        self._valores = array("d", bytes(8 * capacidad))
+        self._inicio = 0  # posición física de la lectura más antigua
+        self._n = 0
+
+    def agregar(self, lectura: Lectura) -> None:
+        self.agregar_valor(a_epoch_ms(lectura.fecha_hora), lectura.valor)
+
+    def agregar_valor(self, epoch_ms: int, valor: float) -> None:
+        if self._n < self.capacidad:
+            i = (self._inicio + self._n) % self.capacidad
+            self._n += 1
+        else:
+            i = self._inicio
+            self._inicio = (self._inicio + 1) % self.capacidad
+        self._tiempos[i] = epoch_ms
+        self._valores[i] = valor
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _tiempo(self, k: int) -> int:
+        # k-ésima lectura en orden lógico (0 = la más antigua)
+        return self._tiempos[(self._inicio + k) % self.capacidad]
+
+    def ventana(self, desde_k: int = 0) -> Tuple[Tuple[memoryview, memoryview], ...]:
+        """Lecturas desde la k-ésima más antigua como vistas (tiempos, valores) sin copia.
+
+        Como el buffer da la vuelta, son uno o dos tramos contiguos, en orden cronológico.
+        """
+        desde_k = max(0, min(desde_k, self._n))
+        ini = (self._inicio + desde_k) % self.capacidad
+        fin = ini + self._n - desde_k
+        t, v = memoryview(self._tiempos), memoryview(self._valores)
+        if fin <= self.capacidad:
+            return ((t[ini:fin], v[ini:fin]),) if fin > ini else ()
+        fin -= self.capacidad
+        return (t[ini:], v[ini:]), (t[:fin], v[:fin])
+
+    def _indice_desde(self, epoch_ms: int) -> int:
+        # Primera posición lógica con tiempo >= epoch_ms
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._tiempo(mid) < epoch_ms:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def ultimas_vistas(self, n: int) -> Tuple[Tuple[memoryview, memoryview], ...]:
+        return self.ventana(self._n - max(0, n))
+
+    def desde_vistas(self, desde: datetime) -> Tuple[Tuple[memoryview, memoryview], ...]:
+        return self.ventana(self._indice_desde(a_epoch_ms(desde)))
+
+    def _lote(self, tramos) -> LecturaBatch:
+        lote = LecturaBatch()
+        for tiempos, valores in tramos:
+            lote.tiempos.frombytes(tiempos.cast("B"))
+            lote.valores.frombytes(valores.cast("B"))
+        lote.sensor_ids.extend([self.sensor_id] * len(lote.valores))
+        return lote
+
+    def ultimas(self, n: int) -> LecturaBatch:
+        """Las n lecturas más recientes (o todas si hay menos), de la más antigua a la más nueva."""
+        return self._lote(self.ultimas_vistas(n))
+
+    def desde(self, desde: datetime) -> LecturaBatch:
+        """Lecturas con fecha_hora >= desde."""
+        return self._lote(self.desde_vistas(desde))
+
+    def __iter__(self) -> Iterator[Lectura]:
+        for tiempos, valores in self.ventana():
+            for ms, valor in zip(tiempos, valores):
+                yield Lectura.desde_bd(self.sensor_id, ms, valor)
+
+    def __repr__(self) -> str:
+        return f"BufferCircular(sensor_id={self.sensor_id}, n={self._n}, capacidad={self.capacidad})"
+
+
+# --- Pruebas ---
+"""def _tests():
+    from datetime import timedelta
+    t0 = datetime(2025, 1, 1)
+    b = BufferCircular(7, capacidad=5)
+    assert len(b.ultimas(3)) == 0 and b.ventana() == ()
+    for i in range(8):
+        b.agregar(Lectura(float(i), t0 + timedelta(minutes=i), 7))
+    assert len(b) == 5 and [l.valor for l in b] == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert list(b.ultimas(2).valores) == [6.0, 7.0] and set(b.ultimas(2).sensor_ids) == {7}
+    assert list(b.ultimas(50).valores) == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert list(b.desde(t0 + timedelta(minutes=5)).valores) == [5.0, 6.0, 7.0]
+    assert len(b.desde(t0 + timedelta(hours=1))) == 0
+    assert len(b.ventana()) == 2 and b.ventana()[0][1].obj is b._valores
+    print("[historial] OK")
+
+if __name__ == "__main__":
+    _tests()"""
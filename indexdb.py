@@ -1,125 +1,18 @@
-import sqlite3
-import os
 import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 
-# Base de datos dentro de la carpeta del proyecto (requisito 8)
-DB_NAME = os.path.join(os.path.dirname(__file__), "meteorologiadb.db")
+# Base de datos dentro de la carpeta del proyecto (requisito 8): ver conexion.DB_NAME
+from conexion import activar_wal, obtener_conexion
+from esquema import crear_bd
+from informe import RUTA_INFORME, motor_de_bd
 
 # ==============================================
 # CONEXIÓN Y CREACIÓN DE BASE DE DATOS / TABLAS
 # ==============================================
 def create_connection():
-    con = sqlite3.connect(DB_NAME)
-    con.execute("PRAGMA foreign_keys = ON;")
-    return con
-
-def crear_bd():
-    con = create_connection()
-    cur = con.cursor()
-
-    # USUARIO
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS usuario (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        rol TEXT NOT NULL,
-        email TEXT UNIQUE,
-        telefono TEXT,
-        zonas_interes TEXT,
-        permisos TEXT
-    );
-    """)
-
-    # PARCELA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS parcela (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        latitud REAL NOT NULL,
-        longitud REAL NOT NULL,
-        altitud REAL,
-        area_ha REAL,
-        descripcion TEXT,
-        propietario_id INTEGER,
-        FOREIGN KEY (propietario_id) REFERENCES usuario(id)
-            ON UPDATE NO ACTION ON DELETE SET NULL
-    );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_parcela_propietario ON parcela(propietario_id);")
-
-    # USUARIO_PARCELA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS usuario_parcela (
-        usuario_id INTEGER NOT NULL,
-        parcela_id INTEGER NOT NULL,
-        PRIMARY KEY (usuario_id, parcela_id),
-        FOREIGN KEY (usuario_id) REFERENCES usuario(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE
-    );
-    """)
-
-    # ESTACION_METEOROLOGICA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS estacion_meteorologica (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        latitud REAL NOT NULL,
-        longitud REAL NOT NULL,
-        altitud REAL,
-        activa INTEGER NOT NULL DEFAULT 1,
-        capacidad_registro INTEGER NOT NULL DEFAULT 100,
-        parcela_id INTEGER NOT NULL,
-        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        UNIQUE (nombre, parcela_id)
-    );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_estacion_parcela ON estacion_meteorologica(parcela_id);")
-
-    # SENSOR
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS sensor (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tipo TEXT NOT NULL,         -- temperatura | humedad | precipitacion | viento
-        unidad TEXT NOT NULL,       -- °C | % | mm | km/h
-        precision REAL NOT NULL,
-        rango_min REAL,
-        rango_max REAL,
-        estado INTEGER NOT NULL DEFAULT 1,  -- 0/1
-        estacion_id INTEGER NOT NULL,
-        tipo_humedad TEXT,
-        fecha_calibracion NUMERIC,
-        tipo_medidor TEXT,
-        area_captacion REAL,
-        FOREIGN KEY (estacion_id) REFERENCES estacion_meteorologica(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE
-    );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_sensor_estacion ON sensor(estacion_id);")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_sensor_tipo ON sensor(tipo);")
-
-    # LECTURA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS lectura (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sensor_id INTEGER NOT NULL,
-        fecha_hora NUMERIC NOT NULL,
-        valor REAL NOT NULL,
-        calidad_dato TEXT DEFAULT 'OK',
-        fuente TEXT DEFAULT 'automatica',
-        FOREIGN KEY (sensor_id) REFERENCES sensor(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        UNIQUE (sensor_id, fecha_hora)
-    );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_lectura_sensor_fecha ON lectura(sensor_id, fecha_hora);")
-
-    con.commit()
-    con.close()
+    # Conexión compartida del hilo; la cierra conexion.cerrar_conexiones() al salir
+    return obtener_conexion()
 
 # ==========================
 # MANAGERS (CRUD LADO DB)
@@ -426,108 +319,12 @@ class AppCRUD:
     # ------------------------
     def _generar_informe(self):
         try:
-            cur = self.conn.cursor()
-            # Estadísticas por tipo de sensor
-            cur.execute("SELECT tipo, COUNT(*) FROM sensor GROUP BY tipo ORDER BY tipo;")
-            por_tipo = cur.fetchall()
-
-            # Sensores por estación
-            cur.execute(
-                """
-                SELECT e.nombre, COUNT(s.id) AS total
-                  FROM estacion_meteorologica e
-             LEFT JOIN sensor s ON s.estacion_id = e.id
-              GROUP BY e.id
-              ORDER BY e.nombre
-                """
-            )
-            por_estacion = cur.fetchall()
-
-            # Lecturas por tipo de sensor
-            cur.execute(
-                """
-                SELECT s.tipo, COUNT(l.id) AS n
-                  FROM sensor s LEFT JOIN lectura l ON l.sensor_id = s.id
-              GROUP BY s.tipo
-              ORDER BY s.tipo
-                """
-            )
-            lecturas_por_tipo = cur.fetchall()
-
-            # Construir HTML con SVG de barras (sin librerías externas)
-            html_path = os.path.join(os.path.dirname(__file__), "informe.html")
-
-            def svg_barras(tuplas, titulo):
-                if not tuplas:
-                    return f"<h3>{titulo}</h3><p>Sin datos para mostrar.</p>"
-                etiquetas = [str(t[0]) for t in tuplas]
-                valores = [int(t[1]) for t in tuplas]
-                max_v = max(valores) or 1
-                ancho, alto, margen = 600, 220, 30
-                escala = (alto - 2*margen) / max_v
-                barras = []
-                sep = (ancho - 2*margen) / max(1, len(valores))
-                for i, v in enumerate(valores):
-                    x = margen + i*sep + 8
-                    bh = v * escala
-                    y = alto - margen - bh
-                    barras.append(f'<rect x="{x}" y="{y}" width="{max(10, sep-16):.1f}" height="{bh:.1f}" fill="#4e79a7" />')
-                    barras.append(f'<text x="{x + max(10, sep-16)/2:.1f}" y="{y-4:.1f}" font-size="10" text-anchor="middle">{v}</text>')
-                    barras.append(f'<text x="{x + max(10, sep-16)/2:.1f}" y="{alto - margen + 12}" font-size="10" text-anchor="middle">{etiquetas[i]}</text>')
-                svg = f"""
-                <h3>{titulo}</h3>
-                <svg width="{ancho}" height="{alto}" role="img" aria-label="{titulo}">
-                  <line x1="{margen}" y1="{alto-margen}" x2="{ancho-margen}" y2="{alto-margen}" stroke="#333" />
-                  <line x1="{margen}" y1="{margen}" x2="{margen}" y2="{alto-margen}" stroke="#333" />
-                  {''.join(barras)}
-                </svg>
-                """
-                return svg
-
-            html = """
-            <!doctype html>
-            <html lang=\"es\">
-            <head>
-              <meta charset=\"utf-8\">
-              <title>Informe de Sensores y Lecturas</title>
-              <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                h1 { margin-top: 0; }
-                table { border-collapse: collapse; margin: 10px 0; }
-                th, td { border: 1px solid #ccc; padding: 6px 10px; }
-              </style>
-            </head>
-            <body>
-              <h1>Informe de Sensores y Lecturas</h1>
-            """
-
-            html += svg_barras(por_tipo, "Sensores por tipo")
-            html += svg_barras(por_estacion, "Sensores por estación")
-            html += svg_barras(lecturas_por_tipo, "Lecturas por tipo de sensor")
-
-            # Tabla de sensores
-            cur.execute(
-                """
-                SELECT s.id, s.tipo, s.unidad, s.precision, e.nombre AS estacion
-                  FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id
-                 ORDER BY s.id
-                """
-            )
-            filas = cur.fetchall()
-            html += "<h3>Listado de sensores</h3>"
-            html += "<table><thead><tr><th>ID</th><th>Tipo</th><th>Unidad</th><th>Precisión</th><th>Estación</th></tr></thead><tbody>"
-            for fid, tipo, unidad, prec, est in filas:
-                html += f"<tr><td>{fid}</td><td>{tipo}</td><td>{unidad}</td><td>{prec}</td><td>{est}</td></tr>"
-            html += "</tbody></table>"
-
-            html += "</body></html>"
-
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html)
-
+            # Sólo se vuelven a consultar las secciones cuyas tablas han cambiado (informe.MotorInforme)
+            res = motor_de_bd().generar(RUTA_INFORME, self.conn)
+            html_path = res["ruta"]
             messagebox.showinfo("Informe", f"Informe generado: {html_path}")
             try:
-                self.status.set("Informe generado correctamente")
+                self.status.set("Informe generado correctamente" if res["escrito"] else "Informe al día (sin cambios)")
             except Exception:
                 pass
         except Exception as e:
@@ -538,8 +335,8 @@ class AppCRUD:
                 pass
 
 if __name__ == "__main__":
-    # Asegurar BD
-    crear_bd()
+    # WAL: no se bloquea mientras meteorologiadb.py escribe lecturas; AppCRUD asegura el esquema
+    activar_wal()
 
     # Lanzar GUI
     root = tk.Tk()
@@ -0,0 +1,590 @@
+# Módulo del informe HTML de sensores y lecturas (antes dentro de indexdb.AppCRUD._generar_informe)
+# Cada sección declara las tablas de las que depende; MotorInforme guarda su HTML junto con las
+# versiones de esas tablas (cambios.py) y sólo vuelve a consultar las secciones afectadas.
+# Las secciones escriben en ficheros por bloques (memoria acotada) y las tablas grandes se
+# reparten en páginas enlazadas
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from html import escape
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+from urllib.request import pathname2url
+
+import cambios
+import conexion
+import series
+from conexion import obtener_conexion, ruta_bd
+from conteos import estadisticas_informe
+from esquema import crear_bd
+from lectura import desde_epoch_ms
+
+RUTA_INFORME = os.path.join(os.path.dirname(__file__), "informe.html")
+
+TITULO = "Informe de Sensores y Lecturas"
+FILAS_POR_BLOQUE = 1000    # filas pedidas al cursor en cada fetchmany()
+FILAS_POR_PAGINA = 5000    # filas de una tabla por página; el resto va a páginas enlazadas
+GRAFICOS_MAX = 24          # sensores con gráfico de serie temporal (los primeros por id con lecturas)
+DIAS_GRAFICO = 365         # ventana de cada gráfico, hasta la última lectura del sensor
+
+CABECERA = """
+<!doctype html>
+<html lang="es">
+<head>
+  <meta charset="utf-8">
+  <title>{titulo}</title>
+  <style>
+    body {{ font-family: Arial, sans-serif; margin: 20px; }}
+    h1 {{ margin-top: 0; }}
+    table {{ border-collapse: collapse; margin: 10px 0; }}
+    th, td {{ border: 1px solid #ccc; padding: 6px 10px; }}
+  </style>
+</head>
+<body>
+  <h1>{titulo}</h1>
+"""
+PIE = "</body></html>"
+
+
+def svg_barras(tuplas, titulo) -> str:
+    # Gráfico de barras en SVG (sin librerías externas) de pares (etiqueta, valor)
+    if not tuplas:
+        return f"<h3>{titulo}</h3><p>Sin datos para mostrar.</p>"
+    etiquetas = [str(t[0]) for t in tuplas]
+    valores = [int(t[1]) for t in tuplas]
+    max_v = max(valores) or 1
+    ancho, alto, margen = 600, 220, 30
+    escala = (alto - 2*margen) / max_v
+    barras = []
+    sep = (ancho - 2*margen) / max(1, len(valores))
+    for i, v in enumerate(valores):
+        x = margen + i*sep + 8
+        bh = v * escala
+        y = alto - margen - bh
+        barras.append(f'<rect x="{x}" y="{y}" width="{max(10, sep-16):.1f}" height="{bh:.1f}" fill="#4e79a7" />')
+        barras.append(f'<text x="{x + max(10, sep-16)/2:.1f}" y="{y-4:.1f}" font-size="10" text-anchor="middle">{v}</text>')
+        barras.append(f'<text x="{x + max(10, sep-16)/2:.1f}" y="{alto - margen + 12}" font-size="10" text-anchor="middle">{etiquetas[i]}</text>')
+    return f"""
+    <h3>{titulo}</h3>
+    <svg width="{ancho}" height="{alto}" role="img" aria-label="{titulo}">
+      <line x1="{margen}" y1="{alto-margen}" x2="{ancho-margen}" y2="{alto-margen}" stroke="#333" />
+      <line x1="{margen}" y1="{margen}" x2="{margen}" y2="{alto-margen}" stroke="#333" />
+      {''.join(barras)}
+    </svg>
+    """
+
+
+def cabecera(titulo: str = TITULO) -> str:
+    return CABECERA.format(titulo=escape(titulo))
+
+
+# Las columnas de texto de un listado repiten mucho (tipo, unidad, estación): caché acotada
+_escapar = lru_cache(maxsize=4096)(escape)
+
+
+def _nombre_pagina(prefijo: str, tabla: str, numero: int) -> str:
+    return f"{prefijo}_{tabla}_p{numero}.html"
+
+
+class Fragmento:
+    """Salida de una sección: su parte del informe principal y las páginas que genere aparte.
+
+    La parte se escribe en un fichero de la caché del motor y se copia al informe al montarlo;
+    las páginas se escriben directamente junto al informe (directorio) con nombre prefijo_*.
+    """
+
+    def __init__(self, ruta_parte: str, directorio: str, prefijo: str, principal: str) -> None:
+        self.ruta_parte = ruta_parte
+        self.directorio = directorio
+        self.prefijo = prefijo
+        self.principal = principal  # nombre del informe principal, destino del enlace "anterior" de la página 2
+        self.paginas: List[str] = []
+        self._f: TextIO = open(ruta_parte + ".tmp", "w", encoding="utf-8")
+
+    def write(self, texto: str) -> None:
+        self._f.write(texto)
+
+    def writelines(self, textos: Iterable[str]) -> None:
+        self._f.writelines(textos)
+
+    def abrir_pagina(self, nombre: str) -> TextIO:
+        # Como la parte, se escribe en .tmp y se publica en cerrar(): nadie ve una página a medias
+        self.paginas.append(nombre)
+        return open(os.path.join(self.directorio, nombre + ".tmp"), "w", encoding="utf-8")
+
+    def cerrar(self) -> None:
+        self._f.close()
+        os.replace(self.ruta_parte + ".tmp", self.ruta_parte)
+        for nombre in self.paginas:
+            ruta = os.path.join(self.directorio, nombre)
+            os.replace(ruta + ".tmp", ruta)
+
+    def descartar(self) -> None:
+        self._f.close()
+        for ruta in [self.ruta_parte] + [os.path.join(self.directorio, nombre) for nombre in self.paginas]:
+            try:
+                os.remove(ruta + ".tmp")
+            except OSError:
+                pass
+
+
+def _navegacion(numero: int, anterior: Optional[str], siguiente: Optional[str]) -> str:
+    enlaces = [f'<a href="{escape(anterior)}">&larr; anterior</a>' if anterior else "",
+               f"Página {numero}",
+               f'<a href="{escape(siguiente)}">siguiente &rarr;</a>' if siguiente else ""]
+    return f'<p class="paginas">{" | ".join(e for e in enlaces if e)}</p>'
+
+
+def escribir_tabla(salida: Fragmento, nombre: str, titulo: str, cabeceras: Sequence[str], cursor: sqlite3.Cursor,
+                   filas_por_pagina: int = FILAS_POR_PAGINA, tamano_bloque: int = FILAS_POR_BLOQUE) -> int:
+    """Vuelca las filas del cursor en una tabla HTML sin cargarlas todas; devuelve el número de páginas.
+
+    Las filas se piden con fetchmany(tamano_bloque) y se escriben al momento (escapadas). Las
+    primeras filas_por_pagina van en el informe principal; las siguientes, en páginas
+    prefijo_nombre_p2.html, p3... enlazadas con anterior/siguiente. El número total de páginas
+    no se conoce de antemano: el enlace "siguiente" se escribe al empezar la página siguiente.
+    """
+    inicio_tabla = ("<table><thead><tr>" + "".join(f"<th>{escape(c)}</th>" for c in cabeceras)
+                    + "</tr></thead><tbody>")
+    plantilla = "<tr>" + "<td>{}</td>" * len(cabeceras) + "</tr>"
+    salida.write(f"<h3>{escape(titulo)}</h3>")
+    salida.write(inicio_tabla)
+    destino, pagina, en_pagina, anterior = salida, 1, 0, None
+    while True:
+        bloque = cursor.fetchmany(tamano_bloque)
+        if not bloque:
+            break
+        i = 0
+        while i < len(bloque):
+            if en_pagina == filas_por_pagina:
+                siguiente = _nombre_pagina(salida.prefijo, nombre, pagina + 1)
+                destino.write("</tbody></table>" + _navegacion(pagina, anterior, siguiente))
+                if destino is not salida:
+                    destino.write(PIE)
+                    destino.close()
+                anterior = salida.principal if pagina == 1 else _nombre_pagina(salida.prefijo, nombre, pagina)
+                pagina, en_pagina = pagina + 1, 0
+                destino = salida.abrir_pagina(siguiente)
+                destino.write(cabecera(f"{titulo} ({pagina})"))
+                destino.write(_navegacion(pagina, anterior, None) + inicio_tabla)
+            toma = min(len(bloque) - i, filas_por_pagina - en_pagina)
+            destino.writelines(plantilla.format(*[_escapar(v) if isinstance(v, str) else v for v in fila])
+                               for fila in bloque[i:i + toma])
+            i += toma
+            en_pagina += toma
+    destino.write("</tbody></table>")
+    if pagina > 1:
+        destino.write(_navegacion(pagina, anterior, None))
+    if destino is not salida:
+        destino.write(PIE)
+        destino.close()
+    return pagina
+
+
+def svg_lineas(tiempos, valores, titulo) -> str:
+    # Gráfico de líneas en SVG de una serie ya reducida (series.lttb): un único <polyline>
+    if len(tiempos) == 0:
+        return f"<h3>{escape(titulo)}</h3><p>Sin datos para mostrar.</p>"
+    ancho, alto, margen = 600, 220, 40
+    t0, t1 = tiempos[0], tiempos[-1]
+    v0, v1 = min(valores), max(valores)
+    esc_x = (ancho - 2*margen) / ((t1 - t0) or 1)
+    esc_y = (alto - 2*margen) / ((v1 - v0) or 1)
+    puntos = " ".join(f"{margen + (t - t0) * esc_x:.1f},{alto - margen - (v - v0) * esc_y:.1f}"
+                      for t, v in zip(tiempos, valores))
+    inicio, fin = (desde_epoch_ms(t).strftime("%Y-%m-%d %H:%M") for t in (t0, t1))
+    return f"""
+    <h3>{escape(titulo)}</h3>
+    <svg width="{ancho}" height="{alto}" role="img" aria-label="{escape(titulo)}">
+      <line x1="{margen}" y1="{alto-margen}" x2="{ancho-margen}" y2="{alto-margen}" stroke="#333" />
+      <line x1="{margen}" y1="{margen}" x2="{margen}" y2="{alto-margen}" stroke="#333" />
+      <polyline points="{puntos}" fill="none" stroke="#4e79a7" stroke-width="1" />
+      <text x="{margen - 4}" y="{margen + 4}" font-size="10" text-anchor="end">{v1:g}</text>
+      <text x="{margen - 4}" y="{alto - margen}" font-size="10" text-anchor="end">{v0:g}</text>
+      <text x="{margen}" y="{alto - margen + 14}" font-size="10">{inicio}</text>
+      <text x="{ancho - margen}" y="{alto - margen + 14}" font-size="10" text-anchor="end">{fin}</text>
+    </svg>
+    """
+
+
+@dataclass(frozen=True)
+class Alcance:
+    """Parte de la BD que cubre un informe: todo, una parcela o una estación."""
+    parcela_id: Optional[int] = None
+    estacion_id: Optional[int] = None
+
+    def filtro(self) -> Tuple[str, Tuple]:
+        # Condición sobre el alias e (estacion_meteorologica) de las consultas de las secciones
+        if self.estacion_id is not None:
+            return "e.id = ?", (self.estacion_id,)
+        if self.parcela_id is not None:
+            return "e.parcela_id = ?", (self.parcela_id,)
+        return "1", ()
+
+
+TODO = Alcance()
+
+
+def _estadisticas(con: sqlite3.Connection, salida: Fragmento, alcance: Alcance) -> None:
+    # Los tres recuentos salen de una sola consulta sobre estaciones y sensores (conteos.py):
+    # las lecturas por tipo se suman de lectura_conteo, sin recorrer lectura
+    est = estadisticas_informe(con, *alcance.filtro())
+    salida.write(svg_barras(est.sensores_por_tipo, "Sensores por tipo"))
+    salida.write(svg_barras(est.sensores_por_estacion, "Sensores por estación"))
+    salida.write(svg_barras(est.lecturas_por_tipo, "Lecturas por tipo de sensor"))
+
+
+def _listado_sensores(con: sqlite3.Connection, salida: Fragmento, alcance: Alcance) -> None:
+    filtro, valores = alcance.filtro()
+    cursor = con.execute(f"""
+        SELECT s.id, s.tipo, s.unidad, s.precision, e.nombre AS estacion
+          FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id
+         WHERE {filtro}
+         ORDER BY s.id""", valores)
+    escribir_tabla(salida, "sensores", "Listado de sensores", ("ID", "Tipo", "Unidad", "Precisión", "Estación"), cursor)
+
+
+def _series_sensores(con: sqlite3.Connection, salida: Fragmento, alcance: Alcance) -> None:
+    # Una serie por sensor, reducida a series.PUNTOS_GRAFICO puntos: el coste no depende de cuántas
+    # lecturas haya en la ventana (con muchas se lee la media por hora de agregado_hora)
+    filtro, valores = alcance.filtro()
+    sensores = con.execute(f"""
+        SELECT s.id, s.tipo, s.unidad, e.nombre, u.fecha_hora
+          FROM sensor s
+          JOIN estacion_meteorologica e ON e.id = s.estacion_id
+          JOIN sensor_ultima_lectura u ON u.sensor_id = s.id
+         WHERE {filtro}
+         ORDER BY s.id
+         LIMIT ?""", valores + (GRAFICOS_MAX,)).fetchall()
+    salida.write("<h2>Series temporales</h2>")
+    if not sensores:
+        salida.write("<p>Sin lecturas para mostrar.</p>")
+    for sid, tipo, unidad, estacion, ultima in sensores:
+        (tiempos, valores), fuente = series.serie_sensor(sid, ultima + 1 - DIAS_GRAFICO * 86_400_000, ultima + 1,
+                                                         con=con)
+        detalle = "media por hora" if fuente == "agregado_hora" else "lecturas"
+        salida.write(svg_lineas(tiempos, valores, f"Sensor {sid} ({tipo}, {unidad}) - {estacion} - {detalle}"))
+
+
+@dataclass(frozen=True)
+class Seccion:
+    nombre: str
+    tablas: Tuple[str, ...]  # tablas vigiladas (cambios.TABLAS_VIGILADAS) de las que depende
+    generar: Callable[[sqlite3.Connection, Fragmento, Alcance], None]
+
+
+# lectura cubre también las tablas que los triggers derivan de ella (agregados, lectura_conteo)
+SECCIONES: List[Seccion] = [
+    Seccion("estadisticas", ("estacion_meteorologica", "sensor", "lectura"), _estadisticas),
+    Seccion("series_sensores", ("estacion_meteorologica", "sensor", "lectura"), _series_sensores),
+    Seccion("listado_sensores", ("estacion_meteorologica", "sensor"), _listado_sensores),
+]
+
+
+class MotorInforme:
+    """Genera el informe reutilizando las secciones cuyas tablas no han cambiado.
+
+    Si la marca de la BD (cambios.marca) es la misma que en la última llamada no se consulta nada;
+    si no, se leen las versiones de cambio_tabla y sólo se regeneran las secciones cuya versión
+    de entrada ha cambiado. El fichero sólo se reescribe si cambia alguna sección.
+
+    Cada sección se guarda en un fichero de un directorio temporal propio del motor y el informe
+    se monta copiándolos por bloques: la memoria no depende del tamaño del inventario.
+    """
+
+    def __init__(self, secciones: Sequence[Seccion] = SECCIONES, alcance: Alcance = TODO,
+                 titulo: str = TITULO) -> None:
+        self.secciones = list(secciones)
+        self.alcance = alcance
+        self.titulo = titulo
+        self._directorio = tempfile.TemporaryDirectory(prefix="informe_")
+        self._cache: Dict[str, Tuple[Tuple, Fragmento]] = {}
+        self._marca: Optional[Tuple] = None
+        self._escritos: Dict[str, Tuple] = {}  # ruta -> versiones de las secciones que contiene
+
+    def _firma(self) -> Tuple:
+        return tuple(self._cache[s.nombre][0] if s.nombre in self._cache else None for s in self.secciones)
+
+    def generar(self, ruta: str = RUTA_INFORME, con: Optional[sqlite3.Connection] = None) -> Dict:
+        """Deja en ruta el informe al día; devuelve las secciones regeneradas y si se escribió."""
+        con = con or obtener_conexion()
+        ruta = os.path.abspath(ruta)
+        marca = (ruta,) + cambios.marca(con)
+        if marca != self._marca:
+            regeneradas = self._actualizar(con, ruta)
+            self._marca = marca
+        else:
+            regeneradas = []
+        firma = self._firma()
+        escrito = self._escritos.get(ruta) != firma or not os.path.exists(ruta)
+        if escrito:
+            with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+                f.write(cabecera(self.titulo))
+                for s in self.secciones:
+                    with open(self._cache[s.nombre][1].ruta_parte, encoding="utf-8") as parte:
+                        shutil.copyfileobj(parte, f)
+                f.write(PIE)
+            os.replace(ruta + ".tmp", ruta)
+            self._escritos[ruta] = firma
+        return {"ruta": ruta, "regeneradas": regeneradas, "escrito": escrito}
+
+    def _actualizar(self, con: sqlite3.Connection, ruta: str) -> List[str]:
+        # Versiones y secciones en la misma transacción de lectura: el HTML corresponde a esas versiones.
+        # La ruta forma parte de la clave: las páginas aparte se escriben junto al informe
+        propia = not con.in_transaction
+        if propia:
+            con.execute("BEGIN")
+        try:
+            versiones = cambios.versiones(con)
+            directorio, principal = os.path.split(ruta)
+            prefijo = os.path.splitext(principal)[0]
+            regeneradas = []
+            for s in self.secciones:
+                clave = (ruta,) + tuple(versiones.get(t, 0) for t in s.tablas)
+                previa = self._cache.get(s.nombre)
+                if previa is not None and previa[0] == clave:
+                    continue
+                salida = Fragmento(os.path.join(self._directorio.name, s.nombre + ".parte"),
+                                   directorio, prefijo, principal)
+                try:
+                    s.generar(con, salida, self.alcance)
+                except BaseException:
+                    salida.descartar()
+                    self._cache.pop(s.nombre, None)
+                    raise
+                salida.cerrar()
+                if previa is not None:
+                    # Páginas de la versión anterior que ya no existen (el inventario ha encogido)
+                    for nombre in set(previa[1].paginas) - set(salida.paginas):
+                        try:
+                            os.remove(os.path.join(previa[1].directorio, nombre))
+                        except OSError:
+                            pass
+                self._cache[s.nombre] = (clave, salida)
+                regeneradas.append(s.nombre)
+            return regeneradas
+        finally:
+            if propia:
+                con.commit()
+
+    def invalidar(self) -> None:
+        self._cache.clear()
+        self._marca = None
+        self._escritos.clear()
+
+
+_motores: Dict[str, MotorInforme] = {}
+
+
+def motor_de_bd() -> MotorInforme:
+    """MotorInforme compartido de la BD actual (conexion.ruta_bd()): su caché dura entre llamadas."""
+    return _motores.setdefault(ruta_bd(), MotorInforme())
+
+
+def generar_informe(ruta: str = RUTA_INFORME) -> Dict:
+    return motor_de_bd().generar(ruta)
+
+
+# ==============================
+# INFORMES POR PARCELA O ESTACIÓN (SIN INTERFAZ)
+# ==============================
+_TABLAS_ALCANCE = {"parcela": ("parcela", "la parcela"), "estacion": ("estacion_meteorologica", "la estación")}
+_con_lectura: Optional[sqlite3.Connection] = None
+
+
+def conectar_solo_lectura(ruta: str) -> sqlite3.Connection:
+    """Conexión que no puede escribir (mode=ro): los informes nunca bloquean ni modifican la BD."""
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(ruta))}?mode=ro", uri=True)
+
+
+def _iniciar_proceso(ruta: str) -> None:
+    # Inicializador del pool: cada proceso abre su propia conexión de sólo lectura
+    global _con_lectura
+    conexion.configurar(ruta)  # ruta_bd() también localiza el archivo columnar
+    _con_lectura = conectar_solo_lectura(ruta)
+
+
+def _informe_de(con: sqlite3.Connection, por: str, ident: int, ruta: str) -> Dict:
+    tabla, articulo = _TABLAS_ALCANCE[por]
+    (nombre,) = con.execute(f"SELECT nombre FROM {tabla} WHERE id = ?", (ident,)).fetchone()
+    alcance = Alcance(parcela_id=ident) if por == "parcela" else Alcance(estacion_id=ident)
+    t0 = time.perf_counter()
+    res = MotorInforme(alcance=alcance, titulo=f"Informe de {articulo} {nombre}").generar(ruta, con)
+    res.update(por=por, id=ident, segundos=time.perf_counter() - t0)
+    return res
+
+
+def _informe_en_proceso(tarea: Tuple[str, int, str]) -> Dict:
+    return _informe_de(_con_lectura, *tarea)
+
+
+def generar_informes(por: str = "parcela", ids: Optional[Iterable[int]] = None, directorio: str = "informes",
+                     procesos: Optional[int] = None, ruta: Optional[str] = None) -> List[Dict]:
+    """Un informe por parcela o por estación (todas si ids es None) en directorio/<por>_<id>.html.
+
+    Se reparten entre `procesos` procesos (por defecto, uno por núcleo), cada uno con su conexión
+    de sólo lectura a la BD `ruta` (por defecto conexion.ruta_bd()); con procesos=1 se generan en
+    este proceso. Cada fichero se escribe en .tmp y se renombra: nunca queda un informe a medias.
+    """
+    if por not in _TABLAS_ALCANCE:
+        raise ValueError(f"por debe ser 'parcela' o 'estacion', no {por!r}")
+    ruta = ruta or ruta_bd()
+    con = conectar_solo_lectura(ruta)
+    try:
+        existentes = [i for (i,) in con.execute(f"SELECT id FROM {_TABLAS_ALCANCE[por][0]} ORDER BY id")]
+        if ids is None:
+            ids = existentes
+        else:
+            ids = list(ids)
+            faltan = set(ids) - set(existentes)
+            if faltan:
+                raise ValueError(f"no existen {por} con id {sorted(faltan)}")
+        os.makedirs(directorio, exist_ok=True)
+        tareas = [(por, i, os.path.join(directorio, f"{por}_{i}.html")) for i in ids]
+        if procesos == 1 or len(tareas) <= 1:
+            # Como _iniciar_proceso: series y el archivo columnar también deben leer de ruta
+            with conexion.usar_bd(ruta):
+                return [_informe_de(con, *t) for t in tareas]
+    finally:
+        con.close()
+    procesos = procesos or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso, initargs=(ruta,)) as pool:
+        return list(pool.map(_informe_en_proceso, tareas, chunksize=max(1, len(tareas) // (4 * procesos))))
+
+
+# --- Pruebas ---
+"""def _tests():
+    from conexion import configurar, cerrar_conexiones, escribir
+    from esquema import crear_bd
+    import meteorologiadb
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "i.db"))
+        crear_bd()
+        escribir(lambda c: (c.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)"),
+                            c.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) "
+                                      "VALUES ('E1', 0, 0, 1)"),
+                            c.execute("INSERT INTO sensor (tipo, unidad, precision, estacion_id) "
+                                      "VALUES ('temperatura', '°C', 0.1, 1)")))
+        ruta = os.path.join(tmp, "informe.html")
+        motor = MotorInforme()
+        res = motor.generar(ruta)
+        assert res["escrito"] and len(res["regeneradas"]) == len(SECCIONES)
+        assert "<td>temperatura</td>" in open(ruta, encoding="utf-8").read()
+        # Sin cambios: ni consultas ni escritura
+        assert motor.generar(ruta) == {"ruta": ruta, "regeneradas": [], "escrito": False}
+        # Una lectura sólo invalida la sección que depende de lectura
+        meteorologiadb.insertar_lecturas([(1, 0, 5.0, "OK", "automatica")])
+        assert motor.generar(ruta)["regeneradas"] == ["estadisticas", "series_sensores"]
+        assert "<polyline" in open(ruta, encoding="utf-8").read()
+        escribir(lambda c: c.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) "
+                                     "VALUES ('E2', 0, 0, 1)"))
+        assert motor.generar(ruta)["regeneradas"] == ["estadisticas", "series_sensores", "listado_sensores"]
+        assert "E2" in open(ruta, encoding="utf-8").read()
+        # Un cambio en una tabla que no usa ninguna sección no reescribe el fichero
+        escribir(lambda c: c.execute("UPDATE parcela SET nombre = 'Q'"))
+        assert motor.generar(ruta) == {"ruta": ruta, "regeneradas": [], "escrito": False}
+        os.remove(ruta)
+        assert motor.generar(ruta)["escrito"] and os.path.exists(ruta)
+        # Tabla de 12 filas en páginas de 5 leída en bloques de 3: informe + p2 + p3 enlazadas
+        escribir(lambda c: c.executemany("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES (?, 'x', 0.1, 1)",
+                                         [(f"t<{i}>",) for i in range(11)]))
+        salida = Fragmento(os.path.join(tmp, "parte"), tmp, "informe", "informe.html")
+        cur = obtener_conexion().execute("SELECT id, tipo FROM sensor ORDER BY id")
+        assert escribir_tabla(salida, "sensores", "Sensores", ("ID", "Tipo"), cur, filas_por_pagina=5, tamano_bloque=3) == 3
+        salida.cerrar()
+        assert salida.paginas == ["informe_sensores_p2.html", "informe_sensores_p3.html"]
+        parte = open(salida.ruta_parte, encoding="utf-8").read()
+        p2 = open(os.path.join(tmp, "informe_sensores_p2.html"), encoding="utf-8").read()
+        p3 = open(os.path.join(tmp, "informe_sensores_p3.html"), encoding="utf-8").read()
+        assert parte.count("<tr><td>") == 5 and p2.count("<tr><td>") == 5 and p3.count("<tr><td>") == 2
+        assert 'href="informe_sensores_p2.html"' in parte and 'href="informe.html"' in p2
+        assert 'href="informe_sensores_p3.html"' in p2 and "siguiente" not in p3 and "&lt;0&gt;" in parte
+        # Un informe por estación, en procesos con conexiones de sólo lectura
+        salida_lote = os.path.join(tmp, "lote")
+        resultados = generar_informes("estacion", directorio=salida_lote, procesos=2, ruta=ruta_bd())
+        assert [r["id"] for r in resultados] == [1, 2] and all(r["escrito"] for r in resultados)
+        e1 = open(os.path.join(salida_lote, "estacion_1.html"), encoding="utf-8").read()
+        e2 = open(os.path.join(salida_lote, "estacion_2.html"), encoding="utf-8").read()
+        assert "Informe de la estación E1" in e1 and "<td>temperatura</td>" in e1 and "<td>temperatura</td>" not in e2
+        assert not [f for f in os.listdir(salida_lote) if f.endswith(".tmp")]
+        assert generar_informes("parcela", ids=[1], directorio=salida_lote, procesos=1)[0]["ruta"].endswith("parcela_1.html")
+        # En serie, con el módulo apuntando a otra BD, la lectura archivada sale del archivo de ruta
+        from datetime import datetime
+        import archivo
+        assert archivo.archivar(datetime(1970, 2, 1))["filas"] == 1
+        principal, otra = ruta_bd(), os.path.join(tmp, "otra", "otra.db")
+        os.makedirs(os.path.dirname(otra))
+        configurar(otra)
+        abierta = obtener_conexion()
+        generar_informes("estacion", ids=[1], directorio=salida_lote, procesos=1, ruta=principal)
+        assert obtener_conexion() is abierta and abierta.execute("SELECT 1").fetchone() == (1,)
+        assert "<polyline" in open(os.path.join(salida_lote, "estacion_1.html"), encoding="utf-8").read()
+        assert ruta_bd() == otra
+        configurar(principal)
+        try:
+            generar_informes("parcela", ids=[99], directorio=salida_lote)
+            assert False, "parcela inexistente"
+        except ValueError:
+            pass
+        # Regresión de planes: ninguna consulta del informe puede recorrer lectura entera
+        import re
+        con = obtener_conexion()
+        sentencias = []
+        con.set_trace_callback(sentencias.append)
+        limite = series.LIMITE_CRUDAS
+        try:
+            for crudas in (limite, 0):  # series desde lectura y desde agregado_hora
+                series.LIMITE_CRUDAS = crudas
+                for alcance in (TODO, Alcance(parcela_id=1), Alcance(estacion_id=1)):
+                    MotorInforme(alcance=alcance).generar(os.path.join(tmp, "plan.html"), con)
+        finally:
+            series.LIMITE_CRUDAS = limite
+            con.set_trace_callback(None)
+        consultas = {q for q in sentencias if q.lstrip().upper().startswith(("SELECT", "WITH"))}
+        assert any("lectura" in q for q in consultas)
+        # Cada acceso a lectura debe ser una búsqueda acotada por sensor y rango de fechas: un SCAN, o
+        # un SEARCH sólo por sensor_id desde un JOIN, acaba leyendo la tabla entera
+        for q in consultas:
+            nombres = {"lectura"} | set(re.findall(r"\blectura\s+(?:AS\s+)?(\w+)", q, re.I))
+            for _, _, _, detalle in con.execute("EXPLAIN QUERY PLAN " + q):
+                partes = detalle.split()
+                if len(partes) > 1 and partes[0] in ("SCAN", "SEARCH") and partes[1] in nombres:
+                    assert partes[0] == "SEARCH" and "fecha_hora" in detalle, f"recorre lectura: {detalle} en {q}"
+        try:
+            conectar_solo_lectura(ruta_bd()).execute("DELETE FROM sensor")
+            assert False, "conexión de sólo lectura"
+        except sqlite3.OperationalError:
+            pass
+        cerrar_conexiones()
+    print("[informe] OK")
+
+if __name__ == "__main__":
+    _tests()"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Informes HTML sin interfaz: global, por parcela o por estación")
+    parser.add_argument("--por", choices=("todo", "parcela", "estacion"), default="parcela")
+    parser.add_argument("--ids", type=int, nargs="+", help="parcelas o estaciones (por defecto, todas)")
+    parser.add_argument("--salida", default="informes", help="directorio de los informes")
+    parser.add_argument("--procesos", type=int, default=None, help="por defecto, uno por núcleo")
+    parser.add_argument("--bd", default=None, help="ruta de la BD (por defecto, meteorologiadb.db)")
+    args = parser.parse_args()
+    if args.bd:
+        conexion.configurar(args.bd)
+    crear_bd()  # migraciones pendientes antes de abrir las conexiones de sólo lectura
+    t0 = time.perf_counter()
+    if args.por == "todo":
+        os.makedirs(args.salida, exist_ok=True)
+        resultados = [generar_informe(os.path.join(args.salida, "informe.html"))]
+    else:
+        resultados = generar_informes(args.por, args.ids, args.salida, args.procesos)
+    for res in resultados:
+        print(res["ruta"])
+    print(f"{len(resultados)} informes en {time.perf_counter() - t0:.2f} s")
@@ -1,23 +1,134 @@
 # Módulo que define la estructura de datos para lecturas de sensores
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, Optional, overload
 
-@dataclass
+# En SQLite lectura.fecha_hora se guarda como entero: milisegundos desde la época Unix.
+# Las fechas sin zona horaria se interpretan como hora de pared UTC (igual que julianday()),
+# así una fecha naive sale de la BD exactamente igual a como entró.
+_EPOCA = datetime(1970, 1, 1)
+
+def a_epoch_ms(fecha: datetime) -> int:
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = fecha - _EPOCA
+    return (delta.days * 86_400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+def desde_epoch_ms(ms: int) -> datetime:
+    return _EPOCA + timedelta(milliseconds=ms)
+
+@dataclass(slots=True)
 class Lectura:
     valor: float
     fecha_hora: datetime
     sensor_id: int
 
+    @property
+    def epoch_ms(self) -> int:
+        return a_epoch_ms(self.fecha_hora)
+
+    @classmethod
+    def desde_bd(cls, sensor_id: int, fecha_hora_ms: int, valor: float) -> "Lectura":
+        return cls(valor=valor, fecha_hora=desde_epoch_ms(fecha_hora_ms), sensor_id=sensor_id)
+
     def __str__(self) -> str:
         return f"Lectura(sensor={self.sensor_id}, valor={self.valor}, fecha={self.fecha_hora.isoformat()})"
 
+class LecturaBatch:
+    """Lecturas en columnas paralelas (array): sensor_id, fecha_hora en epoch ms y valor.
+
+    Ocupa 24 bytes por lectura frente al objeto Lectura + datetime; al iterar o indexar se
+    construyen objetos Lectura sólo para las posiciones pedidas.
+    """
+    __slots__ = ("sensor_ids", "tiempos", "valores")
+
+    def __init__(self, sensor_ids: Optional[array] = None, tiempos: Optional[array] = None,
+                 valores: Optional[array] = None) -> None:
+        self.sensor_ids = sensor_ids if sensor_ids is not None else array("q")
+        self.tiempos = tiempos if tiempos is not None else array("q")
+        self.valores = valores if valores is not None else array("d")
+        if not len(self.sensor_ids) == len(self.tiempos) == len(self.valores):
+            raise ValueError("las columnas de LecturaBatch deben tener la misma longitud")
+
+    @classmethod
+    def desde_lecturas(cls, lecturas: Iterable[Lectura]) -> "LecturaBatch":
+        lote = cls()
+        for l in lecturas:
+            lote.agregar(l)
+        return lote
+
+    def agregar(self, lectura: Lectura) -> None:
+        self.sensor_ids.append(lectura.sensor_id)
+        self.tiempos.append(a_epoch_ms(lectura.fecha_hora))
+        self.valores.append(lectura.valor)
+
+    def extender(self, otro: "LecturaBatch") -> None:
+        self.sensor_ids.extend(otro.sensor_ids)
+        self.tiempos.extend(otro.tiempos)
+        self.valores.extend(otro.valores)
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    @overload
+    def __getitem__(self, i: int) -> Lectura: ...
+    @overload
+    def __getitem__(self, i: slice) -> "LecturaBatch": ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return LecturaBatch(self.sensor_ids[i], self.tiempos[i], self.valores[i])
+        return Lectura.desde_bd(self.sensor_ids[i], self.tiempos[i], self.valores[i])
+
+    def __iter__(self) -> Iterator[Lectura]:
+        for sensor_id, ms, valor in zip(self.sensor_ids, self.tiempos, self.valores):
+            yield Lectura.desde_bd(sensor_id, ms, valor)
+
+    def __eq__(self, otro: object) -> bool:
+        if not isinstance(otro, LecturaBatch):
+            return NotImplemented
+        return (self.sensor_ids, self.tiempos, self.valores) == (otro.sensor_ids, otro.tiempos, otro.valores)
+
+    def filtrar(self, sensor_id: Optional[int] = None, desde: Optional[datetime] = None,
+                hasta: Optional[datetime] = None,
+                condicion: Optional[Callable[[float], bool]] = None) -> "LecturaBatch":
+        """Nuevo lote con las lecturas del sensor, en [desde, hasta) y cuyo valor cumple condicion."""
+        ini = a_epoch_ms(desde) if desde is not None else None
+        fin = a_epoch_ms(hasta) if hasta is not None else None
+        resultado = LecturaBatch()
+        for sid, ms, valor in zip(self.sensor_ids, self.tiempos, self.valores):
+            if ((sensor_id is None or sid == sensor_id) and (ini is None or ms >= ini)
+                    and (fin is None or ms < fin) and (condicion is None or condicion(valor))):
+                resultado.sensor_ids.append(sid)
+                resultado.tiempos.append(ms)
+                resultado.valores.append(valor)
+        return resultado
+
+    def filas(self, calidad_dato: str = "OK", fuente: str = "automatica") -> Iterator[tuple]:
+        # Tuplas (sensor_id, fecha_hora_ms, valor, calidad_dato, fuente) listas para insertar_lecturas()
+        for sensor_id, ms, valor in zip(self.sensor_ids, self.tiempos, self.valores):
+            yield (sensor_id, ms, valor, calidad_dato, fuente)
+
+    def __repr__(self) -> str:
+        return f"LecturaBatch(n={len(self)})"
+
 # --- Pruebas ---
 """def _tests():
     l = Lectura(valor=23.5, fecha_hora=datetime(2025, 1, 1, 12, 0, 0), sensor_id=1)
     s = str(l)
     assert "sensor=1" in s
     assert "23.5" in s
+    assert a_epoch_ms(datetime(1970, 1, 1, 0, 0, 1)) == 1000
+    assert Lectura.desde_bd(1, l.epoch_ms, 23.5) == l
+    assert not hasattr(l, "__dict__")
+    lote = LecturaBatch.desde_lecturas(Lectura(float(i), datetime(2025, 1, 1, 0, i), i % 2) for i in range(10))
+    assert len(lote) == 10 and lote[3] == Lectura(3.0, datetime(2025, 1, 1, 0, 3), 1)
+    assert list(lote[2:4]) == [lote[2], lote[3]]
+    assert list(lote.filtrar(sensor_id=0, desde=datetime(2025, 1, 1, 0, 4)).valores) == [4.0, 6.0, 8.0]
+    assert len(lote.filtrar(condicion=lambda v: v > 7)) == 2
+    assert next(lote.filas())[1] == a_epoch_ms(datetime(2025, 1, 1))
     print("[lectura] OK")
 
 if __name__ == "__main__":
@@ -1,92 +1,22 @@
-from datetime import date
 import subprocess
 import sys
 import os
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 
-from usuario import Usuario
-from parcela import Parcela
-from estacion import EstacionMeteorologica
-from sensores import (
-    SensorTemperatura,
-    SensorHumedad,
-    SensorPrecipitacion,
-)
+from demo import datos_iniciales
+from sensores import SensorTemperatura
 from laberinto import jugar_laberinto
 
 
-def demo_datos():
-    """Crea datos de ejemplo para la demostración (igual que antes)."""
-    est = EstacionMeteorologica(
-        id=1,
-        nombre="Estación Norte",
-        coordenadas=(6.25, -75.56),
-        altitud=1500.0,
-        activa=True,
-    )
-    s_temp = SensorTemperatura(
-        id=101,
-        tipo="temperatura",
-        estacion_id=1,
-        estado=True,
-        unidad="°C",
-        rango_min=-5.0,
-        rango_max=45.0,
-    )
-    s_hum = SensorHumedad(
-        id=102,
-        tipo="humedad",
-        estacion_id=1,
-        estado=True,
-        tipo_humedad="relativa",
-        fecha_calibracion=date(2025, 1, 1),
-    )
-    s_prec = SensorPrecipitacion(
-        id=103,
-        tipo="precipitacion",
-        estacion_id=1,
-        estado=True,
-        tipo_medidor="pluviómetro",
-        area_captacion=0.02,
-    )
-    est.agregar_sensor(s_temp)
-    est.agregar_sensor(s_hum)
-    est.agregar_sensor(s_prec)
-
-    parcela = Parcela(
-        id=10,
-        nombre="Parcela A",
-        latitud=6.25,
-        longitud=-75.56,
-        altitud=1500.0,
-        area_ha=3.5,
-        descripcion="Lote experimental",
-        propietario_id=999,
-    )
-    parcela.agregar_estacion(est)
-
-    user = Usuario(
-        id=500,
-        nombre="Luis",
-        rol="tecnico",
-        email="leruizres@unadvirtual.edu.co",
-        telefono="+57-3000000000",
-        zonas_interes=[1, 2],
-        permisos=["lectura_parcela"],
-    )
-    user.asignar_parcela(parcela.id)
-    return user, parcela, est
-
-
 class MenuGUI:
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.title("MENÚ METEOROL")
         self.root.geometry("640x440")
 
-        # Datos de demostración (igual que en consola)
-        self.user, self.parcela, self.est = demo_datos()
+        # Datos de la BD si los hay (repositorio.py); si no, los de demostración
+        self.user, self.parcela, self.est = datos_iniciales()
 
         # Encabezado con el menú textual (exacto)
         menu_txt = (
@@ -204,6 +134,11 @@ class MenuGUI:
             for l in lects
         )
         texto += f"\nTotal: {len(lects)} lecturas"
+        # Resumen acumulado sin consultar la BD (estadísticas en línea de cada estación)
+        texto += "\n\nAcumulado por sensor (n | media | mín | máx):\n" + "\n".join(
+            f" - sensor={sid}: {e.n} | {e.media:.2f} | {e.minimo:.2f} | {e.maximo:.2f}"
+            for sid, e in sorted(self.parcela.estadisticas_por_sensor().items())
+        )
         messagebox.showinfo("Lecturas", texto)
 
     def agregar_sensor_temperatura(self):
@@ -1,154 +1,329 @@
-import sqlite3
+import heapq
 import os
-
-DB_NAME = os.path.join(os.path.dirname(__file__), "meteorologiadb.db")
-
-# ==============================
-# CREAR BASE DE DATOS Y TABLAS
-# ==============================
-def crear_bd():
-    con = sqlite3.connect(DB_NAME)
-    cur = con.cursor()
-    cur.execute("PRAGMA foreign_keys = ON;")
-
-    # USUARIO
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS usuario (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        rol TEXT NOT NULL,
-        email TEXT UNIQUE,
-        telefono TEXT,
-        zonas_interes TEXT,
-        permisos TEXT
-    );
-    """)
-
-    # PARCELA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS parcela (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        latitud REAL NOT NULL,
-        longitud REAL NOT NULL,
-        altitud REAL,
-        area_ha REAL,
-        descripcion TEXT,
-        propietario_id INTEGER,
-        FOREIGN KEY (propietario_id) REFERENCES usuario(id)
-            ON UPDATE NO ACTION ON DELETE SET NULL
-    );
-    """)
-    cur.execute("""CREATE INDEX IF NOT EXISTS idx_parcela_propietario ON parcela(propietario_id);""")
-
-    # USUARIO_PARCELA (N..M)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS usuario_parcela (
-        usuario_id INTEGER NOT NULL,
-        parcela_id INTEGER NOT NULL,
-        PRIMARY KEY (usuario_id, parcela_id),
-        FOREIGN KEY (usuario_id) REFERENCES usuario(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE
-    );
-    """)
-
-    # ESTACION_METEOROLOGICA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS estacion_meteorologica (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nombre TEXT NOT NULL,
-        latitud REAL NOT NULL,
-        longitud REAL NOT NULL,
-        altitud REAL,
-        activa INTEGER NOT NULL DEFAULT 1,
-        capacidad_registro INTEGER NOT NULL DEFAULT 100,
-        parcela_id INTEGER NOT NULL,
-        FOREIGN KEY (parcela_id) REFERENCES parcela(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        UNIQUE (nombre, parcela_id)
-    );
-    """)
-    cur.execute("""CREATE INDEX IF NOT EXISTS idx_estacion_parcela ON estacion_meteorologica(parcela_id);""")
-
-    # SENSOR
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS sensor (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tipo TEXT NOT NULL,
-        unidad TEXT NOT NULL,
-        precision REAL NOT NULL,
-        rango_min REAL,
-        rango_max REAL,
-        estado INTEGER NOT NULL DEFAULT 1,
-        estacion_id INTEGER NOT NULL,
-        tipo_humedad TEXT,
-        fecha_calibracion NUMERIC,
-        tipo_medidor TEXT,
-        area_captacion REAL,
-        FOREIGN KEY (estacion_id) REFERENCES estacion_meteorologica(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE
-    );
-    """)
-    cur.execute("""CREATE INDEX IF NOT EXISTS idx_sensor_estacion ON sensor(estacion_id);""")
-    cur.execute("""CREATE INDEX IF NOT EXISTS idx_sensor_tipo ON sensor(tipo);""")
-
-    # LECTURA
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS lectura (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sensor_id INTEGER NOT NULL,
-        fecha_hora NUMERIC NOT NULL,
-        valor REAL NOT NULL,
-        calidad_dato TEXT DEFAULT 'OK',
-        fuente TEXT DEFAULT 'automatica',
-        FOREIGN KEY (sensor_id) REFERENCES sensor(id)
-            ON UPDATE NO ACTION ON DELETE CASCADE,
-        UNIQUE (sensor_id, fecha_hora)
-    );
-    """)
-    cur.execute("""CREATE INDEX IF NOT EXISTS idx_lectura_sensor_fecha ON lectura(sensor_id, fecha_hora);""")
-
-    con.commit()
-    con.close()
-
+import sqlite3
+import time
+from datetime import datetime
+from itertools import islice
+
+import archivo
+import calidad
+import particiones
+from agregados import HORA_MS, recalcular_horas
+from cambios import anotar_cambio
+from conexion import activar_wal, escribir, obtener_conexion
+from esquema import crear_bd, crear_particion  # única definición de tablas (compartida con indexdb.py)
+from lectura import Lectura, LecturaBatch, a_epoch_ms, desde_epoch_ms
 
 # ==============================
 # FUNCIONES CRUD GENERICAS
 # ==============================
+# Usan la conexión compartida del hilo (conexion.py): sin connect/PRAGMA por llamada.
+# Las escrituras pasan por conexion.escribir (hilo escritor único en modo WAL)
 def insertar(query, valores=()):
-    con = sqlite3.connect(DB_NAME)
-    con.execute("PRAGMA foreign_keys = ON;")
-    cur = con.cursor()
-    cur.execute(query, valores)
-    con.commit()
-    con.close()
+    escribir(lambda con: con.execute(query, valores))
 
 def listar(query, valores=()):
-    con = sqlite3.connect(DB_NAME)
-    con.execute("PRAGMA foreign_keys = ON;")
-    cur = con.cursor()
-    cur.execute(query, valores)
-    filas = cur.fetchall()
-    con.close()
-    return filas
+    return obtener_conexion().execute(query, valores).fetchall()
+
+def iterar(query, valores=(), tamano=500):
+    """Como listar() pero como generador: trae las filas de tamano en tamano con fetchmany."""
+    cur = obtener_conexion().execute(query, valores)
+    try:
+        while True:
+            filas = cur.fetchmany(tamano)
+            if not filas:
+                return
+            yield from filas
+    finally:
+        cur.close()
 
 def actualizar(query, valores=()):
-    con = sqlite3.connect(DB_NAME)
-    con.execute("PRAGMA foreign_keys = ON;")
-    cur = con.cursor()
-    cur.execute(query, valores)
-    con.commit()
-    con.close()
+    escribir(lambda con: con.execute(query, valores))
 
 def eliminar(query, valores=()):
-    con = sqlite3.connect(DB_NAME)
-    con.execute("PRAGMA foreign_keys = ON;")
-    cur = con.cursor()
-    cur.execute(query, valores)
-    con.commit()
-    con.close()
+    escribir(lambda con: con.execute(query, valores))
+
+
+# ==============================
+# INGESTA MASIVA DE LECTURAS
+# ==============================
+# Cada lote va a la partición de su mes; el alias lectura permite a las políticas nombrar la fila existente
+SQL_INSERTAR_LECTURA = """INSERT INTO {particion} AS lectura (sensor_id, fecha_hora, valor, calidad_dato, fuente)
+                          VALUES (?,?,?,?,?)"""
+
+def fecha_a_bd(fecha_hora):
+    """datetime, texto ISO (YYYY-MM-DD HH:MM:SS) o entero -> epoch en milisegundos."""
+    if isinstance(fecha_hora, datetime):
+        return a_epoch_ms(fecha_hora)
+    if isinstance(fecha_hora, str):
+        return a_epoch_ms(datetime.fromisoformat(fecha_hora.strip()))
+    return int(fecha_hora)
+
+def _fila_lectura(item):
+    # Acepta un objeto Lectura o una tupla (sensor_id, fecha_hora, valor, calidad_dato, fuente)
+    if isinstance(item, Lectura):
+        return (item.sensor_id, item.epoch_ms, item.valor, "OK", "automatica")
+    sensor_id, fecha_hora, valor, calidad, fuente = item
+    return (sensor_id, fecha_a_bd(fecha_hora), valor, calidad, fuente)
+
+# Políticas ante una lectura ya existente (mismo sensor_id y fecha_hora), vía UNIQUE(sensor_id, fecha_hora)
+# (los códigos FLAG_* de calidad.py cuentan como FLAG)
+_RANGO_CALIDAD = "CASE WHEN {0} = 'OK' THEN 0 WHEN {0} LIKE 'FLAG%' THEN 1 WHEN {0} = 'MISSING' THEN 2 ELSE 3 END"
+POLITICAS_CONFLICTO = {
+    "ignorar": "DO NOTHING",
+    # Sólo se reescribe si algo cambia: reenviar datos idénticos no dispara los triggers de UPDATE
+    "reemplazar": """DO UPDATE SET valor = excluded.valor, calidad_dato = excluded.calidad_dato,
+                                    fuente = excluded.fuente
+                      WHERE lectura.valor IS NOT excluded.valor
+                         OR lectura.calidad_dato IS NOT excluded.calidad_dato
+                         OR lectura.fuente IS NOT excluded.fuente""",
+    # OK > FLAG > MISSING > otra/NULL; a igual calidad se conserva la existente
+    "mejor_calidad": f"""DO UPDATE SET valor = excluded.valor, calidad_dato = excluded.calidad_dato,
+                                       fuente = excluded.fuente
+                         WHERE {_RANGO_CALIDAD.format("excluded.calidad_dato")}
+                             < {_RANGO_CALIDAD.format("lectura.calidad_dato")}""",
+}
+
+def _rango_calidad(calidad_dato):
+    # _RANGO_CALIDAD en Python, para las lecturas archivadas
+    if calidad_dato == "OK":
+        return 0
+    if calidad_dato is not None and calidad_dato.upper().startswith("FLAG"):
+        return 1
+    return 2 if calidad_dato == "MISSING" else 3
+
+def _sustituye(politica, nueva, existente):
+    # Si la política reescribiría la lectura existente con la nueva (la condición de su DO UPDATE)
+    if politica == "reemplazar":
+        return nueva[2:] != existente[2:]
+    if politica == "mejor_calidad":
+        return _rango_calidad(nueva[3]) < _rango_calidad(existente[3])
+    return False
+
+def _actualizar_archivadas(con, filas):
+    # Reescribe los ficheros y rehace a mano lo que harían los triggers de UPDATE: horas y días de
+    # los agregados, la última lectura si es una de ellas y la versión de lectura (el conteo no cambia)
+    sustituidos = archivo.reescribir_archivadas(con, filas)
+    horas = {}
+    for sensor_id, fecha_hora, valor, calidad_dato, _ in filas:
+        horas.setdefault(sensor_id, set()).add(fecha_hora - fecha_hora % HORA_MS)
+        con.execute("""UPDATE sensor_ultima_lectura SET valor = ?, calidad_dato = ?
+                        WHERE sensor_id = ? AND fecha_hora = ?""", (valor, calidad_dato, sensor_id, fecha_hora))
+    for sensor_id, horas_sensor in horas.items():
+        recalcular_horas(con, sensor_id, horas_sensor)
+    anotar_cambio(con, "lectura")
+    return sustituidos
+
+def insertar_lecturas(lecturas, tamano_lote=1000, politica=None, control_calidad=False):
+    """Inserta lecturas en bloque: una transacción por lote con executemany en la partición de cada mes.
+
+    Sin politica, un duplicado (sensor_id, fecha_hora) lanza IntegrityError y deshace su lote.
+    Con politica ("ignorar", "reemplazar" o "mejor_calidad") se usa INSERT ... ON CONFLICT y
+    reenviar datos solapados es idempotente, también para los meses ya archivados (archivo.py),
+    que se comparan con su fichero porque ya no están en la tabla.
+    Con control_calidad=True cada lote pasa por calidad.ControlCalidad, que sustituye la calidad
+    "OK" por el código FLAG_* correspondiente (rango, tiempo, salto o valor plano).
+    Devuelve un diccionario con las filas procesadas, insertadas, actualizadas y omitidas,
+    los segundos empleados y filas/seg.
+    """
+    if tamano_lote < 1:
+        raise ValueError("tamano_lote debe ser mayor que 0")
+    if politica is not None and politica not in POLITICAS_CONFLICTO:
+        raise ValueError(f"politica debe ser una de {sorted(POLITICAS_CONFLICTO)}")
+    sql = SQL_INSERTAR_LECTURA
+    if politica is not None:
+        sql += f" ON CONFLICT (sensor_id, fecha_hora) {POLITICAS_CONFLICTO[politica]}"
+
+    def _insertar_lote(con, lote):
+        archivadas = archivo.lecturas_archivadas(con, lote)
+        sustituir = {}
+        if archivadas:
+            if politica is None:
+                raise sqlite3.IntegrityError("UNIQUE constraint failed: lectura.sensor_id, lectura.fecha_hora "
+                                             "(lectura archivada)")
+            for i, existente in archivadas.items():
+                clave = lote[i][:2]
+                if _sustituye(politica, lote[i], sustituir.get(clave, existente)):
+                    sustituir[clave] = lote[i]
+            lote = [fila for i, fila in enumerate(lote) if i not in archivadas]
+        # Cada fila nueva suma 1 en lectura_conteo (trigger de INSERT) y el resto de cambios
+        # (rowcount excluye los de triggers) son actualizaciones
+        conteo_previo = con.execute("SELECT TOTAL(n) FROM lectura_conteo").fetchone()[0]
+        cambios = 0
+        for mes, filas_mes in particiones.agrupar(lote).items():
+            cambios += con.executemany(sql.format(particion=crear_particion(con, *mes)), filas_mes).rowcount
+        nuevas = int(con.execute("SELECT TOTAL(n) FROM lectura_conteo").fetchone()[0] - conteo_previo)
+        if nuevas:
+            anotar_cambio(con, "lectura")  # una vez por lote (cambios.py)
+        sustituidos = _actualizar_archivadas(con, list(sustituir.values())) if sustituir else []
+        return nuevas, cambios - nuevas + len(sustituir), sustituidos
+
+    if isinstance(lecturas, LecturaBatch):
+        filas = lecturas.filas()
+    else:
+        filas = (_fila_lectura(l) for l in lecturas)
+    control = calidad.control_de_bd() if control_calidad else None
+    total = insertadas = actualizadas = 0
+    inicio = time.perf_counter()
+    while True:
+        lote = list(islice(filas, tamano_lote))
+        if not lote:
+            break
+        if control is not None:
+            lote = control.etiquetar(lote)
+        # commit por lote, rollback del lote si falla
+        nuevas, cambiadas, sustituidos = escribir(lambda con: _insertar_lote(con, lote))
+        archivo.descartar(sustituidos)
+        total += len(lote)
+        insertadas += nuevas
+        actualizadas += cambiadas
+    segundos = time.perf_counter() - inicio
+    return {
+        "filas": total,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "omitidas": total - insertadas - actualizadas,
+        "segundos": segundos,
+        "filas_por_segundo": total / segundos if segundos > 0 else 0.0,
+    }
+
+
+# ==============================
+# RETENCIÓN: MESES CADUCADOS
+# ==============================
+def _eliminar_mes(con, mes, desde, hasta):
+    # Quita el mes de la BD y del catálogo del archivo y rehace a mano lo que harían los triggers
+    # de DELETE. El coste va por sensor y por hora del mes, no por lectura: el conteo se descuenta
+    # desde agregado_dia y los agregados del mes se borran por rango de clave
+    con.execute("""UPDATE lectura_conteo
+                      SET n = n - (SELECT TOTAL(d.n) FROM agregado_dia d
+                                    WHERE d.sensor_id = lectura_conteo.sensor_id
+                                      AND d.inicio_ms >= ? AND d.inicio_ms < ?)""", (desde, hasta))
+    for tabla in ("agregado_hora", "agregado_dia"):
+        con.execute(f"""DELETE FROM {tabla} WHERE sensor_id IN (SELECT sensor_id FROM lectura_conteo)
+                          AND inicio_ms >= ? AND inicio_ms < ?""", (desde, hasta))
+    ficheros = [f for (f,) in con.execute("SELECT archivo FROM archivo_lectura WHERE desde_ms = ?", (desde,))]
+    con.execute("DELETE FROM archivo_lectura WHERE desde_ms = ?", (desde,))
+    nombre = particiones.nombre_particion(mes)
+    if con.execute("SELECT 1 FROM particion_lectura WHERE nombre = ?", (nombre,)).fetchone():
+        particiones.soltar(con, nombre)
+    # La última lectura sólo cambia en sensores sin lecturas posteriores al mes
+    sensores = [sid for (sid,) in con.execute("""SELECT sensor_id FROM sensor_ultima_lectura
+                                                  WHERE fecha_hora >= ? AND fecha_hora < ?""", (desde, hasta))]
+    for sid in sensores:
+        con.execute("DELETE FROM sensor_ultima_lectura WHERE sensor_id = ?", (sid,))
+        con.execute("""INSERT INTO sensor_ultima_lectura (sensor_id, fecha_hora, valor, calidad_dato)
+                       SELECT sensor_id, fecha_hora, valor, calidad_dato FROM lectura
+                        WHERE sensor_id = ? ORDER BY fecha_hora DESC LIMIT 1""", (sid,))
+    anotar_cambio(con, "lectura")
+    return ficheros
+
+def eliminar_mes(fecha):
+    """Descarta todas las lecturas del mes que contiene fecha, en la BD y en el archivo (retención).
+
+    La partición del mes se elimina con DROP TABLE, sin DELETE fila a fila ni triggers por lectura,
+    y sus ficheros archivados se borran. fecha acepta lo mismo que fecha_a_bd(). Devuelve el mes (AAAAMM).
+    """
+    mes, desde, hasta = particiones.limites_mes(fecha_a_bd(fecha))
+    archivo.descartar(escribir(lambda con: _eliminar_mes(con, mes, desde, hasta)))
+    return mes
+
+def eliminar_meses_anteriores(antes_de):
+    """Aplica eliminar_mes() a cada mes con datos que termina antes de antes_de, uno por transacción."""
+    limite = fecha_a_bd(antes_de)
+    con = obtener_conexion()
+    desdes = {desde for (desde,) in con.execute("SELECT desde_ms FROM particion_lectura WHERE hasta_ms <= ?",
+                                                (limite,))}
+    desdes.update(d for (d,) in con.execute("SELECT DISTINCT desde_ms FROM archivo_lectura WHERE hasta_ms <= ?",
+                                            (limite,)))
+    return [eliminar_mes(desde) for desde in sorted(desdes)]
+
+
+# ==============================
+# LISTADO PAGINADO DE LECTURAS
+# ==============================
+def _por_clave(sql, ultima, valores, tamano):
+    # Recorre sql página a página continuando tras la clave (2 primeras columnas de ORDER BY) vista
+    while True:
+        filas = listar(sql, (*ultima, *valores, tamano))
+        yield from filas
+        if len(filas) < tamano:
+            return
+        ultima = (filas[-1][0], filas[-1][1])
+
+def _lecturas_archivadas(sensor_id, desde_ms, hasta_ms, tamano):
+    # Filas de los ficheros archivados en el mismo orden y formato que paginas_lecturas
+    if sensor_id is not None:
+        clave, ultima = "a.sensor_id = ? AND a.desde_ms > ?", (sensor_id, -2 ** 63)
+    else:
+        clave, ultima = "(a.sensor_id, a.desde_ms) > (?, ?)", (-1, -1)
+    ficheros = _por_clave(f"""SELECT a.sensor_id, a.desde_ms, a.archivo, s.tipo, s.unidad
+                                FROM archivo_lectura a JOIN sensor s ON s.id = a.sensor_id
+                               WHERE {clave} AND a.hasta_ms > ? AND a.desde_ms < ?
+                               ORDER BY a.sensor_id, a.desde_ms
+                               LIMIT ?""", ultima, (desde_ms, hasta_ms), tamano)
+    directorio = archivo.directorio_archivo()
+    for sid, _, nombre, tipo, unidad in ficheros:
+        c = archivo.abrir_rango(os.path.join(directorio, nombre), desde_ms, hasta_ms)
+        dc, df = c.dic_calidad, c.dic_fuente
+        for t, v, cal, fue in zip(c.tiempos, c.valores, c.calidad, c.fuente):
+            yield (sid, t, v, dc[cal], df[fue], tipo, unidad)
+
+def paginas_lecturas(sensor_id=None, desde=None, hasta=None, tamano_pagina=50):
+    """Genera páginas de lecturas (con tipo y unidad del sensor) ordenadas por (sensor_id, fecha_hora).
+
+    Lee sólo las particiones que se solapan con [desde, hasta) e incluye las lecturas archivadas
+    (archivo.py) en su sitio: particiones y ficheros se recorren a la vez y se funden por
+    (sensor_id, fecha_hora), la clave de cada fila.
+    Paginación por clave: cada consulta continúa tras la última (sensor_id, fecha_hora) vista usando
+    la clave primaria de cada partición, sin OFFSET, así el coste por página no crece al avanzar.
+    Con sensor_id la clave es sólo fecha_hora: con "sensor_id = ?" el planificador no usa la
+    comparación de pares como límite del índice y cada página volvería a recorrer el sensor.
+    desde/hasta acotan el rango [desde, hasta) y aceptan lo mismo que fecha_a_bd().
+    """
+    if tamano_pagina < 1:
+        raise ValueError("tamano_pagina debe ser mayor que 0")
+    filtros, valores = [], []
+    if sensor_id is not None:
+        clave = "l.sensor_id = ? AND l.fecha_hora > ?"
+        ultima = (sensor_id, -2 ** 63)
+    else:
+        clave = "(l.sensor_id, l.fecha_hora) > (?, ?)"
+        ultima = (-1, -1)
+    desde_ms = fecha_a_bd(desde) if desde is not None else -2 ** 63
+    hasta_ms = fecha_a_bd(hasta) if hasta is not None else 2 ** 63 - 1
+    if desde is not None:
+        filtros.append("l.fecha_hora >= ?")
+        valores.append(desde_ms)
+    if hasta is not None:
+        filtros.append("l.fecha_hora < ?")
+        valores.append(hasta_ms)
+    sql = f"""SELECT l.*, s.tipo, s.unidad
+                FROM {particiones.origen(obtener_conexion(), desde_ms, hasta_ms)} AS l
+                JOIN sensor s ON s.id = l.sensor_id
+               WHERE {clave} {"".join(" AND " + f for f in filtros)}
+               ORDER BY l.sensor_id, l.fecha_hora
+               LIMIT ?"""
+    vivas = _por_clave(sql, ultima, valores, tamano_pagina)
+    archivadas = _lecturas_archivadas(sensor_id, desde_ms, hasta_ms, tamano_pagina)
+    yield from _paginas(heapq.merge(vivas, archivadas, key=lambda f: (f[0], f[1])), tamano_pagina)
+
+def _imprimir_paginado(paginas):
+    # Imprime página a página y espera Enter; 'q' corta el listado
+    for i, pagina in enumerate(paginas, start=1):
+        for f in pagina:
+            print(f)
+        if input(f"-- Página {i}. Enter para continuar, q para salir: ").strip().lower() == "q":
+            break
+
+def _paginas(filas, tamano_pagina=50):
+    # Agrupa un iterable de filas (p. ej. iterar()) en páginas sin materializarlo entero
+    filas = iter(filas)
+    while True:
+        pagina = list(islice(filas, tamano_pagina))
+        if not pagina:
+            return
+        yield pagina
 
 
 # ==============================
@@ -173,8 +348,7 @@ def crud_usuario():
                      (nombre, rol, email or None, telefono or None))
             print("Usuario insertado.")
         elif op == "2":
-            for f in listar("SELECT * FROM usuario"):
-                print(f)
+            _imprimir_paginado(_paginas(iterar("SELECT * FROM usuario")))
         elif op == "3":
             id_ = input("ID a actualizar: ")
             nombre = input("Nuevo nombre: ")
@@ -217,9 +391,8 @@ def crud_parcela():
                       desc or None, int(prop) if prop else None))
             print("Parcela insertada.")
         elif op == "2":
-            for f in listar("""SELECT p.*, u.nombre AS propietario
-                               FROM parcela p LEFT JOIN usuario u ON u.id = p.propietario_id"""):
-                print(f)
+            _imprimir_paginado(_paginas(iterar("""SELECT p.*, u.nombre AS propietario
+                               FROM parcela p LEFT JOIN usuario u ON u.id = p.propietario_id""")))
         elif op == "3":
             id_ = input("ID a actualizar: ")
             nombre = input("Nuevo nombre: ")
@@ -258,11 +431,10 @@ def crud_usuario_parcela():
             insertar("INSERT INTO usuario_parcela (usuario_id, parcela_id) VALUES (?,?)", (uid, pid))
             print("Relación inserta.")
         elif op == "2":
-            for f in listar("""SELECT up.usuario_id, u.nombre, up.parcela_id, p.nombre
+            _imprimir_paginado(_paginas(iterar("""SELECT up.usuario_id, u.nombre, up.parcela_id, p.nombre
                                FROM usuario_parcela up
                                JOIN usuario u ON u.id = up.usuario_id
-                               JOIN parcela p ON p.id = up.parcela_id"""):
-                print(f)
+                               JOIN parcela p ON p.id = up.parcela_id""")))
         elif op == "3":
             uid = input("ID Usuario: ")
             pid = input("ID Parcela: ")
@@ -297,10 +469,9 @@ def crud_estacion():
                      (nombre, lat, lon, float(alt) if alt else None, activa, cap, parcela_id))
             print("Estación insertada.")
         elif op == "2":
-            for f in listar("""SELECT e.*, p.nombre AS parcela
+            _imprimir_paginado(_paginas(iterar("""SELECT e.*, p.nombre AS parcela
                                FROM estacion_meteorologica e
-                               JOIN parcela p ON p.id = e.parcela_id"""):
-                print(f)
+                               JOIN parcela p ON p.id = e.parcela_id""")))
         elif op == "3":
             id_ = input("ID a actualizar: ")
             nombre = input("Nuevo nombre: ")
@@ -360,9 +531,8 @@ def crud_sensor():
                       float(area_cap) if area_cap else None))
             print("Sensor insertado.")
         elif op == "2":
-            for f in listar("""SELECT s.*, e.nombre AS estacion
-                               FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id"""):
-                print(f)
+            _imprimir_paginado(_paginas(iterar("""SELECT s.*, e.nombre AS estacion
+                               FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id""")))
         elif op == "3":
             id_ = input("ID a actualizar: ")
             tipo = input("Tipo: ")
@@ -399,6 +569,13 @@ def crud_sensor():
         else:
             print("Opción inválida.")
 
+def _fila_lectura_legible(fila):
+    # (sensor_id, fecha_hora_ms, ...) -> misma tupla con la fecha como texto
+    fecha = fila[1]
+    if isinstance(fecha, int):
+        fecha = desde_epoch_ms(fecha).isoformat(sep=" ")
+    return fila[:1] + (fecha,) + fila[2:]
+
 def crud_lectura():
     while True:
         print("\n--- CRUD Lectura ---")
@@ -411,33 +588,35 @@ def crud_lectura():
 
         if op == "1":
             sensor_id = int(input("ID Sensor: "))
-            fecha_hora = input("Fecha-Hora (YYYY-MM-DD HH:MM:SS): ")
+            fecha_hora = fecha_a_bd(input("Fecha-Hora (YYYY-MM-DD HH:MM:SS): "))
             valor = float(input("Valor: "))
             calidad = input("Calidad dato (OK/FLAG/MISSING, opcional): ")
             fuente = input("Fuente (automatica/manual, opcional): ")
-            insertar("""INSERT INTO lectura (sensor_id, fecha_hora, valor, calidad_dato, fuente)
-                        VALUES (?,?,?,?,?)""",
-                     (sensor_id, fecha_hora, valor, calidad or None, fuente or None))
-            print("Lectura insertada.")
+            res = insertar_lecturas([(sensor_id, fecha_hora, valor, calidad or None, fuente or None)],
+                                    politica="ignorar")
+            print("Lectura insertada." if res["insertadas"] else "Ya existe una lectura de ese sensor en esa fecha-hora.")
         elif op == "2":
-            for f in listar("""SELECT l.*, s.tipo, s.unidad
-                               FROM lectura l JOIN sensor s ON s.id = l.sensor_id
-                               ORDER BY l.sensor_id, l.fecha_hora"""):
-                print(f)
+            sensor_id = input("ID Sensor (opcional): ")
+            desde = input("Desde (YYYY-MM-DD HH:MM:SS, opcional): ")
+            hasta = input("Hasta (YYYY-MM-DD HH:MM:SS, opcional): ")
+            paginas = paginas_lecturas(int(sensor_id) if sensor_id else None,
+                                       desde or None, hasta or None)
+            _imprimir_paginado([_fila_lectura_legible(f) for f in pagina] for pagina in paginas)
         elif op == "3":
-            id_ = input("ID a actualizar: ")
+            # La clave de una lectura es (sensor_id, fecha_hora); la vista lectura la lleva a su partición
+            clave = (int(input("ID Sensor de la lectura: ")), fecha_a_bd(input("Fecha-Hora de la lectura: ")))
             sensor_id = int(input("Nuevo ID Sensor: "))
-            fecha_hora = input("Nueva Fecha-Hora (YYYY-MM-DD HH:MM:SS): ")
+            fecha_hora = fecha_a_bd(input("Nueva Fecha-Hora (YYYY-MM-DD HH:MM:SS): "))
             valor = float(input("Nuevo Valor: "))
             calidad = input("Nueva Calidad dato (opcional): ")
             fuente = input("Nueva Fuente (opcional): ")
             actualizar("""UPDATE lectura SET sensor_id=?, fecha_hora=?, valor=?, calidad_dato=?, fuente=?
-                          WHERE id=?""",
-                       (sensor_id, fecha_hora, valor, calidad or None, fuente or None, id_))
+                          WHERE sensor_id=? AND fecha_hora=?""",
+                       (sensor_id, fecha_hora, valor, calidad or None, fuente or None, *clave))
             print("Lectura actualizada.")
         elif op == "4":
-            id_ = input("ID a eliminar: ")
-            eliminar("DELETE FROM lectura WHERE id=?", (id_,))
+            clave = (int(input("ID Sensor de la lectura: ")), fecha_a_bd(input("Fecha-Hora de la lectura: ")))
+            eliminar("DELETE FROM lectura WHERE sensor_id=? AND fecha_hora=?", clave)
             print("Lectura eliminada.")
         elif op == "0":
             break
@@ -449,6 +628,7 @@ def crud_lectura():
 # MENÚ PRINCIPAL
 # ==============================
 def menu():
+    activar_wal()  # la GUI (indexdb.py) puede leer mientras la consola escribe, y viceversa
     crear_bd()
     while True:
         print("\n===== MENÚ PRINCIPAL (Clima) =====")
@@ -2,9 +2,12 @@
 # Incluye información geográfica y gestión de estaciones meteorológicas
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Optional, List
-from estacion import EstacionMeteorologica
-from lectura import Lectura
+from typing import Dict, Optional, List, Tuple
+from estacion import EstacionMeteorologica, ResultadoAdquisicion, adquirir_async, adquirir_concurrente
+from estadisticas import EstadisticaSensor
+from lectura import Lectura, LecturaBatch
+from registro import Registro
+from sensores import Sensor
 
 @dataclass
 class Suelo:
@@ -26,30 +29,92 @@ class Parcela:
     propietario_id: int
     suelo: Optional[Suelo] = None
     fuentes_agua: Optional[List[FuenteAgua]] = None
-    estaciones: List[EstacionMeteorologica] = field(default_factory=list)
+    # Acepta una lista; __post_init__ la convierte en un Registro indexado por id
+    estaciones: Registro[EstacionMeteorologica] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.estaciones = Registro(self.estaciones, es_activo=lambda e: e.activa)
 
     def agregar_estacion(self, estacion: EstacionMeteorologica) -> None:
-        self.estaciones.append(estacion)
+        # ValueError si ya hay una estación con ese id
+        self.estaciones.agregar(estacion)
 
     def remover_estacion(self, estacion_id: int) -> None:
-        self.estaciones = [e for e in self.estaciones if e.id != estacion_id]
+        self.estaciones.remover(estacion_id)
+
+    def obtener_estacion(self, estacion_id: int) -> Optional[EstacionMeteorologica]:
+        return self.estaciones.obtener(estacion_id)
 
     def obtener_estaciones_activas(self) -> List[EstacionMeteorologica]:
-        return [e for e in self.estaciones if e.activa]
+        return self.estaciones.activos()
 
-    def obtener_datos_clima(self) -> List[Lectura]:
+    def obtener_datos_clima(self, como_lote: bool = False) -> List[Lectura] | LecturaBatch:
+        if como_lote:
+            lote = LecturaBatch()
+            for e in self.obtener_estaciones_activas():
+                lote.extender(e.obtener_todas_lecturas(como_lote=True))
+            return lote
         lecturas: List[Lectura] = []
         for e in self.obtener_estaciones_activas():
             lecturas.extend(e.obtener_todas_lecturas())
         return lecturas
 
+    def obtener_datos_clima_concurrente(self, max_hilos: int = 8, timeout_sensor: float = 2.0,
+                                        timeout_total: Optional[float] = None) -> ResultadoAdquisicion:
+        # Un único pool para los sensores de todas las estaciones: una estación lenta no frena a las demás
+        pares = self._sensores_activos()
+        resultado = adquirir_concurrente([s for s, _ in pares], max_hilos, timeout_sensor, timeout_total)
+        self._registrar(resultado, pares)
+        return resultado
+
+    async def obtener_datos_clima_async(self, timeout_sensor: float = 2.0,
+                                        timeout_total: Optional[float] = None) -> ResultadoAdquisicion:
+        pares = self._sensores_activos()
+        resultado = await adquirir_async([s for s, _ in pares], timeout_sensor, timeout_total)
+        self._registrar(resultado, pares)
+        return resultado
+
+    def _sensores_activos(self) -> List[Tuple[Sensor, EstacionMeteorologica]]:
+        # Sensores activos de las estaciones activas, en orden, con la estación que los contiene
+        return [(s, e) for e in self.obtener_estaciones_activas() for s in e.obtener_sensores_activos()]
+
+    @staticmethod
+    def _registrar(resultado: ResultadoAdquisicion, pares: List[Tuple[Sensor, EstacionMeteorologica]]) -> None:
+        # Cada lectura va al historial de la estación de su sensor
+        estacion_de = {s.id: e for s, e in pares}
+        for l in resultado.lecturas:
+            estacion_de[l.sensor_id].registrar_lecturas((l,))
+
+    def estadisticas_por_sensor(self) -> Dict[int, EstadisticaSensor]:
+        # Combina (sin recorrer lecturas) las estadísticas de todas las estaciones
+        total: Dict[int, EstadisticaSensor] = {}
+        for e in self.estaciones:
+            for sid, est in e.estadisticas.items():
+                total.setdefault(sid, EstadisticaSensor()).combinar(est)
+        return total
+
+    def estadisticas_por_tipo(self) -> Dict[str, EstadisticaSensor]:
+        total: Dict[str, EstadisticaSensor] = {}
+        for e in self.estaciones:
+            for sid, est in e.estadisticas.items():
+                sensor = e.obtener_sensor(sid)
+                if sensor is not None:
+                    total.setdefault(sensor.tipo, EstadisticaSensor()).combinar(est)
+        return total
+
+    def reiniciar_estadisticas(self) -> Dict[int, EstadisticaSensor]:
+        cerradas = self.estadisticas_por_sensor()
+        for e in self.estaciones:
+            e.reiniciar_estadisticas()
+        return cerradas
+
     def __str__(self) -> str:
         return f"Parcela(id={self.id}, nombre='{self.nombre}', estaciones={len(self.estaciones)})"
 
 # --- Pruebas  ---
 """def _tests():
     from sensores import SensorTemperatura
-    from estacion import EstacionMeteorologica
+    from estacion import EstacionMeteorologica, ResultadoAdquisicion, adquirir_async, adquirir_concurrente
     p = Parcela(id=1, nombre="P1", latitud=0, longitud=0, altitud=0, area_ha=1, descripcion="x", propietario_id=1)
     e = EstacionMeteorologica(id=1, nombre="E1", coordenadas=(0.0,0.0), altitud=10.0, activa=True)
     s = SensorTemperatura(id=10, tipo="temperatura", estacion_id=1, estado=True, unidad="°C", rango_min=0, rango_max=1)
@@ -57,8 +122,18 @@ class Parcela:
     p.agregar_estacion(e)
     lects = p.obtener_datos_clima()
     assert len(lects) >= 1
+    assert p.obtener_datos_clima(como_lote=True)[0].sensor_id == 10
+    r = p.obtener_datos_clima_concurrente(timeout_total=5.0)
+    assert len(r.lecturas) == 1 and not r.fallidos
+    assert len(e.historial_ultimas(10, 10)) == 3
+    assert p.estadisticas_por_sensor()[10].n == 3 and p.estadisticas_por_tipo()["temperatura"].n == 3
+    assert p.reiniciar_estadisticas()[10].n == 3 and p.estadisticas_por_sensor() == {}
+    e.activa = False
+    assert p.obtener_estaciones_activas() == [] and p.obtener_datos_clima() == []
+    e.activa = True
+    assert p.obtener_estacion(1) is e
     p.remover_estacion(1)
-    assert len(p.estaciones) == 0
+    assert len(p.estaciones) == 0 and p.obtener_estaciones_activas() == []
     print("[parcela] OK")
 
 if __name__ == "__main__":
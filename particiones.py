@@ -0,0 +1,224 @@
+# Módulo de las particiones mensuales de lectura
+# Cada mes vive en su propia tabla lectura_AAAAMM: el B-tree de un mes no crece con el histórico y
+# un mes entero se descarta con DROP TABLE. La vista lectura las une para el resto del código; las
+# consultas de rango se enrutan sólo a las particiones que se solapan (esquema.crear_particion las crea)
+from __future__ import annotations
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from lectura import a_epoch_ms, desde_epoch_ms
+
+Fila = Tuple[int, int, float, Optional[str], Optional[str]]  # sensor_id, fecha_hora (ms), valor, calidad, fuente
+Particion = Tuple[str, int, int]  # nombre, desde_ms, hasta_ms (exclusivo)
+
+COLUMNAS = "sensor_id, fecha_hora, valor, calidad_dato, fuente"
+
+# Catálogo de particiones: enruta sin consultar sqlite_master ni parsear nombres
+SQL_CATALOGO = """
+CREATE TABLE IF NOT EXISTS particion_lectura (
+    nombre TEXT PRIMARY KEY,
+    desde_ms INTEGER NOT NULL UNIQUE,
+    hasta_ms INTEGER NOT NULL    -- exclusivo
+);
+"""
+
+# WITHOUT ROWID con clave (sensor_id, fecha_hora): un único B-tree por mes, sin rowid ni autoíndice UNIQUE
+SQL_PARTICION = """
+CREATE TABLE IF NOT EXISTS {nombre} (
+    sensor_id INTEGER NOT NULL,
+    fecha_hora INTEGER NOT NULL,  -- epoch en milisegundos (ver lectura.a_epoch_ms)
+    valor REAL NOT NULL,
+    calidad_dato TEXT DEFAULT 'OK',
+    fuente TEXT DEFAULT 'automatica',
+    PRIMARY KEY (sensor_id, fecha_hora),
+    FOREIGN KEY (sensor_id) REFERENCES sensor(id)
+        ON UPDATE NO ACTION ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# Sin particiones, lectura (y cualquier rango) es una consulta vacía con las mismas columnas. Lee
+# del catálogo: una sentencia que no abre ninguna tabla no comprueba el esquema y, guardada en la
+# caché de sentencias, seguiría viendo la vista vacía después de crearse la primera partición
+SQL_VACIA = ("(SELECT NULL AS sensor_id, NULL AS fecha_hora, NULL AS valor, "
+             "NULL AS calidad_dato, NULL AS fuente FROM particion_lectura WHERE 0)")
+
+
+def crear_catalogo(con: sqlite3.Connection) -> None:
+    """Migración 11 (esquema.py): catálogo de particiones."""
+    con.execute(SQL_CATALOGO)
+
+
+def limites_mes(epoch_ms: int) -> Tuple[str, int, int]:
+    """Etiqueta AAAAMM y rango [desde, hasta) en ms del mes que contiene epoch_ms."""
+    f = desde_epoch_ms(epoch_ms)
+    desde = datetime(f.year, f.month, 1)
+    hasta = datetime(f.year + (f.month == 12), f.month % 12 + 1, 1)
+    return f"{f.year:04d}{f.month:02d}", a_epoch_ms(desde), a_epoch_ms(hasta)
+
+
+def nombre_particion(mes: str) -> str:
+    return f"lectura_{mes}"
+
+
+def particiones(con: sqlite3.Connection) -> List[Particion]:
+    """Particiones del catálogo en orden cronológico."""
+    return con.execute("SELECT nombre, desde_ms, hasta_ms FROM particion_lectura ORDER BY desde_ms").fetchall()
+
+
+def solapadas(con: sqlite3.Connection, desde_ms: int, hasta_ms: int) -> List[str]:
+    """Particiones que se solapan con [desde_ms, hasta_ms), en orden cronológico."""
+    return [nombre for (nombre,) in con.execute("""SELECT nombre FROM particion_lectura
+                                                    WHERE desde_ms < ? AND hasta_ms > ?
+                                                    ORDER BY desde_ms""", (hasta_ms, desde_ms))]
+
+
+def origen(con: sqlite3.Connection, desde_ms: int, hasta_ms: int) -> str:
+    """Expresión para FROM con las columnas de lectura, limitada a las particiones que se solapan con el rango.
+
+    Con una partición es su tabla; con varias, su UNION ALL (el planificador lleva a cada rama los
+    filtros y el ORDER BY de la consulta exterior). Las filas de fuera del rango siguen ahí: la
+    consulta ha de filtrar fecha_hora igualmente.
+    """
+    nombres = solapadas(con, desde_ms, hasta_ms)
+    if not nombres:
+        return SQL_VACIA
+    if len(nombres) == 1:
+        return nombres[0]
+    return "(" + " UNION ALL ".join(f"SELECT {COLUMNAS} FROM {nombre}" for nombre in nombres) + ")"
+
+
+def agrupar(filas: Iterable[Fila]) -> Dict[Particion, List[Fila]]:
+    """Reparte filas por mes: {(AAAAMM, desde_ms, hasta_ms): filas del mes en su orden}."""
+    grupos: Dict[Particion, List[Fila]] = {}
+    mes = ("", 0, -1)
+    grupo: List[Fila] = []
+    for fila in filas:
+        # Las lecturas suelen venir ordenadas: se reutiliza el mes de la anterior
+        if not mes[1] <= fila[1] < mes[2]:
+            mes = limites_mes(fila[1])
+            grupo = grupos.setdefault(mes, [])
+        grupo.append(fila)
+    return grupos
+
+
+def _en(fila: str, desde: int, hasta: int) -> str:
+    return f"{fila}.fecha_hora >= {desde} AND {fila}.fecha_hora < {hasta}"
+
+
+def rehacer_vista(con: sqlite3.Connection) -> None:
+    """Vuelve a crear la vista lectura y sus triggers INSTEAD OF con las particiones del catálogo.
+
+    UPDATE y DELETE sobre la vista van a la partición de cada fila (y de su nueva fecha_hora), cuyos
+    triggers mantienen las tablas derivadas. INSERT se rechaza: una partición nueva es un cambio de
+    esquema que un trigger no puede hacer, así que las lecturas entran por meteorologiadb.insertar_lecturas.
+    """
+    actuales = particiones(con)
+    con.execute("DROP VIEW IF EXISTS lectura")  # se lleva sus triggers
+    if actuales:
+        con.execute("CREATE VIEW lectura AS " + " UNION ALL ".join(f"SELECT {COLUMNAS} FROM {nombre}"
+                                                                   for nombre, _, _ in actuales))
+    else:
+        con.execute(f"CREATE VIEW lectura AS SELECT * FROM {SQL_VACIA}")
+    con.execute("""CREATE TRIGGER trg_lectura_insertar INSTEAD OF INSERT ON lectura BEGIN
+        SELECT RAISE(ABORT, 'lectura es una vista de particiones: use meteorologiadb.insertar_lecturas');
+    END;""")
+    if not actuales:
+        return
+    clave = "sensor_id = OLD.sensor_id AND fecha_hora = OLD.fecha_hora"
+    borrar = "".join(f"""
+        DELETE FROM {nombre} WHERE {_en("OLD", desde, hasta)} AND {clave};""" for nombre, desde, hasta in actuales)
+    con.execute(f"CREATE TRIGGER trg_lectura_borrar INSTEAD OF DELETE ON lectura BEGIN {borrar}\n    END;")
+    # En el mismo mes se actualiza en sitio; si cambia de mes, se borra de uno y se inserta en el otro
+    actualizar = "".join(f"""
+        UPDATE {nombre} SET sensor_id = NEW.sensor_id, fecha_hora = NEW.fecha_hora, valor = NEW.valor,
+                            calidad_dato = NEW.calidad_dato, fuente = NEW.fuente
+         WHERE {_en("OLD", desde, hasta)} AND {_en("NEW", desde, hasta)} AND {clave};
+        DELETE FROM {nombre} WHERE {_en("OLD", desde, hasta)} AND NOT ({_en("NEW", desde, hasta)}) AND {clave};
+        INSERT INTO {nombre} ({COLUMNAS})
+        SELECT NEW.sensor_id, NEW.fecha_hora, NEW.valor, NEW.calidad_dato, NEW.fuente
+         WHERE {_en("NEW", desde, hasta)} AND NOT ({_en("OLD", desde, hasta)});""" for nombre, desde, hasta in actuales)
+    con.execute(f"""CREATE TRIGGER trg_lectura_actualizar INSTEAD OF UPDATE ON lectura BEGIN
+        SELECT RAISE(ABORT, 'no hay partición de lectura para la nueva fecha_hora')
+         WHERE NOT EXISTS (SELECT 1 FROM particion_lectura
+                            WHERE NEW.fecha_hora >= desde_ms AND NEW.fecha_hora < hasta_ms);{actualizar}
+    END;""")
+
+
+def soltar(con: sqlite3.Connection, nombre: str) -> None:
+    """Descarta una partición entera con DROP TABLE y la quita de la vista lectura.
+
+    No borra fila a fila ni dispara triggers: las tablas derivadas (agregados, conteos, última
+    lectura) quedan como estaban y las ajusta el llamante si hace falta.
+    """
+    if con.execute("SELECT 1 FROM particion_lectura WHERE nombre = ?", (nombre,)).fetchone() is None:
+        raise ValueError(f"{nombre} no es una partición de lectura")
+    con.execute(f"DROP TABLE IF EXISTS {nombre}")
+    con.execute("DELETE FROM particion_lectura WHERE nombre = ?", (nombre,))
+    rehacer_vista(con)
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    import archivo
+    import meteorologiadb
+    from conexion import configurar, cerrar_conexiones, escribir, obtener_conexion
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "p.db"))
+        meteorologiadb.crear_bd()
+        meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        meteorologiadb.insertar("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        for _ in range(2):
+            meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('temperatura', 'C', 0.1, 1)")
+        con = obtener_conexion()
+        assert con.execute("SELECT COUNT(*) FROM lectura").fetchone()[0] == 0
+        # Cada lectura va a la partición de su mes (UTC); un lote puede abarcar varios
+        _, ene, feb = limites_mes(a_epoch_ms(datetime(2025, 1, 15)))
+        _, _, mar = limites_mes(feb)
+        _, _, abr = limites_mes(mar)
+        meteorologiadb.insertar_lecturas([(s, t, 1.0, "OK", "automatica")
+                                          for s in (1, 2) for t in (ene, feb - 1, feb, mar + 1)])
+        assert particiones(con) == [("lectura_202501", ene, feb), ("lectura_202502", feb, mar),
+                                    ("lectura_202503", mar, abr)]
+        assert con.execute("SELECT COUNT(*) FROM lectura_202501").fetchone()[0] == 4
+        assert origen(con, feb, mar) == "lectura_202502" and origen(con, abr, abr + 1) == SQL_VACIA
+        assert origen(con, feb - 1, feb + 1).count("UNION ALL") == 1
+        # La vista rechaza INSERT y enruta UPDATE y DELETE, también si la fila cambia de mes
+        try:
+            escribir(lambda c: c.execute("INSERT INTO lectura (sensor_id, fecha_hora, valor) VALUES (1, 0, 1.0)"))
+            raise AssertionError("INSERT en la vista debe fallar")
+        except sqlite3.IntegrityError:
+            pass
+        escribir(lambda c: c.execute("UPDATE lectura SET fecha_hora = ? WHERE sensor_id = 1 AND fecha_hora = ?",
+                                     (feb + 1, feb - 1)))
+        assert con.execute("SELECT COUNT(*) FROM lectura_202502 WHERE sensor_id = 1").fetchone()[0] == 2
+        try:
+            escribir(lambda c: c.execute("UPDATE lectura SET fecha_hora = ? WHERE sensor_id = 1 AND fecha_hora = ?",
+                                         (abr, ene)))
+            raise AssertionError("un mes sin partición debe fallar")
+        except sqlite3.IntegrityError:
+            pass
+        escribir(lambda c: c.execute("DELETE FROM lectura WHERE sensor_id = 2 AND fecha_hora = ?", (mar + 1,)))
+        assert dict(con.execute("SELECT sensor_id, n FROM lectura_conteo")) == {1: 4, 2: 3}
+        try:
+            escribir(lambda c: soltar(c, "sensor"))
+            raise AssertionError("sólo se sueltan particiones")
+        except ValueError:
+            pass
+        # Retención: el mes se va con DROP TABLE, con su fichero archivado y lo que derivaba de él
+        archivo.archivar(desde_epoch_ms(feb), sensor_id=2)
+        assert len(os.listdir(archivo.directorio_archivo())) == 1
+        assert meteorologiadb.eliminar_meses_anteriores(desde_epoch_ms(feb)) == ["202501"]
+        assert [p[0] for p in particiones(con)] == ["lectura_202502", "lectura_202503"]
+        assert os.listdir(archivo.directorio_archivo()) == []
+        assert con.execute("SELECT COUNT(*) FROM agregado_hora WHERE inicio_ms < ?", (feb,)).fetchone()[0] == 0
+        assert dict(con.execute("SELECT sensor_id, n FROM lectura_conteo")) == {1: 3, 2: 1}
+        assert meteorologiadb.eliminar_mes(desde_epoch_ms(mar)) == "202503"
+        assert dict(con.execute("SELECT sensor_id, fecha_hora FROM sensor_ultima_lectura")) == {1: feb + 1, 2: feb}
+        assert con.execute("SELECT COUNT(*) FROM lectura").fetchone()[0] == 3
+        cerrar_conexiones()
+    print("[particiones] OK")
+
+if __name__ == "__main__":
+    _tests()"""
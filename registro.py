@@ -0,0 +1,162 @@
+# Módulo del registro indexado de sensores (EstacionMeteorologica) y estaciones (Parcela)
+# Índice por id, por tipo y conjunto de activos mantenidos al añadir/quitar: todo O(1)
+from __future__ import annotations
+from typing import Callable, ClassVar, Dict, Generic, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Vigilado:
+    # Descriptor del atributo activo: guarda el valor en la instancia y avisa a sus registros.
+    # Sólo intercepta ese atributo; el resto se asigna sin pasar por Python
+    __slots__ = ("nombre",)
+
+    def __init__(self, nombre: str) -> None:
+        self.nombre = nombre
+
+    def __get__(self, obj, tipo=None):
+        if obj is None:
+            # Sin valor en la clase: @dataclass no lo toma como valor por defecto del campo
+            raise AttributeError(self.nombre)
+        try:
+            return obj.__dict__[self.nombre]
+        except KeyError:
+            raise AttributeError(self.nombre) from None
+
+    def __set__(self, obj, valor) -> None:
+        obj.__dict__[self.nombre] = valor
+        for registro in obj.__dict__.get("_registros", ()):
+            registro._refrescar(obj)
+
+
+class Indexable:
+    """Mezcla para los elementos de un Registro: al cambiar ATRIBUTO_ACTIVO avisa a sus registros.
+
+    Así `sensor.estado = False` saca al sensor del conjunto de activos sin recorrer la estación.
+    """
+    ATRIBUTO_ACTIVO: ClassVar[str] = "activo"
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if "ATRIBUTO_ACTIVO" in cls.__dict__:
+            setattr(cls, cls.ATRIBUTO_ACTIVO, _Vigilado(cls.ATRIBUTO_ACTIVO))
+
+
+class Registro(Generic[T]):
+    """Colección ordenada por inserción de elementos con atributo id único.
+
+    Se usa como la lista de antes (len, iteración, in, ==), y además ofrece obtener(id),
+    por_tipo(tipo) y activos() sin recorrer la colección. El tipo se indexa al añadir el elemento.
+    """
+    __slots__ = ("_por_id", "_por_tipo", "_activos", "_tipo", "_es_activo")
+
+    def __init__(self, elementos: Iterable[T] = (), tipo: Optional[Callable[[T], str]] = None,
+                 es_activo: Callable[[T], bool] = lambda e: True) -> None:
+        self._por_id: Dict[int, T] = {}
+        self._por_tipo: Dict[str, Dict[int, T]] = {}
+        self._activos: Dict[int, T] = {}  # dict y no set: conserva el orden
+        self._tipo = tipo
+        self._es_activo = es_activo
+        for e in elementos:
+            self.agregar(e)
+
+    def agregar(self, elemento: T) -> None:
+        eid = elemento.id
+        if eid in self._por_id:
+            raise ValueError(f"ya existe un elemento con id {eid}")
+        self._por_id[eid] = elemento
+        if self._tipo is not None:
+            self._por_tipo.setdefault(self._tipo(elemento), {})[eid] = elemento
+        if self._es_activo(elemento):
+            self._activos[eid] = elemento
+        if isinstance(elemento, Indexable):
+            elemento.__dict__.setdefault("_registros", []).append(self)
+
+    def remover(self, elemento_id: int) -> Optional[T]:
+        """Quita y devuelve el elemento; None si no estaba."""
+        elemento = self._por_id.pop(elemento_id, None)
+        if elemento is None:
+            return None
+        self._activos.pop(elemento_id, None)
+        if self._tipo is not None:
+            tipo = self._tipo(elemento)
+            grupo = self._por_tipo.get(tipo, {})
+            grupo.pop(elemento_id, None)
+            if not grupo:
+                self._por_tipo.pop(tipo, None)
+        registros = elemento.__dict__.get("_registros")
+        if registros:
+            registros[:] = [r for r in registros if r is not self]
+        return elemento
+
+    def _refrescar(self, elemento: T) -> None:
+        if self._por_id.get(elemento.id) is not elemento:
+            return
+        if self._es_activo(elemento):
+            self._activos.setdefault(elemento.id, elemento)
+        else:
+            self._activos.pop(elemento.id, None)
+
+    def obtener(self, elemento_id: int) -> Optional[T]:
+        return self._por_id.get(elemento_id)
+
+    def por_tipo(self, tipo: str) -> List[T]:
+        return list(self._por_tipo.get(tipo, {}).values())
+
+    def tipos(self) -> List[str]:
+        return list(self._por_tipo)
+
+    def activos(self) -> List[T]:
+        # En orden de activación: un elemento reactivado pasa al final
+        return list(self._activos.values())
+
+    def __len__(self) -> int:
+        return len(self._por_id)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(list(self._por_id.values()))
+
+    def __contains__(self, elemento) -> bool:
+        # Acepta el id o el propio elemento
+        if isinstance(elemento, int):
+            return elemento in self._por_id
+        return self._por_id.get(getattr(elemento, "id", None)) is elemento
+
+    def __eq__(self, otro: object) -> bool:
+        if isinstance(otro, Registro):
+            return list(self._por_id.values()) == list(otro._por_id.values())
+        if isinstance(otro, list):
+            return list(self._por_id.values()) == otro
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Registro({list(self._por_id.values())!r})"
+
+
+# --- Pruebas ---
+"""def _tests():
+    from dataclasses import dataclass
+    @dataclass(eq=False)
+    class Item(Indexable):
+        ATRIBUTO_ACTIVO = "estado"
+        id: int
+        tipo: str
+        estado: bool
+    r = Registro([Item(1, "a", True), Item(2, "b", False)], tipo=lambda i: i.tipo, es_activo=lambda i: i.estado)
+    try:
+        r.agregar(Item(1, "a", True))
+        assert False, "id duplicado"
+    except ValueError:
+        pass
+    assert len(r) == 2 and 1 in r and r.obtener(2).tipo == "b"
+    assert [i.id for i in r.activos()] == [1]
+    r.obtener(2).estado = True
+    r.obtener(1).estado = False
+    assert [i.id for i in r.activos()] == [2]
+    item = r.remover(2)
+    item.estado = False
+    assert r.remover(2) is None and r.activos() == [] and r.por_tipo("b") == [] and r.tipos() == ["a"]
+    print("[registro] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,298 @@
+# Módulo repositorio: carga desde SQLite el grafo de objetos del dominio
+# (Parcela -> EstacionMeteorologica -> Sensor, y los Usuario enlazados por usuario_parcela)
+# con un número fijo de consultas por conjunto, sin una consulta por hijo (N+1)
+from __future__ import annotations
+import json
+import sqlite3
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from archivo import consultar_rango
+from calidad import LIMITES_TIPO
+from conexion import obtener_conexion
+from estacion import EstacionMeteorologica
+from historial import BufferCircular
+from lectura import LecturaBatch
+from parcela import Parcela
+from sensores import Sensor, SensorHumedad, SensorPrecipitacion, SensorTemperatura
+from usuario import Usuario
+
+
+def _sensor_temperatura(f: sqlite3.Row) -> Sensor:
+    lo, hi = LIMITES_TIPO["temperatura"]
+    return SensorTemperatura(id=f["id"], tipo=f["tipo"], estacion_id=f["estacion_id"], estado=bool(f["estado"]),
+                             unidad=f["unidad"], rango_min=lo if f["rango_min"] is None else f["rango_min"],
+                             rango_max=hi if f["rango_max"] is None else f["rango_max"])
+
+
+def _sensor_humedad(f: sqlite3.Row) -> Sensor:
+    fecha = f["fecha_calibracion"]
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha[:10])
+    return SensorHumedad(id=f["id"], tipo=f["tipo"], estacion_id=f["estacion_id"], estado=bool(f["estado"]),
+                         tipo_humedad=f["tipo_humedad"], fecha_calibracion=fecha)
+
+
+def _sensor_precipitacion(f: sqlite3.Row) -> Sensor:
+    return SensorPrecipitacion(id=f["id"], tipo=f["tipo"], estacion_id=f["estacion_id"], estado=bool(f["estado"]),
+                               tipo_medidor=f["tipo_medidor"], area_captacion=f["area_captacion"])
+
+
+# sensor.tipo -> constructor de la subclase; los tipos sin subclase (p. ej. viento) no se cargan
+FABRICAS_SENSOR: Dict[str, Callable[[sqlite3.Row], Sensor]] = {
+    "temperatura": _sensor_temperatura,
+    "humedad": _sensor_humedad,
+    "precipitacion": _sensor_precipitacion,
+}
+
+
+def _lista(texto: Optional[str], convertir: Callable = str) -> list:
+    # usuario.zonas_interes / permisos: lista JSON o texto separado por comas
+    if not texto:
+        return []
+    if texto.lstrip().startswith("["):
+        return [convertir(x) for x in json.loads(texto)]
+    return [convertir(x.strip()) for x in texto.split(",") if x.strip()]
+
+
+def _filtro_ids(columna: str, ids: Optional[Iterable[int]]) -> Tuple[str, tuple]:
+    # Un único parámetro para cualquier número de ids (sin el límite de variables de SQLite)
+    if ids is None:
+        return "1", ()
+    return f"{columna} IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),)
+
+
+class Repositorio:
+    """Carga parcelas completas con cuatro consultas (parcelas, estaciones, sensores y usuarios).
+
+    Mapa de identidad: cada fila se materializa en un único objeto por id, y volver a cargar
+    actualiza y reutiliza los objetos ya entregados (también su historial y estadísticas).
+    Las lecturas no se cargan con el grafo: lecturas() y precargar_historial() las traen bajo demanda.
+    """
+
+    def __init__(self, con: Optional[sqlite3.Connection] = None) -> None:
+        self._con = con
+        self.parcelas: Dict[int, Parcela] = {}
+        self.estaciones: Dict[int, EstacionMeteorologica] = {}
+        self.sensores: Dict[int, Sensor] = {}
+        self.usuarios: Dict[int, Usuario] = {}
+        self._usuarios_parcela: Dict[int, List[int]] = {}
+
+    def _consultar(self, sql: str, valores: tuple = ()) -> List[sqlite3.Row]:
+        con = self._con or obtener_conexion()
+        cur = con.cursor()
+        cur.row_factory = sqlite3.Row
+        return cur.execute(sql, valores).fetchall()
+
+    def cargar_parcela(self, parcela_id: int) -> Optional[Parcela]:
+        return next(iter(self.cargar_parcelas([parcela_id])), None)
+
+    def primera_parcela_en_uso(self) -> Optional[Parcela]:
+        """La parcela de menor id con alguna estación y algún usuario asignado, o None; carga sólo esa."""
+        filas = self._consultar("""
+            SELECT p.id FROM parcela p
+             WHERE EXISTS (SELECT 1 FROM estacion_meteorologica e WHERE e.parcela_id = p.id)
+               AND EXISTS (SELECT 1 FROM usuario_parcela up WHERE up.parcela_id = p.id)
+             ORDER BY p.id LIMIT 1""")
+        return self.cargar_parcela(filas[0]["id"]) if filas else None
+
+    def cargar_parcelas(self, ids: Optional[Iterable[int]] = None) -> List[Parcela]:
+        """Parcelas (todas si ids es None) con sus estaciones, sensores y usuarios, ordenadas por id."""
+        ids = None if ids is None else list(ids)
+        filtro, valores = _filtro_ids("p.id", ids)
+        parcelas = [self._parcela(f) for f in self._consultar(
+            f"SELECT * FROM parcela p WHERE {filtro} ORDER BY p.id", valores)]
+        ids_cargados = [p.id for p in parcelas]
+        filtro, valores = _filtro_ids("e.parcela_id", ids_cargados)
+
+        estaciones_de: Dict[int, List[EstacionMeteorologica]] = {pid: [] for pid in ids_cargados}
+        for f in self._consultar(f"SELECT * FROM estacion_meteorologica e WHERE {filtro} ORDER BY e.id", valores):
+            estaciones_de[f["parcela_id"]].append(self._estacion(f))
+        sensores_de: Dict[int, List[Sensor]] = {e.id: [] for lista in estaciones_de.values() for e in lista}
+        for f in self._consultar(f"""SELECT s.* FROM sensor s JOIN estacion_meteorologica e ON e.id = s.estacion_id
+                                      WHERE {filtro} ORDER BY s.id""", valores):
+            sensor = self._sensor(f)
+            if sensor is not None:
+                sensores_de[f["estacion_id"]].append(sensor)
+        for pid in ids_cargados:
+            self._usuarios_parcela[pid] = []
+        filtro, valores = _filtro_ids("up.parcela_id", ids_cargados)
+        for f in self._consultar(f"""SELECT u.*, up.parcela_id FROM usuario_parcela up JOIN usuario u ON u.id = up.usuario_id
+                                      WHERE {filtro} ORDER BY u.id""", valores):
+            usuario = self._usuario(f)
+            usuario.asignar_parcela(f["parcela_id"])
+            self._usuarios_parcela[f["parcela_id"]].append(usuario.id)
+
+        # Enlaza hijos: añade los nuevos y quita los que ya no están en la BD
+        for p in parcelas:
+            _sincronizar(p.estaciones, estaciones_de[p.id], p.agregar_estacion, p.remover_estacion)
+            for e in estaciones_de[p.id]:
+                _sincronizar(e.sensores, sensores_de[e.id], e.agregar_sensor, e.remover_sensor)
+        return parcelas
+
+    def usuarios_de(self, parcela_id: int) -> List[Usuario]:
+        # Usuarios enlazados a una parcela ya cargada
+        return [self.usuarios[uid] for uid in self._usuarios_parcela.get(parcela_id, [])]
+
+    def _parcela(self, f: sqlite3.Row) -> Parcela:
+        campos = dict(nombre=f["nombre"], latitud=f["latitud"], longitud=f["longitud"], altitud=f["altitud"],
+                      area_ha=f["area_ha"], descripcion=f["descripcion"], propietario_id=f["propietario_id"])
+        return _identidad(self.parcelas, f["id"], campos, lambda: Parcela(id=f["id"], **campos))
+
+    def _estacion(self, f: sqlite3.Row) -> EstacionMeteorologica:
+        campos = dict(nombre=f["nombre"], coordenadas=(f["latitud"], f["longitud"]), altitud=f["altitud"],
+                      activa=bool(f["activa"]), capacidad_registro=f["capacidad_registro"])
+        return _identidad(self.estaciones, f["id"], campos, lambda: EstacionMeteorologica(id=f["id"], **campos))
+
+    def _sensor(self, f: sqlite3.Row) -> Optional[Sensor]:
+        fabrica = FABRICAS_SENSOR.get(f["tipo"])
+        if fabrica is None:
+            return None
+        nuevo = fabrica(f)
+        existente = self.sensores.get(f["id"])
+        if existente is None or type(existente) is not type(nuevo):
+            self.sensores[f["id"]] = nuevo
+            return nuevo
+        # Mismo objeto con los valores de la BD; estado al final para avisar a los registros una vez
+        for campo, valor in vars(nuevo).items():
+            if not campo.startswith("_") and campo != "estado":
+                setattr(existente, campo, valor)
+        if existente.estado != nuevo.estado:
+            existente.estado = nuevo.estado
+        return existente
+
+    def _usuario(self, f: sqlite3.Row) -> Usuario:
+        campos = dict(nombre=f["nombre"], rol=f["rol"], email=f["email"], telefono=f["telefono"],
+                      zonas_interes=_lista(f["zonas_interes"], int), permisos=_lista(f["permisos"]))
+        return _identidad(self.usuarios, f["id"], campos, lambda: Usuario(id=f["id"], **campos))
+
+    def lecturas(self, sensor_id: int, desde: datetime, hasta: datetime) -> LecturaBatch:
+        """Lecturas del sensor en [desde, hasta), incluidas las del archivo columnar."""
+        lote = LecturaBatch()
+        for sid, ms, valor, _, _ in consultar_rango(sensor_id, desde, hasta):
+            lote.sensor_ids.append(sid)
+            lote.tiempos.append(ms)
+            lote.valores.append(valor)
+        return lote
+
+    def precargar_historial(self, estaciones: Iterable[EstacionMeteorologica]) -> int:
+        """Rellena el historial en memoria de cada sensor con sus capacidad_registro lecturas más recientes.
+
+        Una consulta por cada capacidad_registro distinta (normalmente una): cada sensor busca la fecha
+        de su capacidad_registro-ésima lectura más reciente recorriendo hacia atrás la clave (sensor_id,
+        fecha_hora) de cada partición y lee desde ahí, sin recorrer el resto de su historia.
+        Devuelve cuántas lecturas se cargaron.
+        """
+        por_capacidad: Dict[int, List[int]] = {}
+        buffers: Dict[int, BufferCircular] = {}
+        for e in estaciones:
+            for s in e.sensores:
+                buffers[s.id] = e.historial[s.id] = BufferCircular(s.id, e.capacidad_registro)
+                por_capacidad.setdefault(e.capacidad_registro, []).append(s.id)
+        cargadas = 0
+        for capacidad, ids in por_capacidad.items():
+            # MATERIALIZED: el corte se calcula una vez por sensor, no en cada rama de la vista lectura
+            filas = self._consultar("""
+                WITH corte AS MATERIALIZED (
+                    SELECT j.value AS sensor_id,
+                           COALESCE((SELECT fecha_hora FROM lectura WHERE sensor_id = j.value
+                                      ORDER BY fecha_hora DESC LIMIT 1 OFFSET ? - 1), -9223372036854775808) AS desde
+                      FROM json_each(?) AS j)
+                SELECT l.sensor_id, l.fecha_hora, l.valor
+                  FROM corte AS c
+                  JOIN lectura AS l ON l.sensor_id = c.sensor_id AND l.fecha_hora >= c.desde
+                 ORDER BY l.sensor_id, l.fecha_hora""", (capacidad, json.dumps(ids)))
+            for sid, ms, valor in filas:
+                buffers[sid].agregar_valor(ms, valor)
+            cargadas += len(filas)
+        return cargadas
+
+
+def _identidad(mapa: Dict, id_: int, campos: Dict, crear: Callable):
+    # Devuelve el objeto del mapa con los campos actualizados, o lo crea y lo registra
+    objeto = mapa.get(id_)
+    if objeto is None:
+        objeto = mapa[id_] = crear()
+    else:
+        for campo, valor in campos.items():
+            if getattr(objeto, campo) != valor:
+                setattr(objeto, campo, valor)
+    return objeto
+
+
+def _sincronizar(registro, hijos: List, agregar: Callable, remover: Callable) -> None:
+    if not len(registro):  # primera carga
+        for h in hijos:
+            agregar(h)
+        return
+    ids = {h.id for h in hijos}
+    for viejo in [h for h in registro if h.id not in ids]:
+        remover(viejo.id)
+    for h in hijos:
+        if h not in registro:
+            if h.id in registro:  # otro objeto con el mismo id (p. ej. cambió la subclase)
+                remover(h.id)
+            agregar(h)
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from datetime import timedelta
+    import meteorologiadb
+    from conexion import configurar, cerrar_conexiones
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "r.db"))
+        meteorologiadb.crear_bd()
+        con = obtener_conexion()
+        with con:
+            con.execute("INSERT INTO usuario (id, nombre, rol, permisos, zonas_interes) VALUES (1, 'Ana', 'tecnico', 'lectura_parcela', '[1, 2]')")
+            for p in (1, 2):
+                con.execute("INSERT INTO parcela (id, nombre, latitud, longitud) VALUES (?, ?, 0, 0)", (p, f"P{p}"))
+                con.execute("INSERT INTO usuario_parcela VALUES (1, ?)", (p,))
+                for e in range(3):
+                    eid = p * 10 + e
+                    con.execute("INSERT INTO estacion_meteorologica (id, nombre, latitud, longitud, parcela_id, capacidad_registro) "
+                                "VALUES (?, ?, 1, 2, ?, 5)", (eid, f"E{eid}", p))
+                    con.execute("INSERT INTO sensor (tipo, unidad, precision, rango_min, rango_max, estacion_id) VALUES ('temperatura', 'C', 0.1, -5, 45, ?)", (eid,))
+                    con.execute("INSERT INTO sensor (tipo, unidad, precision, tipo_humedad, fecha_calibracion, estacion_id) VALUES ('humedad', '%', 1, 'relativa', '2025-01-01', ?)", (eid,))
+                    con.execute("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('viento', 'km/h', 1, ?)", (eid,))
+        t0 = datetime(2025, 1, 1)
+        meteorologiadb.insertar_lecturas((sid, t0 + timedelta(minutes=i), float(i), "OK", "automatica")
+                                         for sid in (1, 4) for i in range(20))
+        repo = Repositorio()
+        consultas = []
+        con.set_trace_callback(consultas.append)
+        parcelas = repo.cargar_parcelas()
+        con.set_trace_callback(None)
+        assert len(consultas) == 4
+        assert [len(p.estaciones) for p in parcelas] == [3, 3]
+        e = parcelas[0].obtener_estacion(10)
+        assert e.coordenadas == (1, 2) and [type(s).__name__ for s in e.sensores] == ["SensorTemperatura", "SensorHumedad"]
+        assert e.obtener_sensor(2).fecha_calibracion == date(2025, 1, 1)
+        ana = repo.usuarios_de(2)[0]
+        assert ana.parcelas_asignadas == [1, 2] and ana.zonas_interes == [1, 2] and ana.puede_acceder_parcela(1)
+        # Mapa de identidad: recargar reutiliza los objetos y aplica los cambios de la BD
+        with con:
+            con.execute("UPDATE sensor SET estado = 0 WHERE id = 1")
+            con.execute("DELETE FROM sensor WHERE id = 2")
+        p1 = repo.cargar_parcela(1)
+        assert p1 is parcelas[0] and p1.obtener_estacion(10) is e and repo.usuarios[1] is ana
+        assert [s.id for s in e.obtener_sensores_activos()] == [] and len(e.sensores) == 1
+        assert repo.precargar_historial(p1.estaciones) == 10
+        assert list(e.historial_ultimas(1, 5).valores) == [15.0, 16.0, 17.0, 18.0, 19.0]
+        e.capacidad_registro = 3  # una consulta por capacidad; cada sensor, sólo las suyas
+        assert repo.precargar_historial(p1.estaciones) == 8
+        assert list(e.historial_ultimas(1, 5).valores) == [17.0, 18.0, 19.0]
+        assert list(p1.obtener_estacion(11).historial_ultimas(4, 9).valores) == [15.0, 16.0, 17.0, 18.0, 19.0]
+        assert len(repo.lecturas(1, t0, t0 + timedelta(minutes=3))) == 3
+        assert repo.cargar_parcela(99) is None
+        with con:
+            con.execute("DELETE FROM usuario_parcela WHERE parcela_id = 1")
+        otro = Repositorio()
+        assert otro.primera_parcela_en_uso().id == 2 and list(otro.parcelas) == [2]
+        cerrar_conexiones()
+    print("[repositorio] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -1,15 +1,74 @@
 # Módulo que define la jerarquía de sensores meteorológicos
 # Implementa un diseño basado en clases abstractas para diferentes tipos de sensores
 from __future__ import annotations
+import asyncio
+import threading
 from abc import ABC, abstractmethod
+from array import array
 from dataclasses import dataclass
-from datetime import datetime, date
-from random import uniform
-from typing import Final
-from lectura import Lectura
+from datetime import datetime, date, timedelta
+from random import random, seed, uniform
+from typing import Callable, Final, Optional, Sequence, Tuple
+from lectura import Lectura, LecturaBatch, a_epoch_ms
+from registro import Indexable
+
+try:
+    import numpy as np  # opcional: acelera obtener_lecturas_lote()
+except ImportError:
+    np = None
+
+_rng = np.random.default_rng() if np is not None else None
+
+def fijar_semilla(semilla: int) -> None:
+    """Hace reproducibles las lecturas simuladas (módulo random y, si está instalado, NumPy)."""
+    global _rng
+    seed(semilla)
+    if np is not None:
+        _rng = np.random.default_rng(semilla)
+
+def _uniformes(n: int, minimo: float, maximo: float):
+    # n valores uniformes en [minimo, maximo]: ndarray con NumPy, array('d') sin él
+    if np is not None:
+        return _rng.uniform(minimo, maximo, n)
+    ancho = maximo - minimo
+    return array("d", [minimo + ancho * random() for _ in range(n)])
+
+def _redondear(valores, decimales: int):
+    if np is not None:
+        return np.round(valores, decimales)
+    return array("d", [round(v, decimales) for v in valores])
+
+def _en_hilo_daemon(leer: Callable[[], Lectura]) -> "asyncio.Future[Lectura]":
+    # Como asyncio.to_thread, pero en un hilo daemon propio: asyncio.run() espera a los hilos del
+    # executor por defecto al cerrar, y una lectura colgada ya abandonada por timeout lo retrasaría
+    bucle = asyncio.get_running_loop()
+    futuro = bucle.create_future()
+
+    def resolver(resultado, error) -> None:
+        if futuro.cancelled():
+            return
+        if error is not None:
+            futuro.set_exception(error)
+        else:
+            futuro.set_result(resultado)
+
+    def ejecutar() -> None:
+        try:
+            resultado, error = leer(), None
+        except BaseException as e:
+            resultado, error = None, e
+        try:
+            bucle.call_soon_threadsafe(resolver, resultado, error)
+        except RuntimeError:
+            pass  # el bucle ya se cerró: nadie espera esta lectura
+
+    threading.Thread(target=ejecutar, name="lectura-async", daemon=True).start()
+    return futuro
 
 @dataclass
-class Sensor(ABC):
+class Sensor(Indexable, ABC):
+    # Cambiar estado actualiza los sensores activos de la estación (registro.Indexable)
+    ATRIBUTO_ACTIVO = "estado"
     id: int
     tipo: str
     estacion_id: int
@@ -18,6 +77,49 @@ class Sensor(ABC):
     @abstractmethod
     def obtener_lectura(self) -> Lectura: ...
 
+    async def obtener_lectura_async(self) -> Lectura:
+        # Por defecto ejecuta obtener_lectura() en un hilo; los drivers de E/S asíncronos la sobrescriben
+        return await _en_hilo_daemon(self.obtener_lectura)
+
+    @abstractmethod
+    def obtener_lecturas_lote(self, n: int, inicio: Optional[datetime] = None,
+                              intervalo: timedelta = timedelta(seconds=1)) -> LecturaBatch: ...
+
+    @abstractmethod
+    def _limites(self) -> Tuple[float, float]: ...
+
+    def validar_rango_lote(self, valores: Sequence[float]):
+        # Versión vectorizada de validar_rango: máscara booleana (ndarray con NumPy, lista sin él)
+        minimo, maximo = self._limites()
+        if np is not None:
+            v = np.asarray(valores)
+            return (v >= minimo) & (v <= maximo)
+        return [minimo <= v <= maximo for v in valores]
+
+    def _lote(self, n: int, minimo: float, maximo: float, decimales: int, inicio: Optional[datetime],
+              intervalo: timedelta, error: str) -> LecturaBatch:
+        # n lecturas separadas por intervalo desde inicio (por defecto ahora), validadas antes de redondear
+        if n < 0:
+            raise ValueError("n no puede ser negativo")
+        valores = _uniformes(n, minimo, maximo)
+        if np is not None:
+            fuera = not self.validar_rango_lote(valores).all()
+        else:
+            # min()/max() recorren el array en C: más rápido que construir la máscara
+            lim_min, lim_max = self._limites()
+            fuera = n > 0 and not (lim_min <= min(valores) and max(valores) <= lim_max)
+        if fuera:
+            raise ValueError(error)
+        valores = _redondear(valores, decimales)
+        ini = a_epoch_ms(inicio if inicio is not None else datetime.now())
+        paso = intervalo // timedelta(milliseconds=1)
+        if np is not None:
+            tiempos = array("q", (np.arange(n, dtype=np.int64) * paso + ini).tobytes())
+            valores = array("d", np.asarray(valores, dtype=np.float64).tobytes())
+        else:
+            tiempos = array("q", range(ini, ini + paso * n, paso)) if paso else array("q", [ini]) * n
+        return LecturaBatch(array("q", [self.id]) * n, tiempos, valores)
+
     def esta_activo(self) -> bool:
         return self.estado
 
@@ -41,6 +143,13 @@ class SensorTemperatura(Sensor):
             raise ValueError("Temperatura fuera de rango")
         return Lectura(valor=round(valor, 2), fecha_hora=datetime.now(), sensor_id=self.id)
 
+    def _limites(self) -> Tuple[float, float]:
+        return self.rango_min, self.rango_max
+
+    def obtener_lecturas_lote(self, n: int, inicio: Optional[datetime] = None,
+                              intervalo: timedelta = timedelta(seconds=1)) -> LecturaBatch:
+        return self._lote(n, self.rango_min, self.rango_max, 2, inicio, intervalo, "Temperatura fuera de rango")
+
 @dataclass
 class SensorHumedad(Sensor):
     tipo_humedad: str
@@ -58,6 +167,13 @@ class SensorHumedad(Sensor):
             raise ValueError("Humedad fuera de rango")
         return Lectura(valor=round(valor, 1), fecha_hora=datetime.now(), sensor_id=self.id)
 
+    def _limites(self) -> Tuple[float, float]:
+        return self._MIN, self._MAX
+
+    def obtener_lecturas_lote(self, n: int, inicio: Optional[datetime] = None,
+                              intervalo: timedelta = timedelta(seconds=1)) -> LecturaBatch:
+        return self._lote(n, 30.0, 90.0, 1, inicio, intervalo, "Humedad fuera de rango")
+
 @dataclass
 class SensorPrecipitacion(Sensor):
     tipo_medidor: str
@@ -71,6 +187,13 @@ class SensorPrecipitacion(Sensor):
         if not self.validar_rango(valor):
             raise ValueError("Precipitación fuera de rango")
         return Lectura(valor=round(valor, 2), fecha_hora=datetime.now(), sensor_id=self.id)
+
+    def _limites(self) -> Tuple[float, float]:
+        return 0.0, float("inf")
+
+    def obtener_lecturas_lote(self, n: int, inicio: Optional[datetime] = None,
+                              intervalo: timedelta = timedelta(seconds=1)) -> LecturaBatch:
+        return self._lote(n, 0.0, 15.0, 2, inicio, intervalo, "Precipitación fuera de rango")
     
     
 
@@ -84,6 +207,13 @@ def _tests():
     lt = t.obtener_lectura(); assert -5.0 <= lt.valor <= 5.0
     lh = h.obtener_lectura(); assert 0.0 <= lh.valor <= 100.0
     lp = p.obtener_lectura(); assert lp.valor >= 0.0
+    from datetime import datetime, timedelta
+    lote = t.obtener_lecturas_lote(1000, datetime(2025, 1, 1), timedelta(minutes=1))
+    assert len(lote) == 1000 and all(-5.0 <= v <= 5.0 for v in lote.valores)
+    assert lote[999].fecha_hora == datetime(2025, 1, 1) + timedelta(minutes=999) and lote[0].sensor_id == 1
+    assert all(0.0 <= v <= 100.0 for v in h.obtener_lecturas_lote(100).valores)
+    assert min(p.obtener_lecturas_lote(100).valores) >= 0.0
+    assert list(t.validar_rango_lote([-6.0, 0.0, 5.0])) == [False, True, True]
     print("[sensores] OK")
 
 if __name__ == "__main__":
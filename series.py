@@ -0,0 +1,179 @@
+# Módulo de series temporales para los gráficos del informe
+# Reduce cada serie a un presupuesto fijo de puntos con Largest-Triangle-Three-Buckets (LTTB),
+# vectorizado por cubo con NumPy si está instalado, y lee de los agregados por hora cuando el
+# rango tiene demasiadas lecturas para recorrerlas
+from __future__ import annotations
+import sqlite3
+from array import array
+from typing import List, Optional, Sequence, Tuple
+
+from archivo import rangos_archivados
+from conexion import obtener_conexion
+
+try:
+    import numpy as np  # opcional: acelera lttb()
+except ImportError:
+    np = None
+
+PUNTOS_GRAFICO = 500        # puntos por serie tras la reducción
+LIMITE_CRUDAS = 20_000      # por encima, la serie sale de agregado_hora (media por hora)
+FILAS_POR_BLOQUE = 5000
+
+Serie = Tuple[array, array]  # (tiempos array('q') en epoch ms, valores array('d'))
+
+
+def _limites(n: int, puntos: int) -> List[int]:
+    # Inicio de cada uno de los puntos-2 cubos interiores y, al final, n - 1 (el último punto)
+    cubo = (n - 2) / (puntos - 2)
+    limites = [int(i * cubo) + 1 for i in range(puntos - 1)]
+    limites[-1] = n - 1
+    return limites
+
+
+def _indices_python(x: Sequence[float], y: Sequence[float], puntos: int) -> List[int]:
+    n = len(x)
+    limites = _limites(n, puntos) + [n]
+    elegidos = [0]
+    a = 0
+    for i in range(puntos - 2):
+        # Media del cubo siguiente (tras el último cubo, el punto final)
+        ini_sig, fin_sig = limites[i + 1], limites[i + 2]
+        m = fin_sig - ini_sig
+        media_x = sum(x[ini_sig:fin_sig]) / m
+        media_y = sum(y[ini_sig:fin_sig]) / m
+        ax, ay = x[a], y[a]
+        dx, dy = ax - media_x, media_y - ay
+        mejor, area_max = a, -1.0
+        for j in range(limites[i], limites[i + 1]):
+            area = abs(dx * (y[j] - ay) - (ax - x[j]) * dy)
+            if area > area_max:
+                mejor, area_max = j, area
+        elegidos.append(mejor)
+        a = mejor
+    elegidos.append(n - 1)
+    return elegidos
+
+
+def _indices_numpy(x, y, puntos: int) -> List[int]:
+    n = len(x)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Límites de todos los cubos y sus medias de una vez; sólo el punto elegido es secuencial
+    limites = np.array(_limites(n, puntos), dtype=np.int64)
+    medias_x = np.add.reduceat(x[:n - 1], limites[:-1]) / np.diff(limites)
+    medias_y = np.add.reduceat(y[:n - 1], limites[:-1]) / np.diff(limites)
+    medias_x = np.append(medias_x[1:], x[n - 1])
+    medias_y = np.append(medias_y[1:], y[n - 1])
+    elegidos = [0]
+    a = 0
+    for i in range(puntos - 2):
+        ini, fin = limites[i], limites[i + 1]
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - medias_x[i]) * (y[ini:fin] - ay) - (ax - x[ini:fin]) * (medias_y[i] - ay))
+        a = int(ini + np.argmax(areas))
+        elegidos.append(a)
+    elegidos.append(n - 1)
+    return elegidos
+
+
+def lttb(tiempos: Sequence[int], valores: Sequence[float], puntos: int = PUNTOS_GRAFICO) -> Serie:
+    """Reduce la serie a `puntos` puntos conservando su forma (picos y valles).
+
+    El primer y el último punto se mantienen; entre ellos, de cada cubo se elige el punto que
+    forma el triángulo de mayor área con el elegido antes y la media del cubo siguiente.
+    Las series con `puntos` o menos se devuelven enteras.
+    """
+    n = len(tiempos)
+    if n <= puntos or puntos < 3:
+        return array("q", tiempos), array("d", valores)
+    indices = (_indices_numpy if np is not None else _indices_python)(tiempos, valores, puntos)
+    return array("q", (tiempos[i] for i in indices)), array("d", (valores[i] for i in indices))
+
+
+def _leer(cursor: sqlite3.Cursor, tiempos: array, valores: array) -> None:
+    # Vuelca (t, v) del cursor por bloques en las columnas
+    while True:
+        bloque = cursor.fetchmany(FILAS_POR_BLOQUE)
+        if not bloque:
+            return
+        for t, v in bloque:
+            tiempos.append(t)
+            valores.append(v)
+
+
+def serie_sensor(sensor_id: int, desde_ms: Optional[int] = None, hasta_ms: Optional[int] = None,
+                 puntos: int = PUNTOS_GRAFICO, con: Optional[sqlite3.Connection] = None) -> Tuple[Serie, str]:
+    """Serie de lectura.valor del sensor en [desde_ms, hasta_ms) reducida a `puntos`; y su fuente.
+
+    Con hasta LIMITE_CRUDAS lecturas en el rango (contadas en agregado_dia) se usan las lecturas,
+    incluidas las archivadas ("lecturas"); con más, la media de cada hora de agregado_hora
+    ("agregado_hora"): un año son 8760 filas, tenga el sensor las lecturas que tenga.
+    """
+    con = con or obtener_conexion()
+    desde_ms = -(2 ** 62) if desde_ms is None else desde_ms
+    hasta_ms = 2 ** 62 if hasta_ms is None else hasta_ms
+    n = con.execute("SELECT TOTAL(n) FROM agregado_dia WHERE sensor_id = ? AND inicio_ms >= ? AND inicio_ms < ?",
+                    (sensor_id, desde_ms - desde_ms % 86_400_000, hasta_ms)).fetchone()[0]
+    tiempos, valores = array("q"), array("d")
+    if n > LIMITE_CRUDAS:
+        fuente = "agregado_hora"
+        _leer(con.execute("""SELECT inicio_ms, suma / n FROM agregado_hora
+                              WHERE sensor_id = ? AND inicio_ms >= ? AND inicio_ms < ?
+                              ORDER BY inicio_ms""", (sensor_id, desde_ms, hasta_ms)), tiempos, valores)
+    else:
+        fuente = "lecturas"
+        for columnas in rangos_archivados(sensor_id, desde_ms, hasta_ms, con):
+            tiempos.extend(columnas.tiempos)
+            valores.extend(columnas.valores)
+        archivadas = len(tiempos)
+        _leer(con.execute("""SELECT fecha_hora, valor FROM lectura
+                              WHERE sensor_id = ? AND fecha_hora >= ? AND fecha_hora < ?
+                              ORDER BY fecha_hora""", (sensor_id, desde_ms, hasta_ms)), tiempos, valores)
+        if archivadas and archivadas < len(tiempos) and tiempos[archivadas] < tiempos[archivadas - 1]:
+            # Lecturas tardías en la tabla anteriores al archivo: se ordena (son pocas filas)
+            orden = sorted(range(len(tiempos)), key=tiempos.__getitem__)
+            tiempos, valores = array("q", (tiempos[i] for i in orden)), array("d", (valores[i] for i in orden))
+    return lttb(tiempos, valores, puntos), fuente
+
+
+# --- Pruebas ---
+"""def _tests():
+    import math, os, tempfile
+    global np
+    x = list(range(0, 10_000_000, 1000))
+    y = [math.sin(i / 500) + (5.0 if i == 4321 else 0.0) for i in range(len(x))]
+    t, v = lttb(x, y, 100)
+    assert len(t) == 100 and t[0] == x[0] and t[-1] == x[-1] and 5.0 < max(v)  # conserva el pico
+    assert list(lttb(x[:50], y[:50], 100)[0]) == x[:50]
+    if np is not None:
+        con_numpy = _indices_numpy(x, y, 100)
+        guardado, np = np, None
+        try:
+            assert _indices_python(x, y, 100) == con_numpy
+        finally:
+            np = guardado
+    from conexion import configurar, cerrar_conexiones, escribir
+    from esquema import crear_bd
+    import meteorologiadb
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "s.db"))
+        crear_bd()
+        escribir(lambda c: (c.execute("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)"),
+                            c.execute("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) "
+                                      "VALUES ('E', 0, 0, 1)"),
+                            c.execute("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('t', 'C', 0.1, 1)")))
+        meteorologiadb.insertar_lecturas((1, i * 60_000, float(i % 60), "OK", "automatica") for i in range(3000))
+        (t, v), fuente = serie_sensor(1, puntos=50)
+        assert fuente == "lecturas" and len(t) == 50 and t[0] == 0 and t[-1] == 2999 * 60_000
+        (t, v), fuente = serie_sensor(1, desde_ms=0, hasta_ms=600_000)
+        assert fuente == "lecturas" and list(v) == [float(i) for i in range(10)]
+        global LIMITE_CRUDAS
+        LIMITE_CRUDAS = 1000
+        (t, v), fuente = serie_sensor(1)
+        assert fuente == "agregado_hora" and len(t) == 50 and v[0] == 29.5
+        LIMITE_CRUDAS = 20_000
+        cerrar_conexiones()
+    print("[series] OK")
+
+if __name__ == "__main__":
+    _tests()"""
@@ -0,0 +1,250 @@
+# Simulador de carga sin interfaz: parcelas × estaciones × sensores a partir de demo_datos()
+# Genera lecturas reproducibles (semilla) a una tasa configurable sobre un reloj simulado, las
+# escribe en la tabla lectura y mide el rendimiento sostenido. Es el benchmark de referencia
+# para cualquier cambio de almacenamiento: python simulador.py --help
+from __future__ import annotations
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import conexion
+import meteorologiadb
+import sensores
+from conexion import escribir
+from demo import demo_datos
+from estacion import EstacionMeteorologica
+from lectura import LecturaBatch
+from parcela import Parcela
+
+UNIDADES = {"temperatura": "°C", "humedad": "%", "precipitacion": "mm"}
+
+
+def construir_flota(parcelas: int = 1, estaciones: int = 2, sensores_por_estacion: int = 6) -> List[Parcela]:
+    """Replica la parcela, la estación y los sensores de demo_datos() con ids consecutivos.
+
+    Los sensores de cada estación repiten en ciclo las plantillas de la demo (temperatura,
+    humedad, precipitación).
+    """
+    _, parcela_demo, estacion_demo = demo_datos()
+    plantillas = list(estacion_demo.sensores)
+    flota, id_estacion, id_sensor = [], 0, 0
+    for p in range(1, parcelas + 1):
+        parcela = Parcela(id=p, nombre=f"{parcela_demo.nombre} #{p}", latitud=parcela_demo.latitud,
+                          longitud=parcela_demo.longitud, altitud=parcela_demo.altitud,
+                          area_ha=parcela_demo.area_ha, descripcion=parcela_demo.descripcion,
+                          propietario_id=None)
+        for _ in range(estaciones):
+            id_estacion += 1
+            estacion = EstacionMeteorologica(id=id_estacion, nombre=f"{estacion_demo.nombre} #{id_estacion}",
+                                             coordenadas=estacion_demo.coordenadas,
+                                             altitud=estacion_demo.altitud, activa=True)
+            for k in range(sensores_por_estacion):
+                id_sensor += 1
+                estacion.agregar_sensor(replace(plantillas[k % len(plantillas)], id=id_sensor,
+                                                estacion_id=id_estacion))
+            parcela.agregar_estacion(estacion)
+        flota.append(parcela)
+    return flota
+
+
+def registrar_flota(flota: List[Parcela]) -> None:
+    """Da de alta en la BD las parcelas, estaciones y sensores de la flota (lectura.sensor_id es FK)."""
+    def alta(con):
+        for p in flota:
+            con.execute("INSERT INTO parcela (id, nombre, latitud, longitud, altitud, area_ha, descripcion) "
+                        "VALUES (?,?,?,?,?,?,?)",
+                        (p.id, p.nombre, p.latitud, p.longitud, p.altitud, p.area_ha, p.descripcion))
+            for e in p.estaciones:
+                lat, lon = e.coordenadas if isinstance(e.coordenadas, tuple) else (p.latitud, p.longitud)
+                con.execute("INSERT INTO estacion_meteorologica (id, nombre, latitud, longitud, altitud, activa, "
+                            "capacidad_registro, parcela_id) VALUES (?,?,?,?,?,?,?,?)",
+                            (e.id, e.nombre, lat, lon, e.altitud, int(e.activa), e.capacidad_registro, p.id))
+                con.executemany(
+                    "INSERT INTO sensor (id, tipo, unidad, precision, rango_min, rango_max, estado, estacion_id, "
+                    "tipo_humedad, fecha_calibracion, tipo_medidor, area_captacion) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                    [(s.id, s.tipo, getattr(s, "unidad", UNIDADES.get(s.tipo, "")), 0.1,
+                      getattr(s, "rango_min", None), getattr(s, "rango_max", None), int(s.estado), e.id,
+                      getattr(s, "tipo_humedad", None), getattr(s, "fecha_calibracion", None),
+                      getattr(s, "tipo_medidor", None), getattr(s, "area_captacion", None))
+                     for s in e.sensores])
+
+    escribir(alta)
+
+
+def rss_mb() -> Optional[float]:
+    """Memoria residente actual del proceso en MB (pico si no hay /proc; None si no se puede medir)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1e6 if sys.platform == "darwin" else pico / 1e3  # bytes en macOS, KB en Linux
+
+
+def tamano_bd_mb(ruta: str) -> float:
+    # Fichero principal más el WAL, que es donde crece la BD entre checkpoints
+    return sum(os.path.getsize(ruta + sufijo) for sufijo in ("", "-wal") if os.path.exists(ruta + sufijo)) / 1e6
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    # Percentil por rango más cercano sobre una lista ya ordenada
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+
+def _indice_lectura(segundo: float, tasa_hz: float) -> int:
+    # Índice de la primera lectura en o después de segundo (la k-ésima cae en k / tasa_hz); el
+    # redondeo evita que 60 × (1/3) = 20.000000000000004 salte una lectura
+    return math.ceil(round(segundo * tasa_hz, 9))
+
+
+def simular(semilla: int = 0, parcelas: int = 1, estaciones: int = 2, sensores_por_estacion: int = 6,
+            tasa_hz: float = 1.0, duracion_s: int = 3600, bloque_s: int = 60, tamano_lote: int = 1000,
+            ruta: Optional[str] = None, wal: bool = True, inicio: datetime = datetime(2025, 1, 1),
+            informe: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Ingresa duracion_s segundos simulados de lecturas de toda la flota y devuelve las métricas.
+
+    Las lecturas de cada sensor caen cada 1/tasa_hz segundos del reloj simulado; cada bloque de
+    bloque_s segundos genera las que le tocan (Sensor.obtener_lecturas_lote), que con tasas
+    menores que 1/bloque_s pueden ser ninguna, y se inserta en transacciones de tamano_lote filas; la latencia
+    de commit es la de cada transacción. Tras cada bloque se llama a informe() con el progreso
+    (segundos reales, filas, filas/s, MB de BD y RSS). Con la misma semilla y parámetros las
+    lecturas generadas son idénticas.
+    """
+    if not 0 < tasa_hz <= 1000:
+        raise ValueError("tasa_hz debe estar en (0, 1000]: lectura.fecha_hora tiene resolución de ms")
+    if bloque_s < 1 or duracion_s < 1:
+        raise ValueError("bloque_s y duracion_s deben ser mayores que 0")
+    if ruta is None:
+        directorio = tempfile.TemporaryDirectory()
+        ruta = os.path.join(directorio.name, "simulacion.db")
+    else:
+        directorio = None
+    try:
+        conexion.configurar(ruta, wal=wal)
+        meteorologiadb.crear_bd()
+        sensores.fijar_semilla(semilla)
+        flota = construir_flota(parcelas, estaciones, sensores_por_estacion)
+        registrar_flota(flota)
+        lista_sensores = [s for p in flota for e in p.estaciones for s in e.obtener_sensores_activos()]
+        intervalo = timedelta(seconds=1 / tasa_hz)
+        latencias: List[float] = []
+        progreso: List[Dict] = []
+        filas = 0
+        t_inicio = time.perf_counter()
+        for desplazamiento in range(0, duracion_s, bloque_s):
+            primera = _indice_lectura(desplazamiento, tasa_hz)
+            siguiente = _indice_lectura(desplazamiento + bloque_s, tasa_hz)
+            t_primera = inicio + timedelta(seconds=primera / tasa_hz)
+            lote = LecturaBatch()
+            for s in lista_sensores:
+                lote.extender(s.obtener_lecturas_lote(siguiente - primera, t_primera, intervalo))
+            for i in range(0, len(lote), tamano_lote):
+                t0 = time.perf_counter()
+                res = meteorologiadb.insertar_lecturas(lote[i:i + tamano_lote], tamano_lote=tamano_lote)
+                latencias.append(time.perf_counter() - t0)
+                filas += res["filas"]
+            transcurrido = time.perf_counter() - t_inicio
+            punto = {"segundos": transcurrido, "simulado_s": desplazamiento + bloque_s, "filas": filas,
+                     "filas_por_segundo": filas / transcurrido if transcurrido > 0 else 0.0,
+                     "bd_mb": tamano_bd_mb(ruta), "rss_mb": rss_mb()}
+            progreso.append(punto)
+            if informe is not None:
+                informe(punto)
+        segundos = time.perf_counter() - t_inicio
+        latencias.sort()
+        return {
+            "sensores": len(lista_sensores),
+            "filas": filas,
+            "segundos": segundos,
+            "filas_por_segundo": filas / segundos if segundos > 0 else 0.0,
+            "commits": len(latencias),
+            "p50_ms": _percentil(latencias, 50) * 1000,
+            "p99_ms": _percentil(latencias, 99) * 1000,
+            "bd_mb": tamano_bd_mb(ruta),
+            "rss_mb": rss_mb(),
+            "progreso": progreso,
+        }
+    finally:
+        conexion.cerrar_conexiones()
+        if directorio is not None:
+            directorio.cleanup()
+
+
+def _formato_mb(mb: Optional[float]) -> str:
+    return f"{mb:8.1f}" if mb is not None else "     n/d"
+
+
+def imprimir_progreso(punto: Dict) -> None:
+    print(f"{punto['segundos']:8.1f}s  sim={punto['simulado_s']:>8}s  filas={punto['filas']:>10}  "
+          f"{punto['filas_por_segundo']:>10.0f} filas/s  BD={_formato_mb(punto['bd_mb'])} MB  "
+          f"RSS={_formato_mb(punto['rss_mb'])} MB")
+
+
+def imprimir_resumen(res: Dict) -> None:
+    print(f"{res['sensores']} sensores, {res['filas']} lecturas en {res['segundos']:.1f} s: "
+          f"{res['filas_por_segundo']:.0f} lecturas/s sostenidas")
+    print(f"{res['commits']} commits: p50 {res['p50_ms']:.2f} ms, p99 {res['p99_ms']:.2f} ms")
+    print(f"BD final {_formato_mb(res['bd_mb']).strip()} MB, RSS {_formato_mb(res['rss_mb']).strip()} MB")
+
+
+# --- Pruebas ---
+"""def _tests():
+    import sqlite3
+    with tempfile.TemporaryDirectory() as tmp:
+        sumas = []
+        for nombre in ("a.db", "b.db"):
+            ruta = os.path.join(tmp, nombre)
+            res = simular(semilla=7, parcelas=2, estaciones=2, sensores_por_estacion=3, tasa_hz=2,
+                          duracion_s=120, bloque_s=60, tamano_lote=100, ruta=ruta, wal=False)
+            assert res["filas"] == 2 * 2 * 3 * 240 and len(res["progreso"]) == 2
+            assert res["commits"] == 2 * 15 and res["p50_ms"] <= res["p99_ms"]
+            con = sqlite3.connect(ruta)
+            sumas.append(con.execute("SELECT COUNT(*), SUM(valor), MAX(fecha_hora) FROM lectura").fetchone())
+            con.close()
+        assert sumas[0] == sumas[1] and sumas[0][0] == res["filas"]
+        # Tasa menor que una lectura por bloque: una cada 300 s simulados, no una por bloque
+        ruta = os.path.join(tmp, "lenta.db")
+        res = simular(semilla=7, estaciones=1, sensores_por_estacion=3, tasa_hz=1 / 300, duracion_s=1200,
+                      bloque_s=60, ruta=ruta, wal=False)
+        assert res["filas"] == 3 * 4 and len(res["progreso"]) == 20
+        con = sqlite3.connect(ruta)
+        assert [r[0] for r in con.execute("SELECT DISTINCT fecha_hora FROM lectura ORDER BY 1")] == \
+            [1735689600000 + k * 300000 for k in range(4)]
+        con.close()
+        assert simular(estaciones=1, sensores_por_estacion=1, tasa_hz=0.7, duracion_s=120, bloque_s=60,
+                       ruta=os.path.join(tmp, "fraccion.db"), wal=False)["filas"] == 84
+    print("[simulador] OK")
+
+if __name__ == "__main__":
+    _tests()"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulador de carga y prueba de resistencia de la ingesta")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--parcelas", type=int, default=1)
+    parser.add_argument("--estaciones", type=int, default=2, help="estaciones por parcela")
+    parser.add_argument("--sensores", type=int, default=6, help="sensores por estación")
+    parser.add_argument("--tasa", type=float, default=1.0, help="lecturas por segundo simulado y sensor")
+    parser.add_argument("--duracion", type=int, default=3600, help="segundos simulados")
+    parser.add_argument("--bloque", type=int, default=60, help="segundos simulados por bloque")
+    parser.add_argument("--lote", type=int, default=1000, help="filas por transacción")
+    parser.add_argument("--bd", default=None, help="ruta de una BD nueva (por defecto, una temporal)")
+    parser.add_argument("--sin-wal", action="store_true")
+    args = parser.parse_args()
+    imprimir_resumen(simular(args.semilla, args.parcelas, args.estaciones, args.sensores, args.tasa,
+                             args.duracion, args.bloque, args.lote, args.bd, not args.sin_wal,
+                             informe=imprimir_progreso))
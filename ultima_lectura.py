@@ -0,0 +1,135 @@
+# Módulo de la última lectura de cada sensor (tabla sensor_ultima_lectura)
+# La mantienen triggers sobre lectura; evita el MAX(fecha_hora) ... GROUP BY sobre toda la tabla
+from __future__ import annotations
+import sqlite3
+from typing import Dict, List, Optional
+
+from archivo import SIN_ARCHIVAR
+from conexion import obtener_conexion
+from lectura import desde_epoch_ms
+
+SQL_TABLA = """
+CREATE TABLE IF NOT EXISTS sensor_ultima_lectura (
+    sensor_id INTEGER PRIMARY KEY,
+    fecha_hora INTEGER NOT NULL,
+    valor REAL NOT NULL,
+    calidad_dato TEXT
+);
+"""
+
+
+def _sql_recalcular(fila: str) -> str:
+    # Vuelve a buscar la lectura más reciente del sensor: una búsqueda descendente por la clave
+    # (sensor_id, fecha_hora) en cada partición
+    return f"""
+        DELETE FROM sensor_ultima_lectura WHERE sensor_id = {fila}.sensor_id;
+        INSERT INTO sensor_ultima_lectura (sensor_id, fecha_hora, valor, calidad_dato)
+        SELECT sensor_id, fecha_hora, valor, calidad_dato
+          FROM lectura WHERE sensor_id = {fila}.sensor_id
+         ORDER BY fecha_hora DESC LIMIT 1;"""
+
+
+def sql_triggers(tabla: str = "lectura") -> List[str]:
+    """Triggers de la última lectura sobre tabla: lectura o una partición lectura_AAAAMM."""
+    sufijo = tabla[len("lectura"):]
+    return [
+        # Una lectura atrasada (p. ej. reenvío de datos) no desplaza a la más reciente
+        f"""CREATE TRIGGER IF NOT EXISTS trg_ultima_insert{sufijo} AFTER INSERT ON {tabla} BEGIN
+        INSERT INTO sensor_ultima_lectura (sensor_id, fecha_hora, valor, calidad_dato)
+        VALUES (NEW.sensor_id, NEW.fecha_hora, NEW.valor, NEW.calidad_dato)
+        ON CONFLICT (sensor_id) DO UPDATE SET
+            fecha_hora = excluded.fecha_hora,
+            valor = excluded.valor,
+            calidad_dato = excluded.calidad_dato
+        WHERE excluded.fecha_hora >= sensor_ultima_lectura.fecha_hora;
+    END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_ultima_update{sufijo}
+        AFTER UPDATE OF sensor_id, fecha_hora, valor, calidad_dato ON {tabla} BEGIN
+        {_sql_recalcular("OLD")}
+        {_sql_recalcular("NEW")}
+    END;""",
+        # Sólo hay que recalcular si se borró justo la última (la retención borra lecturas antiguas)
+        f"""CREATE TRIGGER IF NOT EXISTS trg_ultima_delete{sufijo} AFTER DELETE ON {tabla}
+        WHEN OLD.fecha_hora = (SELECT fecha_hora FROM sensor_ultima_lectura WHERE sensor_id = OLD.sensor_id)
+         AND {SIN_ARCHIVAR} BEGIN
+        {_sql_recalcular("OLD")}
+    END;""",
+    ]
+
+
+SQL_TRIGGERS = sql_triggers()
+
+
+def crear_ultima_lectura(con: sqlite3.Connection) -> None:
+    """Migración 3 (esquema.py): tabla y triggers, rellenada a partir de lectura."""
+    for sql in [SQL_TABLA] + SQL_TRIGGERS:
+        con.execute(sql)
+    con.execute("DELETE FROM sensor_ultima_lectura")
+    con.execute("""
+        INSERT INTO sensor_ultima_lectura (sensor_id, fecha_hora, valor, calidad_dato)
+        SELECT l.sensor_id, l.fecha_hora, l.valor, l.calidad_dato
+          FROM sensor s
+          JOIN lectura l ON l.sensor_id = s.id
+                        AND l.fecha_hora = (SELECT MAX(fecha_hora) FROM lectura WHERE sensor_id = s.id)
+    """)
+
+
+SQL_ULTIMAS = """
+SELECT s.id, s.tipo, s.unidad, u.fecha_hora, u.valor, u.calidad_dato
+  FROM sensor s
+  JOIN estacion_meteorologica e ON e.id = s.estacion_id
+  JOIN sensor_ultima_lectura u ON u.sensor_id = s.id
+ WHERE {filtro}
+ ORDER BY s.id
+"""
+
+
+def ultimas_lecturas(estacion_id: Optional[int] = None, parcela_id: Optional[int] = None) -> List[Dict]:
+    """Valor actual de cada sensor de una estación o de una parcela (sin filtros: de todos)."""
+    filtros, valores = [], []
+    if estacion_id is not None:
+        filtros.append("s.estacion_id = ?")
+        valores.append(estacion_id)
+    if parcela_id is not None:
+        filtros.append("e.parcela_id = ?")
+        valores.append(parcela_id)
+    filas = obtener_conexion().execute(SQL_ULTIMAS.format(filtro=" AND ".join(filtros) or "1"), valores)
+    return [
+        {"sensor_id": sid, "tipo": tipo, "unidad": unidad,
+         "fecha_hora": desde_epoch_ms(fecha) if isinstance(fecha, int) else fecha,
+         "valor": valor, "calidad_dato": calidad}
+        for sid, tipo, unidad, fecha, valor, calidad in filas
+    ]
+
+
+# --- Pruebas ---
+"""def _tests():
+    import os, tempfile
+    from datetime import datetime, timedelta
+    import meteorologiadb
+    from conexion import configurar, cerrar_conexiones
+    with tempfile.TemporaryDirectory() as tmp:
+        configurar(os.path.join(tmp, "u.db"))
+        meteorologiadb.crear_bd()
+        meteorologiadb.insertar("INSERT INTO parcela (nombre, latitud, longitud) VALUES ('P', 0, 0)")
+        meteorologiadb.insertar("INSERT INTO estacion_meteorologica (nombre, latitud, longitud, parcela_id) VALUES ('E', 0, 0, 1)")
+        for _ in range(2):
+            meteorologiadb.insertar("INSERT INTO sensor (tipo, unidad, precision, estacion_id) VALUES ('temperatura', 'C', 0.1, 1)")
+        t0 = datetime(2025, 1, 1)
+        meteorologiadb.insertar_lecturas((s, t0 + timedelta(minutes=i), float(i), "OK", "automatica")
+                                         for s in (1, 2) for i in range(10))
+        assert [u["valor"] for u in ultimas_lecturas(estacion_id=1)] == [9.0, 9.0]
+        meteorologiadb.insertar_lecturas([(1, t0 - timedelta(days=1), -1.0, "OK", "manual")])
+        assert ultimas_lecturas(parcela_id=1)[0]["fecha_hora"] == t0 + timedelta(minutes=9)
+        meteorologiadb.eliminar("DELETE FROM lectura WHERE sensor_id = 1 AND valor = 9.0")
+        assert ultimas_lecturas(estacion_id=1)[0]["valor"] == 8.0
+        meteorologiadb.actualizar("UPDATE lectura SET valor = 80.0 WHERE sensor_id = 1 AND valor = 8.0")
+        assert ultimas_lecturas()[0]["valor"] == 80.0
+        meteorologiadb.eliminar("DELETE FROM sensor WHERE id = 2")
+        assert [u["sensor_id"] for u in ultimas_lecturas()] == [1]
+        assert ultimas_lecturas(estacion_id=99) == []
+        cerrar_conexiones()
+    print("[ultima_lectura] OK")
+
+if __name__ == "__main__":
+    _tests()"""